@@ -2,24 +2,90 @@ from flask import Flask, request, jsonify, Response
 from flask_restful import Resource, Api, reqparse
 
 from utils.externalapi import (
-    fetch_nasa_geojson,
+    fetch_nasa_sources,
+    cluster_nasa_detections,
     pm25_to_aqi,
     openaq_param_pm25_latest,
     openaq_param_latest_to_geojson_aqi
 )
 from utils.geo import cluster_geojson_points
+from utils.firms import FirmsDetections, merge_detections
+from utils.incremental import IncrementalClusterer
+from utils.calculate import haversine_one_to_many
+from utils.pyramid import build_cluster_pyramid, get_clusters
+from utils.mvt import encode_wildfire_tile
+from utils.geobuf import GEOBUF_MIMETYPE, encode_geobuf
+from utils.cache import (
+    LRUCache,
+    EncodedPayload,
+    encoded_etag,
+    etag_matches,
+    load_payload,
+    negotiate_encoding,
+    payload_etag,
+    prune_payloads,
+    store_payload
+)
+from utils.changes import (
+    DEFAULT_CHANGES_HISTORY,
+    cluster_index,
+    diff_clusters,
+    ensure_changes_indexes,
+    load_changes,
+    load_cluster_index,
+    prune_changes,
+    store_changes,
+    store_cluster_index
+)
+from utils.refresh import RefreshCoordinator
+from utils.scheduler import Scheduler
+from utils.detectionstore import (
+    DEFAULT_PAGE_SIZE,
+    MAX_RADIUS_KM,
+    ensure_detection_indexes,
+    write_detections,
+    publish_manifest,
+    current_manifest,
+    prune_detections,
+    find_detections,
+    find_detection_page,
+    confidence_score,
+    parse_since,
+    validate_bbox,
+    validate_circle
+)
+from utils.detectionindex import DetectionIndex
+from utils.notificationwriter import NotificationWriter
+from utils.alerts import (
+    DEFAULT_ALERT_RADIUS_KM,
+    alerts_by_cluster,
+    ensure_alert_indexes,
+    load_addresses,
+    proximity_matches,
+    record_new_alerts
+)
+from utils.notifications import DEFAULT_KEEPALIVE_SECONDS, DEFAULT_REPLAY_SIZE, NotificationHub
+from utils.notificationbroker import (
+    DEFAULT_SOCKET_ADDRESS,
+    create_broker,
+    ensure_event_indexes,
+    find_missed_events
+)
 from flask_cors import CORS
 from pymongo import MongoClient
 from bson import json_util, ObjectId
-from collections import deque
+from collections import OrderedDict
 import os
+import atexit
+import base64
+import math
 import datetime
 import time
-import json
 import pandas as pd
 import numpy as np
 import random
 import re
+import threading
 import smtplib
 import ssl
 import requests
@@ -43,6 +109,14 @@ notificationsCollection = db.Notifications
 addressesCollection = db.Addresses
 crisisCollection = db.Crises
 aqiCollection = db.openWeatherAQIData
+nasaDetectionsCollection = db.NasaWildfireDetections
+nasaManifestCollection = db.NasaWildfireManifest
+refreshLeasesCollection = db.RefreshLeases
+schedulerRunsCollection = db.SchedulerRuns
+encodedResponsesCollection = db.EncodedResponses
+nasaChangesCollection = db.NasaWildfireChanges
+notificationEventsCollection = db.NotificationEvents
+fireAlertsCollection = db.FireAlerts
 
 # Create indexes for better performance
 try:
@@ -52,17 +126,82 @@ try:
 except Exception as e:
     print(f"⚠️ Index creation info: {e}")
 
-# Global list of connected SSE clients
-notification_clients = []
+try:
+    # 2dsphere + (snapshotId, acq_date) indexes for per-detection storage
+    ensure_detection_indexes(nasaDetectionsCollection)
+    print("✅ Created indexes on nasaDetectionsCollection")
+except Exception as e:
+    print(f"⚠️ Index creation info: {e}")
+
+try:
+    ensure_changes_indexes(nasaChangesCollection)
+    print("✅ Created indexes on nasaChangesCollection")
+except Exception as e:
+    print(f"⚠️ Index creation info: {e}")
+
+try:
+    # TTL index, plus (userIDs, createdAt, _id) for Last-Event-ID replay
+    ensure_event_indexes(notificationEventsCollection)
+    print("✅ Created indexes on notificationEventsCollection")
+except Exception as e:
+    print(f"⚠️ Index creation info: {e}")
+
+try:
+    # Unique (userID, clusterId): each user is alerted about a fire once
+    ensure_alert_indexes(fireAlertsCollection)
+    print("✅ Created indexes on fireAlertsCollection")
+except Exception as e:
+    print(f"⚠️ Index creation info: {e}")
+
+# How NASA snapshots are stored:
+#   "document" - one document holding originalData + clusteredData (default)
+#   "split"    - detections as individual documents + a manifest; the snapshot
+#                document keeps clusteredData and metadata only
+#   "both"     - write both layouts
+storage_config = {
+    "mode": os.getenv("NASA_STORAGE_MODE", "document"),
+    "keep_snapshots": int(os.getenv("NASA_KEEP_DETECTION_SNAPSHOTS", 3))
+}
+
+# FIRMS sources merged into each NASA snapshot, highest priority first, and how
+# close two sensors' detections must be (km / minutes) to count as one fire pixel
+firms_config = {
+    # One sensor by default; more (e.g. VIIRS_NOAA20_NRT,MODIS_NRT) are opt-in
+    "sources": [s.strip() for s in os.getenv("NASA_FIRMS_SOURCES", "VIIRS_SNPP_NRT").split(",") if s.strip()],
+    "dedup_distance_km": float(os.getenv("NASA_DEDUP_DISTANCE_KM", 0.5)),
+    "dedup_window_minutes": float(os.getenv("NASA_DEDUP_WINDOW_MINUTES", 60))
+}
+
+# Connected SSE clients of this worker, keyed by userID
+notification_hub = NotificationHub(
+    keepalive_seconds=float(os.getenv("SSE_KEEPALIVE_SECONDS", DEFAULT_KEEPALIVE_SECONDS)),
+    replay_size=int(os.getenv("SSE_REPLAY_SIZE", DEFAULT_REPLAY_SIZE))
+)
+
+# How a broadcast reaches streams attached to other workers:
+#   "memory" - it doesn't; only for a single worker (default)
+# Whichever it is, events are stored in NotificationEvents for Last-Event-ID replay
+#   "mongo"  - change stream on NotificationEvents (needs a replica set)
+#   "socket" - through `python -m scripts.notificationbroker` at NOTIFICATION_BROKER_ADDRESS
+notification_broker = create_broker(
+    os.getenv("NOTIFICATION_BROKER", "memory"),
+    collection=notificationEventsCollection,
+    address=os.getenv("NOTIFICATION_BROKER_ADDRESS", DEFAULT_SOCKET_ADDRESS)
+)
+notification_broker.subscribe(notification_hub.publish)
+
+# Per-user Notifications documents are written in bulk, by default from a
+# background queue after the response (NOTIFICATION_WRITES_ASYNC=false to write inline)
+notification_writer = NotificationWriter(
+    db.Notifications,
+    asynchronous=os.getenv("NOTIFICATION_WRITES_ASYNC", "true").lower() != "false"
+)
+atexit.register(notification_writer.flush, 10)
 
 
 def broadcast_notification_to_clients(user_ids: list, message: dict):
-    formatted = f"data: {json.dumps(message)}\n\n"
-    for client in notification_clients:
-        if client.get("userID") in user_ids:
-            client["queue"].append(formatted)
-    print("📣 Broadcasting to:", user_ids)
-    print("📡 Connected clients:", [c.get("userID") for c in notification_clients])
+    notification_broker.publish(user_ids, message)
+    print(f"📣 Broadcast to {len(set(user_ids))} users")
 
 
 @app.route('/notifications/stream', methods=['GET'])
@@ -71,24 +210,22 @@ def notification_stream():
     user_id = request.args.get('userID')
     if not user_id:
         return jsonify({"error": "Missing userID in query params"}), 400
-    q = deque()
-    client = {"queue": q, "userID": user_id}
-    notification_clients.append(client)
-
-    print("✅ Client connected:", user_id)
-    print("🔁 Current clients:", [c['userID'] for c in notification_clients])
-    
-    def event_stream():
+    # Sent by EventSource when it reconnects; the query parameter is for clients that reconnect by hand
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    connection = notification_hub.register(user_id, last_event_id)
+    notification_broker.start()
+
+    print(f"✅ Client connected: {user_id} ({notification_hub.connection_count()} streams open)")
+    if connection.needs_replay:
+        # Older than this worker remembers
         try:
-            while True:
-                while q:
-                    yield q.popleft()
-                time.sleep(1)
-                yield ": keep-alive\n\n"
-        finally:
-            notification_clients.remove(client)
+            missed = find_missed_events(notificationEventsCollection, user_id, last_event_id)
+            replayed = notification_hub.replay(connection, missed)
+            print(f"🔁 Replayed {replayed} notifications to {user_id} from Mongo")
+        except Exception as e:
+            print(f"⚠️ Could not replay notifications for {user_id}: {e}")
 
-    return Response(event_stream(), mimetype='text/event-stream')
+    return Response(notification_hub.stream(connection), mimetype='text/event-stream')
 
 
 
@@ -127,7 +264,7 @@ def test_notification_all_users():
     print("Testing Notification Broadcast")
     allUsers = userCollection.find({}, {"userID": 1, "_id": 0})
     user_ids = [user["userID"] for user in allUsers if "userID" in user]
-    user_ids = user_ids + [c.get("userID") for c in notification_clients]
+    user_ids = user_ids + notification_hub.connected_user_ids()
     timestamp = datetime.datetime.utcnow().isoformat()
     message = {
         "title": "Test Notification",
@@ -136,17 +273,14 @@ def test_notification_all_users():
     }
 
     # Save unseen notification for each user
-    for uid in user_ids:
-        db.Notifications.insert_one({
-            "userID": uid,
-            "message": message["body"],
-            "title": message["title"],
-            "timestamp": timestamp,
-            "seen": False,
-            "type": "test"
-        })
-    print("📣 Broadcasting to:", user_ids)
-    print("📡 Connected clients:", [c.get("userID") for c in notification_clients])
+    notification_writer.submit({
+        "userID": uid,
+        "message": message["body"],
+        "title": message["title"],
+        "timestamp": timestamp,
+        "seen": False,
+        "type": "test"
+    } for uid in user_ids)
     # Send to connected clients in real-time
     broadcast_notification_to_clients(user_ids, message)
     return jsonify({"message": "Notification sent to clients"}), 200
@@ -617,18 +751,17 @@ def approveReport():
                     "$maxDistance": 10000
                 }
             }
-        })
+        }, {"userID": 1, "_id": 0})
 
-        user_ids = []
-        for u in nearby_users:
-            user_ids.append(u["userID"])
-            db.Notifications.insert_one({
-                "userID": u["userID"],
-                "message": "🔥 A new report was approved near your area.",
-                "reportID": str(report_object_id),
-                "seen": False,
-                "createdAt": datetime.datetime.utcnow().isoformat()
-            })
+        user_ids = [u["userID"] for u in nearby_users]
+        createdAt = datetime.datetime.utcnow().isoformat()
+        notification_writer.submit({
+            "userID": uid,
+            "message": "🔥 A new report was approved near your area.",
+            "reportID": str(report_object_id),
+            "seen": False,
+            "createdAt": createdAt
+        } for uid in user_ids)
 
         broadcast_notification_to_clients(user_ids, {
             "title": "New Approved Report Nearby",
@@ -790,10 +923,515 @@ def getWildfires():
         return jsonify(geojson), 200
     # return json_util.dumps({"wildfires": wildfires}), 200, {'Content-Type': 'application/json'}
 
+# Cluster pyramids for the most recent snapshots, keyed by snapshot _id
+cluster_pyramids = OrderedDict()
+MAX_CACHED_PYRAMIDS = 2
+# Filter indexes over the original detections of document-stored snapshots, keyed by snapshot _id
+detection_indexes = OrderedDict()
+MAX_CACHED_DETECTION_INDEXES = 2
+
+# Encoded JSON bodies of the snapshot-backed endpoints (/wildfires/nasa,
+# /wildfires/nasa/original, /wildfires/clustering/stats), keyed by endpoint and
+# versioned by the snapshot's _id/lastUpdated so a new snapshot drops them all
+response_cache = LRUCache(max_entries=16)
+# Same for /aq/openweather/latest, versioned by the AQI snapshot
+aqi_response_cache = LRUCache(max_entries=4)
+# Responses that only change with their snapshot: they carry an ETag and
+# If-None-Match gets a 304. (Stats embed the live clustering config.)
+ETAG_RESPONSE_KEYS = ("nasa", "original", "openweather", "nasa.geobuf", "original.geobuf", "openweather.geobuf")
+# `format=` values of the GeoJSON endpoints; anything but geojson is cached under "<key>.<format>"
+RESPONSE_FORMATS = ("geojson", "geobuf")
+# Seconds to trust the last snapshot head lookup (0 = check on every request)
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 0))
+_snapshot_head_memo = {"head": None, "checked_at": 0.0}
+NASA_MAX_AGE_SECONDS = 14400  # 4 hours
+
+
+def _snapshot_version(snapshot):
+    return f"{snapshot['_id']}:{snapshot.get('lastUpdated')}"
+
+
+def _current_snapshot_head():
+    """Latest snapshot _id/lastUpdated, reusing the previous lookup for RESPONSE_CACHE_TTL seconds."""
+    now = time.time()
+    if RESPONSE_CACHE_TTL > 0 and now - _snapshot_head_memo["checked_at"] < RESPONSE_CACHE_TTL:
+        return _snapshot_head_memo["head"]
+    head = _latest_snapshot_head()
+    _snapshot_head_memo["head"] = head
+    _snapshot_head_memo["checked_at"] = now
+    return head
+
+
+def _snapshot_age_seconds(snapshot, current_time):
+    last_updated = snapshot.get("lastUpdated")
+    if isinstance(last_updated, str):
+        last_updated = datetime.datetime.fromisoformat(last_updated)
+    elif not isinstance(last_updated, datetime.datetime):
+        return float("inf")
+    return (current_time - last_updated).total_seconds()
+
+
+def _cached_response(key, head=None, cache=response_cache):
+    """
+    Serve `key` for the current snapshot without loading or re-encoding it:
+    a 304 when the client already has it, otherwise the payload from this
+    process's cache or the one stored at ingest (EncodedResponses). Only a
+    projection query runs. Returns None on a miss.
+    """
+    if head is None:
+        head = _current_snapshot_head()
+    if not head:
+        return None
+    version = _snapshot_version(head)
+    if key in ETAG_RESPONSE_KEYS:
+        etag = payload_etag(version, key)
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return _not_modified_response(etag)
+    payload = cache.get(version, key)
+    if payload is None:
+        payload = load_payload(encodedResponsesCollection, version, key)
+        if payload is None:
+            return None
+        cache.put(version, key, payload)
+    return _payload_response(payload)
+
+
+def _encode_json(data):
+    """Bytes exactly as jsonify would send them; works outside requests (scheduler jobs)."""
+    with app.app_context():
+        return jsonify(data).get_data()
+
+
+def _encoded_payload(snapshot, key, data, status=200):
+    etag = payload_etag(_snapshot_version(snapshot), key) if status == 200 and key in ETAG_RESPONSE_KEYS else None
+    if key.endswith(".geobuf"):
+        return EncodedPayload(encode_geobuf(data), status, mimetype=GEOBUF_MIMETYPE, etag=etag)
+    return EncodedPayload(_encode_json(data), status, etag=etag)
+
+
+def _requested_format():
+    """The `format` query param, or None when it is not one of RESPONSE_FORMATS."""
+    output_format = (request.args.get('format') or "geojson").lower()
+    return output_format if output_format in RESPONSE_FORMATS else None
+
+
+def _format_key(key, output_format):
+    return key if output_format == "geojson" else f"{key}.{output_format}"
+
+
+def _invalid_format_response():
+    return jsonify({"error": f"Invalid format (expected one of: {', '.join(RESPONSE_FORMATS)})"}), 400
+
+
+def _cache_json_response(snapshot, key, data, status=200, cache=response_cache):
+    """
+    Encode `data` once (exactly as jsonify would, or as Geobuf for ".geobuf"
+    keys), cache it for this snapshot and serve it.
+    """
+    payload = _encoded_payload(snapshot, key, data, status)
+    cache.put(_snapshot_version(snapshot), key, payload)
+    return _payload_response(payload)
+
+
+def _payload_response(payload):
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    response = Response(payload.encoded(encoding), status=payload.status, mimetype=payload.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    _set_cache_headers(response, payload.etag, encoding)
+    return response
+
+
+def _not_modified_response(etag):
+    response = Response(status=304)
+    _set_cache_headers(response, etag, negotiate_encoding(request.headers.get('Accept-Encoding')))
+    return response
+
+
+def _set_cache_headers(response, etag, encoding):
+    response.headers['Vary'] = 'Accept-Encoding'
+    if etag:
+        response.headers['ETag'] = encoded_etag(etag, encoding)
+        # Clients keep the body but revalidate it, which costs a 304 until the snapshot changes
+        response.headers['Cache-Control'] = 'no-cache'
+
+
+def _store_precompressed(snapshot, bodies, cache, keep_versions):
+    """
+    Encode and compress (gzip + brotli) each of `bodies` ({key: data}) once
+    at ingest, cache them here and store them for every other worker.
+    """
+    version = _snapshot_version(snapshot)
+    try:
+        for key, data in bodies.items():
+            payload = _encoded_payload(snapshot, key, data).precompress()
+            cache.put(version, key, payload)
+            if not store_payload(encodedResponsesCollection, version, key, payload):
+                print(f"⚠️ {key} response is too large to store precompressed; workers will encode it on first use")
+        prune_payloads(encodedResponsesCollection, bodies.keys(), keep_versions)
+    except Exception as e:
+        # Requests fall back to encoding the snapshot themselves
+        print(f"⚠️ Failed to precompress {', '.join(bodies)} responses: {e}")
+
+
+# Snapshots whose diff to the latest one /wildfires/nasa/changes can serve;
+# clients further behind get a full reload
+NASA_CHANGES_HISTORY = int(os.getenv("NASA_CHANGES_HISTORY", DEFAULT_CHANGES_HISTORY))
+
+
+def _store_cluster_changes(snapshot):
+    """
+    Index the clusters of a new snapshot and precompute the diffs from the
+    last NASA_CHANGES_HISTORY snapshots to it (NasaWildfireChanges). Returns
+    the _ids of those snapshots, newest first.
+    """
+    if NASA_CHANGES_HISTORY <= 0:
+        return []
+    try:
+        recent = [doc["_id"] for doc in nasaWildfiresCollection.find({}, {"_id": 1})
+                  .sort([("lastUpdated", -1)]).limit(NASA_CHANGES_HISTORY)]
+        features = snapshot["clusteredData"]["features"]
+        index = cluster_index(features)
+        if index is None:
+            print("⚠️ Clusters have no ids; /wildfires/nasa/changes will send full reloads")
+            return recent
+        store_cluster_index(nasaChangesCollection, snapshot["_id"], index)
+        diffs = 0
+        for since_id in recent:
+            previous_index = load_cluster_index(nasaChangesCollection, since_id)
+            if previous_index is None:
+                # Stored before change tracking (or pruned)
+                continue
+            changes = diff_clusters(previous_index, features, index)
+            store_changes(nasaChangesCollection, since_id, snapshot["_id"], changes, len(features))
+            diffs += 1
+        print(f"Precomputed {diffs} wildfire change sets")
+        return recent
+    except Exception as e:
+        # Clients get full reloads until the next snapshot
+        print(f"⚠️ Failed to precompute wildfire changes: {e}")
+        return []
+
+
+# Users with a saved address this close to a new or grown cluster are alerted after each ingest
+FIRE_ALERTS_ENABLED = os.getenv("FIRE_ALERTS_ENABLED", "true").lower() != "false"
+FIRE_ALERT_RADIUS_KM = float(os.getenv("FIRE_ALERT_RADIUS_KM", DEFAULT_ALERT_RADIUS_KM))
+
+
+def _send_fire_alerts(snapshot, since_ids):
+    """
+    Alert every user with a saved address within FIRE_ALERT_RADIUS_KM of a
+    cluster that is new or changed since the previous snapshot. A user near
+    several gets one alert, for the closest; FireAlerts remembers where each
+    user was alerted, so a fire within the radius of an earlier alert
+    (including the same fire under a new cluster id) doesn't alert them again.
+    """
+    if not FIRE_ALERTS_ENABLED:
+        return
+    try:
+        started = time.time()
+        features = snapshot["clusteredData"]["features"]
+        previous_index = load_cluster_index(nasaChangesCollection, since_ids[0]) if since_ids else None
+        index = cluster_index(features) if previous_index is not None else None
+        if index is not None:
+            changes = diff_clusters(previous_index, features, index)
+            candidates = changes["added"] + changes["updated"]
+        else:
+            # Nothing to diff against; FireAlerts still keeps repeats out
+            candidates = features
+
+        addresses = load_addresses(addressesCollection, userCollection)
+        matches = proximity_matches(candidates, addresses, FIRE_ALERT_RADIUS_KM)
+        alerts = record_new_alerts(fireAlertsCollection, matches, FIRE_ALERT_RADIUS_KM, str(snapshot["_id"]))
+        groups = alerts_by_cluster(alerts)
+
+        timestamp = datetime.datetime.utcnow().isoformat()
+        for cluster_id, group in groups.items():
+            notification_writer.submit({
+                "userID": alert["userID"],
+                "message": f"🔥 A wildfire was detected {alert['distanceKm']:g} km from {alert['label']}.",
+                "clusterID": cluster_id,
+                "coordinates": alert["coordinates"],
+                "seen": False,
+                "type": "fire_alert",
+                "createdAt": timestamp
+            } for alert in group)
+            notification_broker.publish([alert["userID"] for alert in group], {
+                "title": "Wildfire Detected Nearby",
+                "body": f"NASA satellites detected a fire within {FIRE_ALERT_RADIUS_KM:g} km of one of your addresses.",
+                "clusterID": cluster_id,
+                "coordinates": group[0]["coordinates"],
+                "timestamp": timestamp
+            })
+        print(f"🔥 Alerted {sum(len(g) for g in groups.values())} users about {len(groups)} fires "
+              f"({len(candidates)} new or changed clusters, {len(addresses)} addresses) in {time.time() - started:.2f}s")
+    except Exception as e:
+        # Alerts already recorded in FireAlerts are not resent
+        print(f"⚠️ Failed to send fire alerts: {e}")
+
+
+def _store_nasa_snapshot(nasa_data, current_time, days, force_refresh=False):
+    """
+    Insert a NASA snapshot (original + clustered data) and precompute its
+    multi-zoom cluster pyramid. Returns the stored document, including `_id`.
+
+    `nasa_data` carries the originals either as GeoJSON ("original") or as
+    FirmsDetections columns ("detections").
+    """
+    if "detections" in nasa_data:
+        original_features = nasa_data["detections"]
+    else:
+        original_features = nasa_data["original"]["features"]
+    mode = storage_config["mode"]
+    
+    wildfire_document = {
+        "lastUpdated": current_time.isoformat(),
+        "clusteredData": nasa_data["clustered"],        # Optimized for frontend
+        "clusteringMetadata": {
+            "enabled": nasa_data["clustering_enabled"],
+            "distance_km": nasa_data["cluster_distance_km"],
+            "original_count": nasa_data["original_count"],
+            "clustered_count": nasa_data["clustered_count"],
+            "reduction_percent": round(((nasa_data["original_count"] - nasa_data["clustered_count"]) / nasa_data["original_count"] * 100), 2) if nasa_data["original_count"] > 0 else 0
+        },
+        "source": "NASA_" + "+".join(nasa_data["sources"]) if nasa_data.get("sources") else "NASA_VIIRS_SNPP_NRT",
+        "bbox": [-140, 24, -50, 72],
+        "days": days,
+        "fetchedAt": current_time.isoformat()
+    }
+    if force_refresh:
+        wildfire_document["forceRefresh"] = True
+    if nasa_data.get("sources"):
+        # Detections fetched per FIRMS source, before cross-sensor dedup
+        wildfire_document["sourceCounts"] = nasa_data["sources"]
+    if "reclustered_count" in nasa_data:
+        # Detections in groups that changed since the previous refresh; the rest reused their clusters
+        wildfire_document["clusteringMetadata"]["reclustered_count"] = nasa_data["reclustered_count"]
+    if mode != "split":
+        # Full NASA data
+        wildfire_document["originalData"] = nasa_data.get("original") or {
+            "type": "FeatureCollection",
+            "features": original_features.to_features()
+        }
+    
+    # Assigned up front so detections and precompressed responses can refer to it before insert
+    wildfire_document["_id"] = ObjectId()
+    if mode in ("split", "both"):
+        # Write detections before the snapshot becomes visible to readers
+        written = write_detections(nasaDetectionsCollection, wildfire_document["_id"], original_features)
+        wildfire_document["detectionCount"] = written
+        if mode == "split":
+            wildfire_document["storageMode"] = "split"
+    
+    # Encode the map payloads once here instead of in every worker; the previous
+    # snapshot's stay stored for readers that have not seen this one yet
+    split_features = None
+    if mode == "split":
+        split_features = original_features if isinstance(original_features, list) else original_features.to_features()
+    previous = _latest_snapshot_head()
+    _store_precompressed(wildfire_document, {
+        "nasa": wildfire_document["clusteredData"],
+        "nasa.geobuf": wildfire_document["clusteredData"],
+        "original": _original_response_data(wildfire_document, split_features)
+    }, response_cache, [_snapshot_version(wildfire_document)] + ([_snapshot_version(previous)] if previous else []))
+    
+    # Diffs must exist before the snapshot becomes visible to /changes
+    since_ids = _store_cluster_changes(wildfire_document)
+    
+    nasaWildfiresCollection.insert_one(wildfire_document)
+    _snapshot_head_memo["head"] = {"_id": wildfire_document["_id"], "lastUpdated": wildfire_document["lastUpdated"]}
+    _snapshot_head_memo["checked_at"] = time.time()
+    
+    # Before pruning, which may drop the previous snapshot's cluster index
+    _send_fire_alerts(wildfire_document, since_ids)
+    
+    try:
+        # Only diffs into this snapshot are served; older indexes are kept for the next ones
+        prune_changes(nasaChangesCollection, wildfire_document["_id"],
+                      [wildfire_document["_id"]] + since_ids[:max(NASA_CHANGES_HISTORY - 1, 0)])
+    except Exception as e:
+        print(f"⚠️ Failed to prune wildfire changes: {e}")
+    
+    if mode in ("split", "both"):
+        retained = publish_manifest(
+            nasaManifestCollection,
+            wildfire_document["_id"],
+            wildfire_document["lastUpdated"],
+            wildfire_document["detectionCount"],
+            keep_snapshots=storage_config["keep_snapshots"]
+        )
+        pruned = prune_detections(nasaDetectionsCollection, retained)
+        print(f"Stored {wildfire_document['detectionCount']} detection documents ({pruned} old ones pruned)")
+    
+    try:
+        _get_cluster_pyramid(wildfire_document, original_features)
+    except Exception as e:
+        # The pyramid is rebuilt lazily on the next zoom query
+        print(f"⚠️ Failed to build cluster pyramid: {e}")
+    if mode == "document":
+        # Filtered /original queries on this snapshot need not read originalData back
+        _get_detection_index(wildfire_document["_id"], original_features)
+    return wildfire_document
+
+
+def _load_original_features(snapshot):
+    """Original detections of a snapshot, whichever way it was stored."""
+    if "originalData" in snapshot:
+        return snapshot["originalData"].get("features", [])
+    if snapshot.get("storageMode") == "split":
+        return find_detections(nasaDetectionsCollection, snapshot["_id"])
+    return snapshot.get("geojsonData", {}).get("features", [])
+
+
+def _get_cluster_pyramid(snapshot, features=None):
+    """Return the cluster pyramid for a snapshot document, building it on first use."""
+    key = str(snapshot["_id"])
+    if key in cluster_pyramids:
+        cluster_pyramids.move_to_end(key)
+        return cluster_pyramids[key]
+    
+    if features is None:
+        features = _load_original_features(snapshot)
+    start_time = time.time()
+    pyramid = build_cluster_pyramid(features)
+    print(f"Built cluster pyramid for snapshot {key} ({pyramid.point_count} points) in {time.time() - start_time:.2f}s")
+    
+    cluster_pyramids[key] = pyramid
+    while len(cluster_pyramids) > MAX_CACHED_PYRAMIDS:
+        cluster_pyramids.popitem(last=False)
+    return pyramid
+
+
+def _get_detection_index(snapshot_id, features=None):
+    """
+    DetectionIndex over a document-stored snapshot's original detections,
+    built on first use. None if the snapshot no longer exists.
+    """
+    key = str(snapshot_id)
+    if key in detection_indexes:
+        detection_indexes.move_to_end(key)
+        return detection_indexes[key]
+    
+    if features is None:
+        snapshot = nasaWildfiresCollection.find_one(
+            {"_id": snapshot_id}, {"originalData.features": 1, "geojsonData.features": 1, "storageMode": 1}
+        )
+        if not snapshot:
+            return None
+        features = _load_original_features(dict(snapshot, _id=snapshot_id))
+    if isinstance(features, list):
+        index = DetectionIndex.from_features(features)
+    else:
+        index = DetectionIndex.from_detections(features)
+    
+    detection_indexes[key] = index
+    while len(detection_indexes) > MAX_CACHED_DETECTION_INDEXES:
+        detection_indexes.popitem(last=False)
+    return index
+
+
+def _cluster_pyramid_response(snapshot, zoom, bbox):
+    pyramid = _get_cluster_pyramid(snapshot)
+    return jsonify(get_clusters(pyramid, bbox, zoom)), 200, {'Content-Type': 'application/json'}
+
+
+# Only one NASA pull at a time: per process via a lock, across workers via a
+# lease document in RefreshLeases
+nasa_refresh = RefreshCoordinator(
+    "nasa",
+    lease_collection=refreshLeasesCollection,
+    lease_seconds=int(os.getenv("NASA_REFRESH_LEASE_SECONDS", 600))
+)
+
+
+def _refresh_nasa_snapshot(stored_days=2, force_refresh=False):
+    """Fetch NASA FIRMS data and store it as a new snapshot. Run through `nasa_refresh`."""
+    # All configured sensors are fetched in parallel and merged into one snapshot
+    parts = fetch_nasa_sources(
+        map_key=mapbox_api,
+        sources=firms_config['sources'],
+        bbox=[-140, 24, -50, 72],
+        days=2
+    )
+    detections = merge_detections(
+        parts,
+        distance_km=firms_config['dedup_distance_km'],
+        window_minutes=firms_config['dedup_window_minutes']
+    )
+    # Clustering and storage work on the columns; feature dicts are built per batch
+    nasa_data = cluster_nasa_detections(
+        detections,
+        enable_clustering=clustering_config['enable_clustering'],
+        cluster_distance_km=clustering_config['cluster_distance_km'],
+        cluster_workers=clustering_config['workers'],
+        clusterer=nasa_clusterer if clustering_config['incremental'] else None
+    )
+    nasa_data["sources"] = {source: len(part) for source, part in parts.items()}
+    
+    # Store both versions in the database (keep all historical entries as backup)
+    current_time = datetime.datetime.now()
+    wildfire_document = _store_nasa_snapshot(nasa_data, current_time, days=stored_days, force_refresh=force_refresh)
+    print(f"Updated wildfire database with {nasa_data['original_count']} original features, {nasa_data['clustered_count']} clustered features")
+    return wildfire_document
+
+
+def _refresh_stale_nasa_snapshot(max_age_seconds=NASA_MAX_AGE_SECONDS):
+    # Another worker may have stored a fresh snapshot while we waited for the lease
+    head = _latest_snapshot_head()
+    if head and _snapshot_age_seconds(head, datetime.datetime.now()) < max_age_seconds:
+        return None
+    print("Fetching fresh wildfire data from NASA API")
+    return _refresh_nasa_snapshot(stored_days=4)
+
+
+def _refresh_if_stale(head, current_time):
+    if head and _snapshot_age_seconds(head, current_time) >= NASA_MAX_AGE_SECONDS:
+        # Stale-while-revalidate: keep serving this snapshot while a single
+        # background refresh (across all workers) replaces it
+        if nasa_refresh.refresh_in_background(_refresh_stale_nasa_snapshot):
+            print("Wildfire data is older than 4 hours - refreshing in the background")
+
+
 @app.route('/wildfires/nasa', methods=['GET'])
 def getNasaWildfires():
+    """
+    Clustered NASA wildfire data.
+    Optional query params (return the cluster level for the current viewport):
+      zoom=5                              map zoom level
+      bbox=minLon,minLat,maxLon,maxLat    viewport (defaults to the whole map)
+    Or, for the whole collection:
+      format=geobuf                       Geobuf instead of GeoJSON (see utils.geobuf)
+    """
+    zoom = request.args.get('zoom')
+    bbox = request.args.get('bbox')
+    output_format = _requested_format()
+    if output_format is None:
+        return _invalid_format_response()
+    if zoom is not None and output_format != "geojson":
+        return jsonify({"error": "format is only supported without zoom"}), 400
+    key = _format_key("nasa", output_format)
+    if zoom is not None:
+        try:
+            zoom = float(zoom)
+            bbox = [float(x) for x in bbox.split(',')] if bbox else [-180, -85, 180, 85]
+            if len(bbox) != 4:
+                raise ValueError("bbox needs 4 values")
+            if not all(math.isfinite(v) for v in [zoom, *bbox]):
+                raise ValueError("zoom and bbox must be finite")
+        except ValueError:
+            return jsonify({"error": "Invalid zoom or bbox (expected zoom=<number>&bbox=minLon,minLat,maxLon,maxLat)"}), 400
+    
     try:
-        # Check if we have recent data in the database
+        current_time = datetime.datetime.now()
+        head = _current_snapshot_head()
+        _refresh_if_stale(head, current_time)
+        
+        if zoom is None and head:
+            cached = _cached_response(key, head)
+            if cached is not None:
+                return cached
+        
+        # Check if we have data in the database
         # Use limit(1) to avoid memory issues with large collections
         latest_data_cursor = nasaWildfiresCollection.find({}).sort([("lastUpdated", -1)]).limit(1)
         latest_data = None
@@ -801,96 +1439,62 @@ def getNasaWildfires():
             latest_data = doc
             break
         
-        current_time = datetime.datetime.now()
-        should_fetch_new = True
-        
         if latest_data:
-            last_updated = latest_data.get("lastUpdated")
-            if isinstance(last_updated, str):
-                last_updated = datetime.datetime.fromisoformat(last_updated)
-            elif isinstance(last_updated, datetime.datetime):
-                pass  # Already a datetime object
-            else:
-                last_updated = datetime.datetime.min  # Force update if invalid format
-            print(f"Last updated: {last_updated}, Current time: {current_time}")
+            print(f"Last updated: {latest_data.get('lastUpdated')}, Current time: {current_time}")
+            print("Using cached wildfire data from database")
             
-            # Check if data is less than 4 hours old (adjust as needed)
-            time_diff = current_time - last_updated
-            if time_diff.total_seconds() < 14400:  # 4 hours in seconds
-                should_fetch_new = False
-                print("Using cached wildfire data from database")
+            # Return cached clustered data (for performance) 
+            # Check for new data structure first, fallback to old structure
+            if "clusteredData" in latest_data:
+                geojson_data = latest_data["clusteredData"]
+                print(f"Returning cached clustered data with {len(geojson_data.get('features', []))} features")
+            elif "geojsonData" in latest_data:
+                # Legacy data - apply clustering on-the-fly
+                print("Legacy data detected - applying clustering on-the-fly...")
+                legacy_geojson = latest_data["geojsonData"]
+                legacy_features = legacy_geojson.get("features", [])
                 
-                # Return cached clustered data (for performance) 
-                # Check for new data structure first, fallback to old structure
-                if "clusteredData" in latest_data:
-                    geojson_data = latest_data["clusteredData"]
-                    print(f"Returning cached clustered data with {len(geojson_data.get('features', []))} features")
-                elif "geojsonData" in latest_data:
-                    # Legacy data - apply clustering on-the-fly
-                    print("Legacy data detected - applying clustering on-the-fly...")
-                    legacy_geojson = latest_data["geojsonData"]
-                    legacy_features = legacy_geojson.get("features", [])
-                    
-                    if len(legacy_features) > 1 and clustering_config['enable_clustering']:
-                        clustered_features = cluster_geojson_points(
-                            legacy_features, 
-                            clustering_config['cluster_distance_km']
-                        )
-                        print(f"Applied clustering: {len(legacy_features)} → {len(clustered_features)} features")
-                        geojson_data = {
-                            "type": "FeatureCollection",
-                            "features": clustered_features
-                        }
-                    else:
-                        geojson_data = legacy_geojson
-                        print("Using legacy data without clustering")
-                else:
-                    # No data found
+                if len(legacy_features) > 1 and clustering_config['enable_clustering']:
+                    clustered_features = cluster_geojson_points(
+                        legacy_features, 
+                        clustering_config['cluster_distance_km'],
+                        workers=clustering_config['workers']
+                    )
+                    print(f"Applied clustering: {len(legacy_features)} → {len(clustered_features)} features")
                     geojson_data = {
-                        "type": "FeatureCollection", 
-                        "features": []
+                        "type": "FeatureCollection",
+                        "features": clustered_features
                     }
-                    print("No data found - returning empty collection")
-                
-                return jsonify(geojson_data), 200, {'Content-Type': 'application/json'}
-        
-        if should_fetch_new:
-            print("Fetching fresh wildfire data from NASA API")
-            # Fetch both original and clustered data from NASA API
-            nasa_data = fetch_nasa_geojson(
-                map_key=mapbox_api,
-                source="VIIRS_SNPP_NRT",
-                bbox=[-140, 24, -50, 72],
-                days=2,
-                enable_clustering=clustering_config['enable_clustering'],
-                cluster_distance_km=clustering_config['cluster_distance_km'],
-                return_both=True
-            )
-            
-            # Store both versions in the database
-            wildfire_document = {
-                "lastUpdated": current_time.isoformat(),
-                "originalData": nasa_data["original"],          # Full NASA data
-                "clusteredData": nasa_data["clustered"],        # Optimized for frontend
-                "clusteringMetadata": {
-                    "enabled": nasa_data["clustering_enabled"],
-                    "distance_km": nasa_data["cluster_distance_km"],
-                    "original_count": nasa_data["original_count"],
-                    "clustered_count": nasa_data["clustered_count"],
-                    "reduction_percent": round(((nasa_data["original_count"] - nasa_data["clustered_count"]) / nasa_data["original_count"] * 100), 2) if nasa_data["original_count"] > 0 else 0
-                },
-                "source": "NASA_VIIRS_SNPP_NRT",
-                "bbox": [-140, 24, -50, 72],
-                "days": 4,
-                "fetchedAt": current_time.isoformat()
-            }
+                else:
+                    geojson_data = legacy_geojson
+                    print("Using legacy data without clustering")
+            else:
+                # No data found
+                geojson_data = {
+                    "type": "FeatureCollection", 
+                    "features": []
+                }
+                print("No data found - returning empty collection")
             
-            # Insert new data (keep all historical entries as backup)
-            nasaWildfiresCollection.insert_one(wildfire_document)
-            print(f"Updated wildfire database with {nasa_data['original_count']} original features, {nasa_data['clustered_count']} clustered features")
+            if zoom is not None:
+                return _cluster_pyramid_response(latest_data, zoom, bbox)
             
-            # Return the clustered data to the client (optimized payload)
-            return jsonify(nasa_data["clustered"]), 200, {'Content-Type': 'application/json'}
+            return _cache_json_response(latest_data, key, geojson_data)
+        
+        # Empty database: fetch now, with concurrent requests sharing one NASA pull
+        wildfire_document = nasa_refresh.refresh(_refresh_stale_nasa_snapshot)
+        if wildfire_document is None:
+            # Another worker is fetching (or just stored) the first snapshot
+            nasa_refresh.wait_for_release()
+            wildfire_document = nasaWildfiresCollection.find_one({}, sort=[("lastUpdated", -1)])
+            if not wildfire_document:
+                return jsonify({"error": "Wildfire data is being fetched, try again shortly"}), 503
+        
+        if zoom is not None:
+            return _cluster_pyramid_response(wildfire_document, zoom, bbox)
+        
+        # Return the clustered data to the client (optimized payload)
+        return _cache_json_response(wildfire_document, key, wildfire_document["clusteredData"])
             
     except Exception as e:
         print(f"Error in getNasaWildfires: {str(e)}")
@@ -915,50 +1519,88 @@ def getNasaWildfires():
         return jsonify({"error": "Failed to fetch wildfire data", "message": str(e)}), 500
 
 
+@app.route('/wildfires/nasa/changes', methods=['GET'])
+def getNasaWildfireChanges():
+    """
+    Clusters added, updated and removed since a snapshot the client already has,
+    matched by their GeoJSON `id`.
+    Query params:
+      since=<snapshotId>   `snapshotId` of the client's previous reply
+    Without `since`, or when it is older than the last NASA_CHANGES_HISTORY
+    snapshots, the reply is a full reload: {"full": true, "data": <clustered GeoJSON>}.
+    """
+    since = request.args.get('since')
+    if since is not None and not ObjectId.is_valid(since):
+        return jsonify({"error": "Invalid since (expected the snapshotId of a previous reply)"}), 400
+    
+    try:
+        head = _current_snapshot_head()
+        if not head:
+            return jsonify({"error": "No wildfire data yet, try /wildfires/nasa first"}), 404
+        _refresh_if_stale(head, datetime.datetime.now())
+        snapshot_id = str(head["_id"])
+        
+        if since:
+            key = f"changes:{since}"
+            cached = _cached_response(key, head)
+            if cached is not None:
+                return cached
+            if since == snapshot_id:
+                changes = {"added": [], "updated": [], "removed": []}
+            else:
+                changes = load_changes(nasaChangesCollection, since, snapshot_id)
+            if changes and not changes.get("full"):
+                return _cache_json_response(head, key, {
+                    "since": since,
+                    "snapshotId": snapshot_id,
+                    "lastUpdated": head.get("lastUpdated"),
+                    "full": False,
+                    "added": changes["added"],
+                    "updated": changes["updated"],
+                    "removed": changes["removed"]
+                })
+            print(f"No change set from snapshot {since} - sending a full reload")
+        
+        # Shared by every client that needs the whole snapshot
+        cached = _cached_response("changes:full", head)
+        if cached is not None:
+            return cached
+        latest = nasaWildfiresCollection.find_one({"_id": head["_id"]}, {"clusteredData": 1})
+        if not latest:
+            return jsonify({"error": "Wildfire data is being replaced, try again shortly"}), 503
+        return _cache_json_response(head, "changes:full", {
+            "snapshotId": snapshot_id,
+            "lastUpdated": head.get("lastUpdated"),
+            "full": True,
+            "data": latest.get("clusteredData", {"type": "FeatureCollection", "features": []})
+        })
+    
+    except Exception as e:
+        print(f"Error in getNasaWildfireChanges: {str(e)}")
+        return jsonify({"error": "Failed to fetch wildfire changes", "message": str(e)}), 500
+
+
 @app.route('/wildfires/nasa/refresh', methods=['POST'])
 def refreshNasaWildfires():
     """Force refresh wildfire data from NASA API"""
     try:
         print("Force refreshing wildfire data from NASA API")
-        nasa_data = fetch_nasa_geojson(
-            map_key=mapbox_api,
-            source="VIIRS_SNPP_NRT",
-            bbox=[-140, 24, -50, 72],
-            days=2,
-            enable_clustering=clustering_config['enable_clustering'],
-            cluster_distance_km=clustering_config['cluster_distance_km'],
-            return_both=True
+        # Joins a refresh already running in this process instead of starting a second one
+        wildfire_document = nasa_refresh.refresh(
+            lambda: _refresh_nasa_snapshot(stored_days=2, force_refresh=True)
         )
+        if wildfire_document is None:
+            return jsonify({"message": "A wildfire refresh is already running, try again shortly"}), 202
         
-        current_time = datetime.datetime.now()
-        wildfire_document = {
-            "lastUpdated": current_time.isoformat(),
-            "originalData": nasa_data["original"],          # Full NASA data
-            "clusteredData": nasa_data["clustered"],        # Optimized for frontend
-            "clusteringMetadata": {
-                "enabled": nasa_data["clustering_enabled"],
-                "distance_km": nasa_data["cluster_distance_km"],
-                "original_count": nasa_data["original_count"],
-                "clustered_count": nasa_data["clustered_count"],
-                "reduction_percent": round(((nasa_data["original_count"] - nasa_data["clustered_count"]) / nasa_data["original_count"] * 100), 2) if nasa_data["original_count"] > 0 else 0
-            },
-            "source": "NASA_VIIRS_SNPP_NRT",
-            "bbox": [-140, 24, -50, 72],
-            "days": 2,
-            "fetchedAt": current_time.isoformat(),
-            "forceRefresh": True
-        }
-        
-        # Insert new data
-        nasaWildfiresCollection.insert_one(wildfire_document)
-        print(f"Force updated wildfire database with {nasa_data['original_count']} original features, {nasa_data['clustered_count']} clustered features")
+        metadata = wildfire_document["clusteringMetadata"]
+        print(f"Force updated wildfire database with {metadata['original_count']} original features, {metadata['clustered_count']} clustered features")
         
         return jsonify({
             "message": "Wildfire data refreshed successfully",
-            "original_count": nasa_data["original_count"],
-            "clustered_count": nasa_data["clustered_count"],
-            "reduction_percent": wildfire_document["clusteringMetadata"]["reduction_percent"],
-            "updated_at": current_time.isoformat()
+            "original_count": metadata["original_count"],
+            "clustered_count": metadata["clustered_count"],
+            "reduction_percent": metadata["reduction_percent"],
+            "updated_at": wildfire_document["lastUpdated"]
         }), 200
         
     except Exception as e:
@@ -966,15 +1608,80 @@ def refreshNasaWildfires():
         return jsonify({"error": "Failed to refresh wildfire data", "message": str(e)}), 500
 
 
+# Encoded vector tiles for the latest snapshot; dropped when lastUpdated changes
+wildfire_tile_cache = LRUCache(max_entries=int(os.getenv("TILE_CACHE_SIZE", 4096)))
+
+
+def _latest_snapshot_head():
+    """_id and lastUpdated of the newest NASA snapshot, without loading its data."""
+    for doc in nasaWildfiresCollection.find({}, {"_id": 1, "lastUpdated": 1}).sort([("lastUpdated", -1)]).limit(1):
+        return doc
+    return None
+
+
+@app.route('/wildfires/tiles/<int:z>/<int:x>/<int:y>.mvt', methods=['GET'])
+def getWildfireTile(z, x, y):
+    """
+    Mapbox Vector Tile (layer "wildfires") for the latest NASA snapshot.
+    Low zooms carry cluster summaries from the cluster pyramid, zooms past 16 carry raw detections.
+    """
+    if not (0 <= z <= 24 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({"error": "Invalid tile coordinates"}), 400
+    
+    try:
+        head = _latest_snapshot_head()
+        if not head:
+            return jsonify({"error": "No wildfire data available"}), 404
+        
+        version = f"{head['_id']}:{head.get('lastUpdated')}"
+        tile = wildfire_tile_cache.get(version, (z, x, y))
+        if tile is None:
+            snapshot = head
+            if str(head["_id"]) not in cluster_pyramids:
+                snapshot = nasaWildfiresCollection.find_one(
+                    {"_id": head["_id"]},
+                    {"originalData": 1, "geojsonData": 1, "storageMode": 1}
+                )
+            tile = encode_wildfire_tile(_get_cluster_pyramid(snapshot), z, x, y)
+            wildfire_tile_cache.put(version, (z, x, y), tile)
+        
+        return Response(tile, mimetype='application/vnd.mapbox-vector-tile', headers={
+            'Cache-Control': 'public, max-age=300'
+        })
+    
+    except Exception as e:
+        print(f"Error in getWildfireTile: {str(e)}")
+        return jsonify({"error": "Failed to build wildfire tile", "message": str(e)}), 500
+
+
 ##################### AQI Data #####################
 
+def _latest_aqi_head():
+    """_id and lastUpdated of the newest AQI snapshot (updated in place by partial refreshes)."""
+    for doc in aqiCollection.find({}, {"_id": 1, "lastUpdated": 1}).sort([("lastUpdated", -1)]).limit(1):
+        return doc
+    return None
+
+
 @app.route('/aq/openweather/latest', methods=['GET'])
 def api_openweather_latest():
     """
     Fetch latest OpenWeather AQI data from database (returns pre-formatted GeoJSON).
     No processing - returns originalData directly.
+    Optional query params:
+      format=geobuf    Geobuf instead of GeoJSON
     """
+    output_format = _requested_format()
+    if output_format is None:
+        return _invalid_format_response()
+    key = _format_key("openweather", output_format)
     try:
+        head = _latest_aqi_head()
+        if head:
+            cached = _cached_response(key, head, cache=aqi_response_cache)
+            if cached is not None:
+                return cached
+        
         # Get the latest OpenWeather AQI data from database
         latest_data_cursor = aqiCollection.find({}).sort([("lastUpdated", -1)]).limit(1)
         latest_data = None
@@ -991,7 +1698,7 @@ def api_openweather_latest():
         if not original_data:
             return jsonify({"error": "No original data found"}), 404
             
-        return jsonify(original_data), 200, {'Content-Type': 'application/json'}
+        return _cache_json_response(latest_data, key, original_data, cache=aqi_response_cache)
         
     except Exception as e:
         print(f"Error in api_openweather_latest: {str(e)}")
@@ -1081,15 +1788,83 @@ def health_check():
     try:
         # Perform a simple database operation to check connectivity
         db.command("ping")
-        return jsonify({"status": "ok"}), 200
+        return jsonify({"status": "ok", "notificationWriter": notification_writer.stats()}), 200
     except Exception as e:
         print(f"Health check failed: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+def _original_response_data(snapshot, split_features=None):
+    """
+    Body of /wildfires/nasa/original for a snapshot. `split_features` saves
+    reading back the detections of a split-storage snapshot that is being stored.
+    """
+    if snapshot.get("storageMode") == "split":
+        features = split_features if split_features is not None else _load_original_features(snapshot)
+        return {
+            "data": {"type": "FeatureCollection", "features": features},
+            "metadata": {
+                "original_count": len(features),
+                "last_updated": snapshot.get("lastUpdated"),
+                "source": snapshot.get("source", "NASA_VIIRS_SNPP_NRT"),
+                "note": "This is the complete, unfiltered NASA FIRMS data"
+            }
+        }
+    
+    # Return original data if available
+    if "originalData" in snapshot:
+        original_data = snapshot["originalData"]
+        metadata = snapshot.get("clusteringMetadata", {})
+        return {
+            "data": original_data,
+            "metadata": {
+                "original_count": metadata.get("original_count", len(original_data.get("features", []))),
+                "last_updated": snapshot.get("lastUpdated"),
+                "source": snapshot.get("source", "NASA_VIIRS_SNPP_NRT"),
+                "note": "This is the complete, unfiltered NASA FIRMS data"
+            }
+        }
+    
+    # Fallback for legacy data structure
+    legacy_data = snapshot.get("geojsonData", {
+        "type": "FeatureCollection",
+        "features": []
+    })
+    return {
+        "data": legacy_data,
+        "metadata": {
+            "original_count": len(legacy_data.get("features", [])),
+            "last_updated": snapshot.get("lastUpdated"),
+            "source": snapshot.get("source", "NASA_VIIRS_SNPP_NRT"),
+            "note": "Legacy data format - clustering not available"
+        }
+    }
+
+
 @app.route('/wildfires/nasa/original', methods=['GET'])
 def getNasaWildfiresOriginal():
-    """Get the original (non-clustered) NASA wildfire data"""
+    """
+    Get the original (non-clustered) NASA wildfire data
+    Optional query params:
+      format=geobuf    Geobuf instead of GeoJSON; the metadata becomes a custom property of the collection
+    Filters (any of them returns one page of matching detections, see ORIGINAL_QUERY_PARAMS):
+      bbox=minLon,minLat,maxLon,maxLat
+      since=2025-08-01T12:00 | 6h        acquired at/after a UTC time, or within the last 90m/6h/2d
+      min_confidence=nominal | 50        low/nominal/high (VIIRS classes) or a MODIS percentage
+      min_frp=10                         fire radiative power (MW)
+      limit=5000                         page size (at most MAX_ORIGINAL_PAGE_SIZE)
+      cursor=...                         metadata.next_cursor of the previous page
+    """
+    output_format = _requested_format()
+    if output_format is None:
+        return _invalid_format_response()
+    if any(request.args.get(name) for name in ORIGINAL_QUERY_PARAMS):
+        return _original_page_response(output_format)
+    key = _format_key("original", output_format)
     try:
+        cached = _cached_response(key)
+        if cached is not None:
+            return cached
+        
         # Get the latest data from database using limit(1)
         latest_data_cursor = nasaWildfiresCollection.find({}).sort([("lastUpdated", -1)]).limit(1)
         latest_data = None
@@ -1100,44 +1875,203 @@ def getNasaWildfiresOriginal():
         if not latest_data:
             return jsonify({"error": "No wildfire data available"}), 404
         
-        # Return original data if available
-        if "originalData" in latest_data:
-            original_data = latest_data["originalData"]
-            metadata = latest_data.get("clusteringMetadata", {})
-            
-            return jsonify({
-                "data": original_data,
-                "metadata": {
-                    "original_count": metadata.get("original_count", len(original_data.get("features", []))),
-                    "last_updated": latest_data.get("lastUpdated"),
-                    "source": latest_data.get("source", "NASA_VIIRS_SNPP_NRT"),
-                    "note": "This is the complete, unfiltered NASA FIRMS data"
-                }
-            }), 200
-        else:
-            # Fallback for legacy data structure
-            legacy_data = latest_data.get("geojsonData", {
-                "type": "FeatureCollection",
-                "features": []
-            })
-            return jsonify({
-                "data": legacy_data,
-                "metadata": {
-                    "original_count": len(legacy_data.get("features", [])),
-                    "last_updated": latest_data.get("lastUpdated"),
-                    "source": latest_data.get("source", "NASA_VIIRS_SNPP_NRT"),
-                    "note": "Legacy data format - clustering not available"
-                }
-            }), 200
+        data = _original_response_data(latest_data)
+        if output_format != "geojson":
+            data = dict(data["data"], metadata=data["metadata"])
+        return _cache_json_response(latest_data, key, data)
             
     except Exception as e:
         print(f"Error in getNasaWildfiresOriginal: {str(e)}")
         return jsonify({"error": "Failed to fetch original wildfire data", "message": str(e)}), 500
 
+# Query params that turn /wildfires/nasa/original into a filtered, paginated query
+ORIGINAL_QUERY_PARAMS = ("bbox", "since", "min_confidence", "min_frp", "limit", "cursor")
+MAX_ORIGINAL_PAGE_SIZE = 50000
+
+
+def _original_query_filters():
+    """Filters from the query string; raises ValueError on a bad value."""
+    filters = {}
+    if request.args.get('bbox'):
+        filters["bbox"] = [float(x) for x in request.args['bbox'].split(',')]
+        if len(filters["bbox"]) != 4:
+            raise ValueError("bbox needs 4 values")
+        validate_bbox(filters["bbox"])
+    if request.args.get('since'):
+        filters["since"] = parse_since(request.args['since'])
+    if request.args.get('min_confidence'):
+        filters["min_confidence"] = confidence_score(request.args['min_confidence'])
+        if filters["min_confidence"] is None:
+            raise ValueError("min_confidence must be low, nominal, high or a percentage")
+    if request.args.get('min_frp'):
+        filters["min_frp"] = float(request.args['min_frp'])
+    return filters
+
+
+def _encode_page_cursor(snapshot_id, after):
+    return base64.urlsafe_b64encode(f"{snapshot_id}:{after}".encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_page_cursor(cursor):
+    """(snapshot ObjectId, position after which the page starts); raises ValueError."""
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    snapshot_id, _, after = text.partition(":")
+    if not ObjectId.is_valid(snapshot_id) or not after:
+        raise ValueError("Invalid cursor")
+    return ObjectId(snapshot_id), after
+
+
+def _snapshot_gone_response():
+    return jsonify({"error": "The snapshot of this cursor is no longer kept, start again without cursor"}), 410
+
+
+def _original_page_response(output_format):
+    """
+    One page of a snapshot's original detections matching the query filters.
+    Split storage answers from NasaWildfireDetections (2dsphere and
+    acquiredAt indexes); document storage from an in-memory DetectionIndex.
+    A cursor stays on the snapshot the first page came from while it is retained.
+    """
+    try:
+        filters = _original_query_filters()
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+        if not 1 <= limit <= MAX_ORIGINAL_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_ORIGINAL_PAGE_SIZE}")
+        cursor = _decode_page_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query: {e}"}), 400
+    
+    try:
+        if cursor:
+            snapshot_id, after = cursor
+        else:
+            head = _current_snapshot_head()
+            if not head:
+                return jsonify({"error": "No wildfire data available"}), 404
+            snapshot_id, after = head["_id"], None
+        snapshot = nasaWildfiresCollection.find_one(
+            {"_id": snapshot_id}, {"lastUpdated": 1, "source": 1, "detectionCount": 1}
+        )
+        if not snapshot:
+            return _snapshot_gone_response()
+        
+        if "detectionCount" in snapshot:
+            # Detections were written one per document (split/both storage)
+            manifest = current_manifest(nasaManifestCollection) or {}
+            if snapshot_id not in manifest.get("recentSnapshotIds", []):
+                return _snapshot_gone_response()
+            if after is not None and not ObjectId.is_valid(after):
+                return jsonify({"error": "Invalid query: Invalid cursor"}), 400
+            features, next_after = find_detection_page(
+                nasaDetectionsCollection, snapshot_id, after_id=ObjectId(after) if after else None, limit=limit, **filters
+            )
+        else:
+            if after is not None and not after.isdigit():
+                return jsonify({"error": "Invalid query: Invalid cursor"}), 400
+            index = _get_detection_index(snapshot_id)
+            if index is None:
+                return _snapshot_gone_response()
+            features, next_after = index.query(after=int(after) if after else -1, limit=limit, **filters)
+        
+        collection = {"type": "FeatureCollection", "features": features}
+        metadata = {
+            "count": len(features),
+            "last_updated": snapshot.get("lastUpdated"),
+            "source": snapshot.get("source", "NASA_VIIRS_SNPP_NRT"),
+            "snapshot_id": str(snapshot_id),
+            "filters": {name: value.isoformat() if isinstance(value, datetime.datetime) else value
+                        for name, value in filters.items()},
+            "next_cursor": _encode_page_cursor(snapshot_id, next_after) if next_after is not None else None
+        }
+        if output_format == "geobuf":
+            body = encode_geobuf(dict(collection, metadata=metadata))
+            return _payload_response(EncodedPayload(body, mimetype=GEOBUF_MIMETYPE))
+        return jsonify({"data": collection, "metadata": metadata}), 200
+    
+    except Exception as e:
+        print(f"Error in getNasaWildfiresOriginal: {str(e)}")
+        return jsonify({"error": "Failed to query original wildfire data", "message": str(e)}), 500
+
+
+@app.route('/wildfires/nasa/detections', methods=['GET'])
+def getNasaDetections():
+    """
+    Raw NASA detections inside a bbox and/or radius.
+    Query params:
+      bbox=minLon,minLat,maxLon,maxLat
+      lat=..&lon=..&radius_km=..          radius_km defaults to 10, at most MAX_RADIUS_KM
+    Answered from the per-detection collection (2dsphere index) when split storage is enabled.
+    """
+    try:
+        bbox = request.args.get('bbox')
+        bbox = [float(x) for x in bbox.split(',')] if bbox else None
+        center = None
+        radius_km = None
+        if 'lat' in request.args or 'lon' in request.args:
+            center = [float(request.args['lon']), float(request.args['lat'])]
+            radius_km = float(request.args.get('radius_km', 10))
+            validate_circle(center, radius_km)
+        if bbox is not None:
+            if len(bbox) != 4:
+                raise ValueError("bbox needs 4 values")
+            validate_bbox(bbox)
+    except (KeyError, ValueError):
+        return jsonify({"error": "Use bbox=minLon,minLat,maxLon,maxLat and/or lat=..&lon=..&radius_km=.. "
+                                 f"(radius_km at most {MAX_RADIUS_KM})"}), 400
+    
+    if bbox is None and center is None:
+        return jsonify({"error": "Missing bbox or lat/lon"}), 400
+    
+    try:
+        latest = None
+        for doc in nasaWildfiresCollection.find({}, {"lastUpdated": 1, "detectionCount": 1}).sort([("lastUpdated", -1)]).limit(1):
+            latest = doc
+        if not latest:
+            return jsonify({"error": "No wildfire data available"}), 404
+        
+        # The manifest outlives a switch back to document storage; only trust it for the latest snapshot
+        manifest = current_manifest(nasaManifestCollection) or {}
+        if "detectionCount" in latest or manifest.get("snapshotId") == latest["_id"]:
+            features = find_detections(nasaDetectionsCollection, latest["_id"], bbox=bbox, center=center, radius_km=radius_km)
+        else:
+            # Document storage: filter the latest snapshot in memory
+            latest_data = nasaWildfiresCollection.find_one({"_id": latest["_id"]})
+            features = _filter_features(_load_original_features(latest_data), bbox, center, radius_km)
+        last_updated = latest.get("lastUpdated")
+        
+        return jsonify({
+            "data": {"type": "FeatureCollection", "features": features},
+            "metadata": {"count": len(features), "last_updated": last_updated}
+        }), 200
+    
+    except Exception as e:
+        print(f"Error in getNasaDetections: {str(e)}")
+        return jsonify({"error": "Failed to fetch wildfire detections", "message": str(e)}), 500
+
+
+def _filter_features(features, bbox=None, center=None, radius_km=None):
+    if not features:
+        return []
+    lons = np.array([f["geometry"]["coordinates"][0] for f in features], dtype=float)
+    lats = np.array([f["geometry"]["coordinates"][1] for f in features], dtype=float)
+    mask = np.ones(len(features), dtype=bool)
+    if bbox is not None:
+        mask &= (lons >= bbox[0]) & (lons <= bbox[2]) & (lats >= bbox[1]) & (lats <= bbox[3])
+    if center is not None:
+        mask &= haversine_one_to_many(center[1], center[0], lats, lons) <= radius_km
+    return [features[k] for k in np.flatnonzero(mask)]
+
 @app.route('/wildfires/clustering/stats', methods=['GET'])
 def get_clustering_stats():
     """Get clustering statistics from the latest dataset"""
     try:
+        cached = _cached_response("stats")
+        if cached is not None:
+            return cached
+        
         # Use limit(1) for consistency
         latest_data_cursor = nasaWildfiresCollection.find({}).sort([("lastUpdated", -1)]).limit(1)
         latest_data = None
@@ -1150,7 +2084,7 @@ def get_clustering_stats():
         
         if "clusteringMetadata" in latest_data:
             metadata = latest_data["clusteringMetadata"]
-            return jsonify({
+            return _cache_json_response(latest_data, "stats", {
                 "clustering_enabled": metadata.get("enabled", False),
                 "cluster_distance_km": metadata.get("distance_km", 0),
                 "original_count": metadata.get("original_count", 0),
@@ -1159,11 +2093,11 @@ def get_clustering_stats():
                 "data_saved": f"{metadata.get('reduction_percent', 0):.1f}% reduction in payload size",
                 "last_updated": latest_data.get("lastUpdated"),
                 "current_config": clustering_config
-            }), 200
+            })
         else:
             # Legacy data without clustering metadata
             features_count = len(latest_data.get("geojsonData", {}).get("features", []))
-            return jsonify({
+            return _cache_json_response(latest_data, "stats", {
                 "clustering_enabled": False,
                 "original_count": features_count,
                 "clustered_count": features_count,
@@ -1171,7 +2105,7 @@ def get_clustering_stats():
                 "note": "Legacy data format - clustering metadata not available",
                 "last_updated": latest_data.get("lastUpdated"),
                 "current_config": clustering_config
-            }), 200
+            })
             
     except Exception as e:
         print(f"Error in get_clustering_stats: {str(e)}")
@@ -1180,9 +2114,17 @@ def get_clustering_stats():
 # Global clustering configuration
 clustering_config = {
     "enable_clustering": True,
-    "cluster_distance_km": 0.2
+    "cluster_distance_km": 0.2,
+    # Processes used to cluster large pulls: in-process unless configured
+    # (0 means one per CPU, which scripts/scheduler.py uses by default)
+    "workers": int(os.getenv("CLUSTER_WORKERS", 1)) or None,
+    # Re-cluster only the detections that changed since the previous refresh
+    "incremental": os.getenv("NASA_INCREMENTAL_CLUSTERING", "true").lower() != "false"
 }
 
+# Clusters of this process's last refresh, reused by the next incremental one
+nasa_clusterer = IncrementalClusterer()
+
 @app.route('/wildfires/clustering/config', methods=['GET'])
 def get_clustering_config():
     """Get current clustering configuration."""
@@ -1204,6 +2146,22 @@ def set_clustering_config():
             else:
                 return jsonify({"error": "cluster_distance_km must be positive"}), 400
         
+        if 'incremental' in data:
+            clustering_config['incremental'] = bool(data['incremental'])
+        
+        if 'workers' in data:
+            if data['workers'] is None:
+                clustering_config['workers'] = None
+            else:
+                workers = int(data['workers'])
+                if workers > 0:
+                    clustering_config['workers'] = workers
+                else:
+                    return jsonify({"error": "workers must be positive"}), 400
+        
+        # Cached stats embed the config, and legacy snapshots are clustered with it
+        response_cache.clear()
+        
         return jsonify({
             "message": "Clustering configuration updated",
             "config": clustering_config
@@ -1216,6 +2174,83 @@ def set_clustering_config():
 
 
 
+##################### Scheduled Ingest #####################
+
+# Refresh ahead of the 4 hour threshold so requests never wait on a FIRMS download
+NASA_REFRESH_INTERVAL_SECONDS = int(os.getenv("NASA_REFRESH_INTERVAL_SECONDS", 10800))
+# AQI runs as often as its fastest tier; each run only fetches the zones that are due
+AQI_REFRESH_INTERVAL_SECONDS = int(os.getenv("AQI_REFRESH_INTERVAL_SECONDS", 3600))
+SCHEDULER_JITTER_SECONDS = int(os.getenv("SCHEDULER_JITTER_SECONDS", 300))
+
+
+def refresh_nasa_job():
+    """Scheduled NASA FIRMS refresh; skipped if someone refreshed in the last half interval."""
+    nasa_refresh.refresh(
+        lambda: _refresh_stale_nasa_snapshot(max_age_seconds=NASA_REFRESH_INTERVAL_SECONDS / 2)
+    )
+
+
+def refresh_aqi_job():
+    """Scheduled OpenWeather AQI refresh of the zones due for their priority tier."""
+    # Imported lazily: the AQI fetcher pulls in aiohttp and opens its own Mongo client
+    from scripts.fetchAQI import refresh_aqi
+    result = refresh_aqi()
+    if result['status_code'] != 200:
+        raise RuntimeError(result['message'])
+    
+    latest_data = aqiCollection.find_one({}, sort=[("lastUpdated", -1)])
+    if latest_data and latest_data.get("originalData"):
+        _store_precompressed(latest_data, {
+            "openweather": latest_data["originalData"],
+            "openweather.geobuf": latest_data["originalData"]
+        }, aqi_response_cache, [_snapshot_version(latest_data)])
+
+
+def build_scheduler():
+    scheduler = Scheduler(schedulerRunsCollection)
+    scheduler.add_job("nasa_firms", refresh_nasa_job, NASA_REFRESH_INTERVAL_SECONDS, SCHEDULER_JITTER_SECONDS)
+    scheduler.add_job("openweather_aqi", refresh_aqi_job, AQI_REFRESH_INTERVAL_SECONDS, SCHEDULER_JITTER_SECONDS, timeout_seconds=3600)
+    return scheduler
+
+
+def warm_nasa_clusterer():
+    """
+    Rebuild nasa_clusterer's memo from the latest stored snapshot, so the first
+    refresh after a restart only re-clusters what changed since then.
+    """
+    if not (clustering_config['enable_clustering'] and clustering_config['incremental']):
+        return
+    try:
+        head = _latest_snapshot_head()
+        if head is None:
+            return
+        snapshot = nasaWildfiresCollection.find_one({"_id": head["_id"]})
+        detections = FirmsDetections.from_features(_load_original_features(snapshot))
+        nasa_clusterer.warm(detections, clustering_config['cluster_distance_km'], workers=clustering_config['workers'])
+        print(f"♻️ Incremental clustering state rebuilt from snapshot {head['_id']} ({len(detections)} detections)")
+    except Exception as e:
+        print(f"⚠️ Could not rebuild incremental clustering state: {e}")
+
+
+ingest_scheduler = None
+
+
+def start_ingest_scheduler():
+    """Start the in-process scheduler thread once; later calls return the running one."""
+    global ingest_scheduler
+    if ingest_scheduler is None:
+        # Off the request path; the first refresh waits on the clusterer's lock if it gets there first
+        threading.Thread(target=warm_nasa_clusterer, name="warm-nasa-clusterer", daemon=True).start()
+        ingest_scheduler = build_scheduler()
+        ingest_scheduler.start()
+    return ingest_scheduler
+
+
+# ENABLE_SCHEDULER=1 runs the ingest jobs inside the web worker; otherwise run
+# them as their own process with `python -m scripts.scheduler`
+if os.getenv("ENABLE_SCHEDULER", "").lower() in ("1", "true", "yes"):
+    start_ingest_scheduler()
+
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 8080))
@@ -12,6 +12,9 @@ from backend import db, nasaWildfiresCollection
 from utils.geo import cluster_geojson_points
 import datetime
 
+# Large records are clustered across this many processes (unset: one per CPU)
+CLUSTER_WORKERS = int(os.getenv("CLUSTER_WORKERS", 0)) or None
+
 def migrate_legacy_data():
     """Apply clustering to existing database records that don't have it"""
     
@@ -43,7 +46,7 @@ def migrate_legacy_data():
             original_count = len(original_features)
             
             # Apply clustering with default settings
-            clustered_features = cluster_geojson_points(original_features, 5.0)
+            clustered_features = cluster_geojson_points(original_features, 5.0, workers=CLUSTER_WORKERS)
             clustered_count = len(clustered_features)
             
             # Calculate reduction
@@ -38,7 +38,7 @@ def print_section(text):
     print_colored(f"\n📋 {text}", Colors.OKBLUE + Colors.BOLD)
     print_colored(f"{'-'*40}", Colors.OKBLUE)
 
-def run_command(command, description, capture_output=False):
+def run_command(command, description, capture_output=False, timeout=60):
     """Run a command and return the result."""
     print_colored(f"Running: {description}", Colors.OKCYAN)
     print_colored(f"Command: {' '.join(command)}", Colors.OKCYAN)
@@ -47,9 +47,9 @@ def run_command(command, description, capture_output=False):
     
     try:
         if capture_output:
-            result = subprocess.run(command, capture_output=True, text=True, timeout=60)
+            result = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
         else:
-            result = subprocess.run(command, timeout=60)
+            result = subprocess.run(command, timeout=timeout)
         
         end_time = time.time()
         duration = end_time - start_time
@@ -66,7 +66,7 @@ def run_command(command, description, capture_output=False):
             return False, result
     
     except subprocess.TimeoutExpired:
-        print_colored(f"⏰ TIMEOUT (>60s)", Colors.WARNING)
+        print_colored(f"⏰ TIMEOUT (>{timeout}s)", Colors.WARNING)
         return False, None
     except Exception as e:
         print_colored(f"💥 ERROR: {e}", Colors.FAIL)
@@ -143,6 +143,78 @@ def run_clustering_tests():
         )
         results.append(("Clustering Algorithm", success))
     
+    # Run cluster pyramid tests
+    pyramid_test = test_dir / "test_pyramid.py"
+    if pyramid_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(pyramid_test), "-v"],
+            "Multi-Zoom Cluster Pyramid"
+        )
+        results.append(("Cluster Pyramid", success))
+    
+    # Run tiled parallel clustering tests
+    tiling_test = test_dir / "test_tiling.py"
+    if tiling_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(tiling_test), "-v"],
+            "Tiled Parallel Clustering"
+        )
+        results.append(("Tiled Clustering", success))
+    
+    # Run incremental clustering tests
+    incremental_test = test_dir / "test_incremental.py"
+    if incremental_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(incremental_test), "-v"],
+            "Incremental Clustering"
+        )
+        results.append(("Incremental Clustering", success))
+    
+    # Run vectorized cluster aggregation tests
+    aggregate_test = test_dir / "test_aggregate.py"
+    if aggregate_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(aggregate_test), "-v"],
+            "Vectorized Cluster Aggregation"
+        )
+        results.append(("Cluster Aggregation", success))
+    
+    # Run cluster id / change set tests
+    changes_test = test_dir / "test_changes.py"
+    if changes_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(changes_test), "-v"],
+            "Cluster Change Sets"
+        )
+        results.append(("Cluster Change Sets", success))
+    
+    # Run vector tile encoding tests
+    tiles_test = Path(__file__).parent / "tests" / "encoding" / "test_vector_tiles.py"
+    if tiles_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(tiles_test), "-v"],
+            "Vector Tile Encoding"
+        )
+        results.append(("Vector Tiles", success))
+    
+    # Run Geobuf encoding tests
+    geobuf_test = Path(__file__).parent / "tests" / "encoding" / "test_geobuf.py"
+    if geobuf_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(geobuf_test), "-v"],
+            "Geobuf Encoding"
+        )
+        results.append(("Geobuf Encoding", success))
+    
+    # Run response cache tests
+    cache_test = Path(__file__).parent / "tests" / "encoding" / "test_response_cache.py"
+    if cache_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(cache_test), "-v"],
+            "Response Cache"
+        )
+        results.append(("Response Cache", success))
+    
     return results
 
 def run_integration_tests():
@@ -160,7 +232,106 @@ def run_integration_tests():
             "Dual Storage Architecture"
         )
         results.append(("Dual Storage", success))
-    
+
+    # Run per-detection storage tests
+    detection_store_test = test_dir / "test_detection_store.py"
+    if detection_store_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(detection_store_test), "-v"],
+            "Per-Detection Storage"
+        )
+        results.append(("Detection Store", success))
+
+    # Run SSE notification hub tests
+    notification_hub_test = test_dir / "test_notification_hub.py"
+    if notification_hub_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(notification_hub_test), "-v"],
+            "SSE Notification Hub"
+        )
+        results.append(("Notification Hub", success))
+
+    # Run cross-worker notification broker tests
+    notification_broker_test = test_dir / "test_notification_broker.py"
+    if notification_broker_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(notification_broker_test), "-v"],
+            "Cross-Worker Notification Fan-Out"
+        )
+        results.append(("Notification Broker", success))
+
+    # Run bulk notification writer tests
+    notification_writer_test = test_dir / "test_notification_writer.py"
+    if notification_writer_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(notification_writer_test), "-v"],
+            "Bulk Notification Writes"
+        )
+        results.append(("Notification Writer", success))
+
+    # Run fire alert tests
+    fire_alerts_test = test_dir / "test_fire_alerts.py"
+    if fire_alerts_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(fire_alerts_test), "-v"],
+            "Fire Proximity Alerts"
+        )
+        results.append(("Fire Alerts", success))
+
+    # Run refresh coordinator tests
+    refresh_test = test_dir / "test_refresh_coordinator.py"
+    if refresh_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(refresh_test), "-v"],
+            "Single-Flight NASA Refresh"
+        )
+        results.append(("Refresh Coordinator", success))
+
+    # Run ingest scheduler tests
+    scheduler_test = test_dir / "test_scheduler.py"
+    if scheduler_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(scheduler_test), "-v"],
+            "Ingest Scheduler"
+        )
+        results.append(("Scheduler", success))
+
+    # Run AQI rate limiting tests
+    rate_limit_test = test_dir / "test_aqi_rate_limit.py"
+    if rate_limit_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(rate_limit_test), "-v"],
+            "AQI Rate Limiting"
+        )
+        results.append(("AQI Rate Limit", success))
+
+    # Run AQI refresh planner tests
+    planner_test = test_dir / "test_aqi_planner.py"
+    if planner_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(planner_test), "-v"],
+            "Priority-Tiered AQI Refresh"
+        )
+        results.append(("AQI Planner", success))
+
+    # Run streaming FIRMS parser tests
+    firms_stream_test = test_dir / "test_firms_stream.py"
+    if firms_stream_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(firms_stream_test), "-v"],
+            "Streaming FIRMS Parser"
+        )
+        results.append(("FIRMS Stream", success))
+
+    # Run multi-sensor ingest tests
+    multi_sensor_test = test_dir / "test_multi_sensor.py"
+    if multi_sensor_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(multi_sensor_test), "-v"],
+            "Multi-Sensor FIRMS Ingest"
+        )
+        results.append(("Multi-Sensor Ingest", success))
+
     return results
 
 def run_api_tests(skip_if_no_server=True):
@@ -216,6 +387,32 @@ def run_manual_tests():
     
     return results
 
+def run_benchmarks(update_baseline=False):
+    """Run the ingest benchmarks and compare them against the stored baseline."""
+    print_section("Benchmarks - Ingest & Clustering Performance")
+    
+    bench_dir = Path(__file__).parent / "tests" / "benchmarks"
+    bench_script = bench_dir / "bench_ingest.py"
+    results = []
+
+    # Run generator tests first so a broken generator doesn't look like a regression
+    generator_test = bench_dir / "test_firms_generator.py"
+    if generator_test.exists():
+        success, _ = run_command(
+            ["python", "-m", "pytest", str(generator_test), "-v"],
+            "Synthetic FIRMS Generator"
+        )
+        results.append(("FIRMS Generator", success))
+
+    if bench_script.exists():
+        command = ["python", str(bench_script)]
+        if update_baseline:
+            command.append("--update-baseline")
+        success, _ = run_command(command, "Ingest Benchmarks (regression check)", timeout=600)
+        results.append(("Ingest Benchmarks", success))
+    
+    return results
+
 def print_summary(all_results):
     """Print a summary of all test results."""
     print_header("Test Results Summary")
@@ -264,6 +461,8 @@ def main():
     parser.add_argument("--manual", action="store_true", help="Run only manual tests")
     parser.add_argument("--force-api", action="store_true", help="Force API tests even if server not detected")
     parser.add_argument("--quick", action="store_true", help="Skip manual tests for faster execution")
+    parser.add_argument("--bench", action="store_true", help="Run ingest benchmarks and flag regressions")
+    parser.add_argument("--update-baseline", action="store_true", help="With --bench, save results as the new baseline")
     
     args = parser.parse_args()
     
@@ -276,7 +475,7 @@ def main():
         return 1
     
     # Determine which tests to run
-    run_all = not (args.unit or args.clustering or args.integration or args.api or args.manual)
+    run_all = not (args.unit or args.clustering or args.integration or args.api or args.manual or args.bench)
     
     all_results = {}
     
@@ -295,6 +494,9 @@ def main():
     if (run_all and not args.quick) or args.manual:
         all_results["Manual Tests"] = run_manual_tests()
     
+    if args.bench:
+        all_results["Benchmarks"] = run_benchmarks(update_baseline=args.update_baseline)
+    
     # Print summary
     success = print_summary(all_results)
     
@@ -3,6 +3,7 @@
 
 from dataclasses import dataclass
 import os
+import sys
 import time
 import asyncio
 import aiohttp
@@ -12,8 +13,10 @@ from flask import jsonify
 from datetime import datetime
 from utils.geo import generate_points_grid
 from utils.externalapi import pm25_to_aqi
+from utils.ratelimit import TokenBucket, backoff_delay, is_retryable_status
+from utils.aqiplanner import DEFAULT_TIER_HOURS, merge_features, plan_refresh
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass, asdict
 
 if os.path.exists(".env.local"):
@@ -28,6 +31,10 @@ db = client.Fireflare
 
 aqiCollection = db.openWeatherAQIData
 
+# OpenWeather quota: sustained requests per second and concurrent connections
+OPENWEATHER_RATE_PER_SECOND = float(os.getenv("OPENWEATHER_RATE_PER_SECOND", 10))
+OPENWEATHER_CONCURRENCY = int(os.getenv("OPENWEATHER_CONCURRENCY", 20))
+
 @dataclass
 class AQIReading:
     lat: float
@@ -45,99 +52,116 @@ class AQIReading:
 
 
 class AQIFetcher:
-    def __init__(self, api_key: str, batch_size: int = 50, delay_ms: int = 100):
+    def __init__(self, api_key: str, batch_size: int = 50, delay_ms: int = 100,
+                 concurrency: int = 20, rate_per_second: Optional[float] = None, max_retries: int = 4):
         self.api_key = api_key
-        self.batch_size = batch_size
+        self.batch_size = batch_size  # Progress is reported every batch_size points
         self.delay_ms = delay_ms
+        self.concurrency = concurrency
+        # Same quota as the old serial loop (one call per delay_ms) unless set explicitly
+        self.rate_per_second = rate_per_second or 1000 / max(delay_ms, 1)
+        self.max_retries = max_retries
         self.base_url = "https://api.openweathermap.org/data/2.5/air_pollution"
+        self.bucket = None
     
     async def fetch_aqi(self, session: aiohttp.ClientSession, lat: float, lon: float) -> Dict:
-        """Fetch AQI data for a single point."""
+        """Fetch AQI data for a single point, retrying 429/5xx with exponential backoff."""
         url = f"{self.base_url}?lat={lat}&lon={lon}&appid={self.api_key}"
         
-        try:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    components = data['list'][0]['components']
-                    openweather_aqi = data['list'][0]['main']['aqi']  # 1-5 scale
-                    
-                    # Extract PM2.5 concentration (µg/m³) and convert to EPA AQI
-                    pm25_concentration = components.get('pm2_5')
-                    epa_aqi = None
-                    
-                    if pm25_concentration is not None:
-                        epa_aqi = pm25_to_aqi(pm25_concentration)
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                await self.bucket.acquire()
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        components = data['list'][0]['components']
+                        openweather_aqi = data['list'][0]['main']['aqi']  # 1-5 scale
+                        
+                        # Extract PM2.5 concentration (µg/m³) and convert to EPA AQI
+                        pm25_concentration = components.get('pm2_5')
+                        epa_aqi = None
+                        
+                        if pm25_concentration is not None:
+                            epa_aqi = pm25_to_aqi(pm25_concentration)
+                        
+                        return {
+                            'aqi': epa_aqi,  # EPA AQI (0-500 scale)
+                            'openweather_aqi': openweather_aqi,  # Keep original 1-5 scale
+                            'pm25_concentration': pm25_concentration,  # Raw PM2.5 µg/m³
+                            'components': components,
+                            'success': True
+                        }
                     
-                    return {
-                        'aqi': epa_aqi,  # EPA AQI (0-500 scale)
-                        'openweather_aqi': openweather_aqi,  # Keep original 1-5 scale
-                        'pm25_concentration': pm25_concentration,  # Raw PM2.5 µg/m³
-                        'components': components,
-                        'success': True
-                    }
-                else:
-                    return {
-                        'success': False,
-                        'error': f"HTTP {response.status}"
-                    }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': str(e)
-            }
+                    error = f"HTTP {response.status}"
+                    if not is_retryable_status(response.status):
+                        return {'success': False, 'error': error}
+                    retry_after = response.headers.get('Retry-After')
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+            except Exception as e:
+                return {
+                    'success': False,
+                    'error': str(e)
+                }
+            
+            if attempt < self.max_retries:
+                await asyncio.sleep(backoff_delay(attempt, retry_after=retry_after))
+        
+        return {
+            'success': False,
+            'error': f"{error} after {self.max_retries + 1} attempts"
+        }
+    
+    async def fetch_point(self, session: aiohttp.ClientSession, point) -> AQIReading:
+        """Fetch one grid point and wrap the result in an AQIReading."""
+        result = await self.fetch_aqi(session, point.lat, point.lon)
+        
+        return AQIReading(
+            lat=point.lat,
+            lon=point.lon,
+            timestamp=datetime.now().isoformat() + 'Z',
+            zone=point.zone,
+            priority=point.priority,
+            aqi=result.get('aqi'),  # EPA AQI
+            openweather_aqi=result.get('openweather_aqi'),  # 1-5 scale
+            pm25_concentration=result.get('pm25_concentration'),  # µg/m³
+            components=result.get('components'),
+            success=result['success'],
+            error=result.get('error')
+        )
     
     async def process_batch(self, session: aiohttp.ClientSession, points: List[Dict]) -> List[AQIReading]:
-        """Process a batch of points."""
-        results = []
+        """Fetch a list of points concurrently (at most `concurrency` in flight), keeping their order."""
+        if self.bucket is None:
+            self.bucket = TokenBucket(self.rate_per_second)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        completed = 0
         
-        for i, point in enumerate(points):
-            # print(f"  Processing {i + 1}/{len(points)}: {point.lat:.4f}, {point.lon:.4f}")
-            
-            result = await self.fetch_aqi(session, point.lat, point.lon)
-            
-            reading = AQIReading(
-                lat=point.lat,
-                lon=point.lon,
-                timestamp=datetime.now().isoformat() + 'Z',
-                zone=point.zone,
-                priority=point.priority,
-                aqi=result.get('aqi'),  # EPA AQI
-                openweather_aqi=result.get('openweather_aqi'),  # 1-5 scale
-                pm25_concentration=result.get('pm25_concentration'),  # µg/m³
-                components=result.get('components'),
-                success=result['success'],
-                error=result.get('error')
-            )
-            
-            results.append(reading)
-            
-            # Rate limiting
-            if i < len(points) - 1:
-                await asyncio.sleep(self.delay_ms / 1000)
+        async def bounded(point):
+            nonlocal completed
+            async with semaphore:
+                reading = await self.fetch_point(session, point)
+            completed += 1
+            if completed % self.batch_size == 0 or completed == len(points):
+                print(f"Progress: {completed / len(points) * 100:.1f}% ({completed}/{len(points)})")
+            return reading
         
-        return results
+        return await asyncio.gather(*(bounded(point) for point in points))
     
     async def fetch_all(self, grid_points: List[Dict]) -> List[AQIReading]:
         """Fetch AQI for all grid points."""
         start_time = time.time()
-        all_results = []
+        self.bucket = TokenBucket(self.rate_per_second)
+        
+        print(f"Fetching {len(grid_points)} points "
+              f"({self.concurrency} concurrent, {self.rate_per_second:g} requests/s)")
         
-        async with aiohttp.ClientSession() as session:
-            # Process in batches
-            for i in range(0, len(grid_points), self.batch_size):
-                batch = grid_points[i:i + self.batch_size]
-                batch_num = i // self.batch_size + 1
-                total_batches = (len(grid_points) + self.batch_size - 1) // self.batch_size
-                
-                print(f"\nBatch {batch_num}/{total_batches}")
-                
-                batch_results = await self.process_batch(session, batch)
-                all_results.extend(batch_results)
-                
-                # Progress update
-                progress = ((i + len(batch)) / len(grid_points) * 100)
-                print(f"Progress: {progress:.1f}%")
+        # One shared session; the connector caps open connections to the API host
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            all_results = await self.process_batch(session, grid_points)
         
         elapsed = time.time() - start_time
         print(f"\n✅ Complete!")
@@ -146,131 +170,138 @@ class AQIFetcher:
         return all_results
     
 
-def store_results(results: List[AQIReading]):
-    
-    # Try to store results to Database
-    try:
-        # Check if we have recent data in the database
-
-        latest_data_cursor = aqiCollection.find({}).sort([("lastUpdated", -1)]).limit(1)
-        latest_data = None
-        for doc in latest_data_cursor:
-            latest_data = doc
-            break
-    
-        current_time = datetime.now()
-        should_fetch_new = True
-        if latest_data:
-            last_updated = latest_data.get("lastUpdated")
-            if isinstance(last_updated, str):
-                last_updated = datetime.fromisoformat(last_updated)
-            elif isinstance(last_updated, datetime):
-                pass  # Already a datetime object
-            else:
-                last_updated = datetime.min  # Force update if invalid format
-            print(f"Last updated: {last_updated}, Current time: {current_time}")
-            
-            # Check if data is less than 4 hours old (adjust as needed)
-            time_diff = current_time - last_updated
-            if time_diff.total_seconds() < 14400:  # 4 hours in seconds
-                should_fetch_new = False
-                print("Using cached AQI data from database")
-                return {'status_code': 200, 'message': 'Using cached data'}
-        
-        if should_fetch_new:
-            print("Fetching fresh AQI data from OpenWeather API")
-
-            # Convert AQIReading objects to GeoJSON FeatureCollection
-            features = []
-            successful_count = 0
+def readings_to_features(results: List[AQIReading]) -> List[Dict]:
+    """GeoJSON features for the successful readings that have a valid AQI."""
+    features = []
+    for reading in results:
+        # Only include successful readings with valid AQI
+        if not reading.success or reading.aqi is None:
+            continue
             
-            for reading in results:
-                # Only include successful readings with valid AQI
-                if not reading.success or reading.aqi is None:
-                    continue
-                    
-                # Create GeoJSON feature
-                feature = {
-                    "type": "Feature",
-                    "geometry": {
-                        "type": "Point", 
-                        "coordinates": [reading.lon, reading.lat]
-                    },
-                    "properties": {
-                        "aqi": reading.aqi,  # EPA AQI (0-500 scale)
-                        "openweather_aqi": reading.openweather_aqi,  # 1-5 scale
-                        "pm25_concentration": reading.pm25_concentration,  # µg/m³
-                        "components": reading.components or {},
-                        "zone": reading.zone,
-                        "priority": reading.priority,
-                        "timestamp": reading.timestamp,
-                        "success": reading.success,
-                        "error": reading.error
-                    }
-                }
-                features.append(feature)
-                successful_count += 1
-            
-            # Create GeoJSON FeatureCollection
-            geojson_data = {
-                "type": "FeatureCollection",
-                "features": features,
-                "metadata": {
-                    "source": "Open Weather Air Pollution API",
-                    "totalReadings": len(results),
-                    "successfulReadings": successful_count,
-                    "gridGenerationInfo": "Generated from wildfire zones"
-                }
+        # Create GeoJSON feature
+        features.append({
+            "type": "Feature",
+            "geometry": {
+                "type": "Point", 
+                "coordinates": [reading.lon, reading.lat]
+            },
+            "properties": {
+                "aqi": reading.aqi,  # EPA AQI (0-500 scale)
+                "openweather_aqi": reading.openweather_aqi,  # 1-5 scale
+                "pm25_concentration": reading.pm25_concentration,  # µg/m³
+                "components": reading.components or {},
+                "zone": reading.zone,
+                "priority": reading.priority,
+                "timestamp": reading.timestamp,
+                "success": reading.success,
+                "error": reading.error
             }
-            
-            # Store both versions in the database
-            new_aqi_doc = {
-                "lastUpdated": current_time.isoformat(),
-                "originalData": geojson_data,  # GeoJSON FeatureCollection
-                "rawReadings": [asdict(reading) for reading in results],  # Keep raw data as backup
+        })
+    return features
+
+
+def store_incremental_results(latest_data: Optional[Dict], results: List[AQIReading],
+                              current_time: datetime) -> Dict:
+    """
+    Merge a partial (per-zone) fetch into the latest AQI snapshot.
+
+    Points fetched this run replace their old readings, everything else is kept,
+    and `zoneRefreshedAt` records when each zone last had a successful fetch.
+    The latest document is updated in place; a new one is inserted only when
+    there is no snapshot yet.
+    """
+    try:
+        new_features = readings_to_features(results)
+        previous_features = (latest_data or {}).get("originalData", {}).get("features", [])
+        features = merge_features(previous_features, new_features)
+        
+        zone_refreshed_at = dict((latest_data or {}).get("zoneRefreshedAt", {}))
+        for reading in results:
+            if reading.success and reading.aqi is not None:
+                zone_refreshed_at[reading.zone] = current_time.isoformat()
+        
+        geojson_data = {
+            "type": "FeatureCollection",
+            "features": features,
+            "metadata": {
                 "source": "Open Weather Air Pollution API",
-                "fetchedAt": current_time.isoformat()
+                "totalReadings": len(results),
+                "successfulReadings": len(new_features),
+                "refreshedZones": sorted({r.zone for r in results}),
+                "gridGenerationInfo": "Generated from wildfire zones"
             }
-            
-            # Insert new data (keep all historical entries as backup)
-            response_after_insert = aqiCollection.insert_one(new_aqi_doc)
-            if response_after_insert.acknowledged:
-                print(f"Inserted GeoJSON with {len(features)} features (ID: {response_after_insert.inserted_id})")
-                return {'status_code': 200, 'message': 'GeoJSON data stored successfully'}
-            else:
-                print("❌ Failed to insert new AQI data!")
-                return {'status_code': 500, 'message': 'Failed to insert data'}
-
+        }
+        update = {
+            "lastUpdated": current_time.isoformat(),
+            "originalData": geojson_data,
+            "rawReadings": [asdict(reading) for reading in results],  # This run only
+            "zoneRefreshedAt": zone_refreshed_at,
+            "source": "Open Weather Air Pollution API",
+            "fetchedAt": current_time.isoformat()
+        }
+        
+        if latest_data:
+            aqiCollection.update_one({"_id": latest_data["_id"]}, {"$set": update})
+            print(f"Merged {len(new_features)} fresh readings into AQI snapshot {latest_data['_id']} ({len(features)} features)")
+        else:
+            response_after_insert = aqiCollection.insert_one(update)
+            print(f"Inserted GeoJSON with {len(features)} features (ID: {response_after_insert.inserted_id})")
+        return {'status_code': 200, 'message': 'GeoJSON data merged successfully'}
+    
     except Exception as e:
         print(f"❌ Failed to store data into database! Error: {e}")
         return {'status_code': 500, 'message': f'Database error: {str(e)}'}
 
 
+async def refresh_aqi_async(tier_hours: Dict[int, float] = DEFAULT_TIER_HOURS,
+                            full: bool = False) -> Tuple[Dict, List[AQIReading]]:
+    """
+    Fetch only the zones that are due for their tier (see utils/aqiplanner.py)
+    and merge them into the latest snapshot. `full=True` refetches every zone.
+    """
+    if not openWeatherApiKey:
+        return {'status_code': 500, 'message': 'OPENWEATHER_API_KEY not set'}, []
+    
+    latest_data = None
+    for doc in aqiCollection.find({}).sort([("lastUpdated", -1)]).limit(1):
+        latest_data = doc
+    
+    current_time = datetime.now()
+    grid_points = generate_points_grid()
+    zone_refreshed_at = {} if full else (latest_data or {}).get("zoneRefreshedAt", {})
+    points, zones = plan_refresh(grid_points, zone_refreshed_at, current_time, tier_hours)
+    if not points:
+        print("No AQI zones due for refresh")
+        return {'status_code': 200, 'message': 'No zones due'}, []
+    
+    print(f"Refreshing {len(points)}/{len(grid_points)} AQI points in {len(zones)} zones: {', '.join(zones)}")
+    fetcher = AQIFetcher(openWeatherApiKey, batch_size=50, concurrency=OPENWEATHER_CONCURRENCY,
+                         rate_per_second=OPENWEATHER_RATE_PER_SECOND)
+    results = await fetcher.fetch_all(points)
+    return store_incremental_results(latest_data, results, current_time), results
+
+
+def refresh_aqi(tier_hours: Dict[int, float] = DEFAULT_TIER_HOURS, full: bool = False) -> Dict:
+    """Synchronous refresh_aqi_async, used by the ingest scheduler."""
+    response, _ = asyncio.run(refresh_aqi_async(tier_hours, full))
+    return response
+
 
 async def main():
-    """Main function."""
+    """Main function. Pass --full to refetch every zone regardless of its tier."""
     print("=" * 60)
     print("WILDFIRE AQI DATA FETCHER")
     print("=" * 60)
     
-    # Load environment variables
-    api_key = openWeatherApiKey    
-    if not api_key:
-        print("❌ OPENWEATHER_API_KEY not set in environment variables!")
-        return 
-    # Generate Grid
-    grid_points = generate_points_grid()
-    # Fetch AQI data
-    fetcher = AQIFetcher(api_key, batch_size=50, delay_ms=100)
-    results = await fetcher.fetch_all(grid_points)
-    
-    # Save results
-    response = store_results(results)
+    # Fetch the zones that are due and merge them into the latest snapshot
+    response, results = await refresh_aqi_async(full="--full" in sys.argv)
     
     if response['status_code'] == 200:
-        print("✅ Results successfully stored in database!")
+        print(f"✅ {response['message']}")
     else:
         print(f"❌ Failed to store results: {response['status_code']} - {response['message']}")
+    if not results:
+        return
 
     # Summary
     successful = sum(1 for r in results if r.success)
@@ -0,0 +1,29 @@
+"""
+Relay notifications between web workers for NOTIFICATION_BROKER=socket.
+
+    python -m scripts.notificationbroker                      # NOTIFICATION_BROKER_ADDRESS or 127.0.0.1:8765
+    python -m scripts.notificationbroker --address unix:/tmp/fireflare-notify.sock
+"""
+
+import argparse
+import os
+
+from utils.notificationbroker import DEFAULT_SOCKET_ADDRESS, make_relay_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fireflare notification relay")
+    parser.add_argument("--address", default=os.getenv("NOTIFICATION_BROKER_ADDRESS", DEFAULT_SOCKET_ADDRESS),
+                        help="host:port or unix:/path to listen on")
+    args = parser.parse_args()
+
+    server = make_relay_server(args.address)
+    print(f"📡 Notification relay listening on {args.address}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
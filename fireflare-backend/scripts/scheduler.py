@@ -0,0 +1,38 @@
+"""
+Run the NASA FIRMS and OpenWeather AQI ingest jobs on a schedule.
+
+    python -m scripts.scheduler          # run forever
+    python -m scripts.scheduler --once   # run whatever is due, then exit
+"""
+
+import argparse
+import os
+
+# This process is the scheduler: keep backend from starting its in-process
+# one as well when ENABLE_SCHEDULER is set in the shared environment
+os.environ["ENABLE_SCHEDULER"] = "0"
+# Nothing else runs here, so large pulls are clustered with one process per CPU
+# unless CLUSTER_WORKERS says otherwise; the web app clusters in-process
+os.environ.setdefault("CLUSTER_WORKERS", "0")
+
+import backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fireflare ingest scheduler")
+    parser.add_argument("--once", action="store_true", help="Run due jobs once and exit")
+    args = parser.parse_args()
+
+    scheduler = backend.build_scheduler()
+    if args.once:
+        ran = scheduler.run_pending()
+        print(f"Ran: {', '.join(ran) if ran else 'nothing due'}")
+        return
+    # A one-off run would pay for a full cluster either way; a long-running one
+    # reuses the stored snapshot's clusters on its first refresh
+    backend.warm_nasa_clusterer()
+    scheduler.run_forever()
+
+
+if __name__ == '__main__':
+    main()
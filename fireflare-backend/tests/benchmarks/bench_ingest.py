@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the NASA ingest pipeline.
+
+Times each stage on synthetic FIRMS CSVs (see firms_generator.py), records its
+peak Python memory with tracemalloc, writes the results as JSON and compares
+them against a stored baseline.
+
+    python tests/benchmarks/bench_ingest.py                      # 1k, 10k, 50k rows
+    python tests/benchmarks/bench_ingest.py --sizes 1000,200000
+    python tests/benchmarks/bench_ingest.py --update-baseline    # after an intended change
+
+Exit code 1 means at least one stage regressed past the threshold.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from firms_generator import generate_firms_csv
+from utils.externalapi import fetch_nasa_detections, fetch_nasa_geojson
+from utils.aggregate import aggregate_clusters, aggregate_detection_clusters
+from utils.geo import cluster_geojson_points, cluster_point_indices, generate_points_grid
+from utils.pyramid import build_cluster_pyramid
+from utils.tiling import tiled_cluster_indices
+
+BENCH_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_SIZES = [1000, 10000, 50000]
+CLUSTER_DISTANCE_KM = 0.2  # backend clustering_config default
+# At least two so the tiled stage always goes through the process pool
+CLUSTER_WORKERS = max(2, os.cpu_count() or 1)
+
+# A stage has regressed when it is this much slower / bigger than the baseline...
+DEFAULT_THRESHOLD = 2.0
+# ...and the difference is larger than timer and allocator noise
+MIN_SECONDS_DELTA = 0.05
+MIN_PEAK_MB_DELTA = 1.0
+
+
+def _fake_firms_response(csv_text):
+    response = MagicMock()
+    response.ok = True
+    response.status_code = 200
+    response.text = csv_text
+    response.content = csv_text.encode("utf-8")
+    response.iter_content = lambda chunk_size=65536, decode_unicode=False: (
+        response.content[i:i + chunk_size] for i in range(0, len(response.content), chunk_size)
+    )
+    return response
+
+
+def _parse(csv_text):
+    with patch("utils.externalapi.requests.get", return_value=_fake_firms_response(csv_text)):
+        return fetch_nasa_geojson("bench", "VIIRS_SNPP_NRT", [-140, 24, -50, 72], 2,
+                                  enable_clustering=False, return_both=True)["original"]["features"]
+
+
+def _parse_columns(csv_text):
+    with patch("utils.externalapi.requests.get", return_value=_fake_firms_response(csv_text)):
+        return fetch_nasa_detections("bench", "VIIRS_SNPP_NRT", [-140, 24, -50, 72], 2)
+
+
+def _cluster_features(features, groups):
+    return aggregate_clusters(features, [group for group in groups if len(group) > 1])
+
+
+def _measure(func, repeat):
+    """Best wall time over `repeat` runs, then one traced run for peak memory."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / (1024 * 1024), result
+
+
+def run_benchmarks(sizes, seed=42, repeat=3):
+    """Run every stage for every size. Returns {"<stage>@<rows>": {...}}."""
+    results = {}
+
+    def record(name, rows, func):
+        seconds, peak_mb, output = _measure(func, repeat)
+        results[f"{name}@{rows}"] = {
+            "stage": name,
+            "rows": rows,
+            "seconds": round(seconds, 4),
+            "peak_mb": round(peak_mb, 2)
+        }
+        print(f"  {name:<16} {rows:>8} rows  {seconds * 1000:>9.1f} ms  {peak_mb:>8.1f} MB peak")
+        return output
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        grid = generate_points_grid()
+    print(f"  {'(grid)':<16} {len(grid):>8} points")
+    record("points_grid", len(grid), lambda: _quiet(generate_points_grid))
+
+    for rows in sizes:
+        csv_text = generate_firms_csv(rows, seed=seed)
+        features = record("parse_csv", rows, lambda: _quiet(lambda: _parse(csv_text)))
+        detections = record("parse_columns", rows, lambda: _quiet(lambda: _parse_columns(csv_text)))
+        lats = np.array([f["geometry"]["coordinates"][1] for f in features])
+        lons = np.array([f["geometry"]["coordinates"][0] for f in features])
+
+        groups = record("cluster_indices", rows, lambda: cluster_point_indices(lats, lons, CLUSTER_DISTANCE_KM))
+        record("cluster_tiled", rows, lambda: tiled_cluster_indices(lats, lons, CLUSTER_DISTANCE_KM,
+                                                                    workers=CLUSTER_WORKERS, min_points=0))
+        record("cluster_features", rows, lambda: _cluster_features(features, groups))
+        record("cluster_columns", rows, lambda: aggregate_detection_clusters(
+            detections, [group for group in groups if len(group) > 1]))
+        record("cluster_geojson", rows, lambda: cluster_geojson_points(features, CLUSTER_DISTANCE_KM))
+        record("cluster_pyramid", rows, lambda: build_cluster_pyramid(features))
+
+    return results
+
+
+def _quiet(func):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func()
+
+
+def compare_to_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    List the stages that got slower or hungrier than `threshold` x baseline.
+    Each entry is (key, metric, baseline_value, current_value).
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        for metric, min_delta in (("seconds", MIN_SECONDS_DELTA), ("peak_mb", MIN_PEAK_MB_DELTA)):
+            before = previous.get(metric)
+            after = current.get(metric)
+            if before is None or after is None:
+                continue
+            if after > before * threshold and after - before > min_delta:
+                regressions.append((key, metric, before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fireflare ingest benchmarks")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated row counts (e.g. 1000,10000,200000)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per stage (best is kept)")
+    parser.add_argument("--output", default=str(BENCH_DIR / "results.json"), help="Where to write results")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Flag stages slower/bigger than this multiple of the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Save these results as the new baseline")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    print(f"🔥 Ingest benchmarks (seed {args.seed}, sizes {sizes})")
+    results = run_benchmarks(sizes, seed=args.seed, repeat=args.repeat)
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "seed": args.seed,
+            "repeat": args.repeat
+        },
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("⚠️ No baseline found - run with --update-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare_to_baseline(results, baseline, args.threshold)
+    if not regressions:
+        print(f"✅ No regressions against {args.baseline} (threshold {args.threshold}x)")
+        return 0
+
+    print(f"❌ {len(regressions)} regression(s) against {args.baseline}:")
+    for key, metric, before, after in regressions:
+        print(f"  {key} {metric}: {before} -> {after} ({after / before:.2f}x)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
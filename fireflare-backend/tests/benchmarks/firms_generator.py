@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Seeded generator for synthetic NASA FIRMS VIIRS (VIIRS_SNPP_NRT) CSV exports.
+
+Detections are laid out the way real fires show up in FIRMS: most rows belong to
+elongated, wind-driven hotspots sampled on the 375 m VIIRS pixel grid (dense
+active fronts with a sparser burned interior), and the rest are scattered
+single-pixel detections such as agricultural burns and gas flares.
+"""
+
+import csv
+import io
+import math
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+
+VIIRS_COLUMNS = [
+    "latitude", "longitude", "bright_ti4", "scan", "track", "acq_date", "acq_time",
+    "satellite", "instrument", "confidence", "version", "bright_ti5", "frp", "daynight"
+]
+
+# Same area the backend requests from FIRMS: [west, south, east, north]
+DEFAULT_BBOX = [-140, 24, -50, 72]
+
+# Fire-prone regions (west, south, east, north) and how often hotspots land there
+FIRE_REGIONS = [
+    ((-124.5, 32.5, -114.0, 42.0), 0.25),   # California
+    ((-124.5, 42.0, -116.0, 49.0), 0.12),   # Pacific Northwest
+    ((-139.0, 48.3, -114.0, 60.0), 0.18),   # British Columbia
+    ((-120.0, 49.0, -110.0, 60.0), 0.10),   # Alberta
+    ((-116.0, 31.0, -103.0, 42.0), 0.12),   # Rockies / Southwest
+    ((-95.0, 45.0, -74.0, 55.0), 0.08),     # Ontario / Quebec
+    ((-141.0, 60.0, -100.0, 69.0), 0.15),   # Northern territories / Alaska
+]
+
+VIIRS_PIXEL_KM = 0.375
+KM_PER_DEGREE_LAT = 111.195
+
+
+def generate_firms_rows(n_rows, seed=42, days=2, start_date=date(2025, 8, 1),
+                        hotspot_fraction=0.8, bbox=DEFAULT_BBOX):
+    """
+    Generate `n_rows` synthetic VIIRS detections as a list of dicts (all values
+    formatted as FIRMS writes them). The same seed always gives the same rows.
+    """
+    rng = np.random.default_rng(seed)
+    n_hotspot = int(round(n_rows * hotspot_fraction))
+    n_scattered = n_rows - n_hotspot
+
+    lats, lons = _hotspot_points(rng, n_hotspot)
+    west, south, east, north = bbox
+    lats = np.concatenate([lats, rng.uniform(south, north, n_scattered)])
+    lons = np.concatenate([lons, rng.uniform(west, east, n_scattered)])
+    lats = np.clip(lats, south, north)
+    lons = np.clip(lons, west, east)
+
+    # Shuffle so hotspots are not contiguous in the file, like FIRMS swath order
+    order = rng.permutation(n_rows)
+    lats = lats[order]
+    lons = lons[order]
+
+    frp = np.round(rng.lognormal(mean=1.5, sigma=1.1, size=n_rows), 2)
+    bright_ti4 = np.round(np.clip(295 + 12 * np.log1p(frp) + rng.normal(0, 6, n_rows), 290, 367), 2)
+    bright_ti5 = np.round(bright_ti4 - rng.uniform(15, 45, n_rows), 2)
+    scan = np.round(rng.uniform(0.32, 0.8, n_rows), 2)
+    track = np.round(np.clip(scan * rng.uniform(0.7, 1.0, n_rows), 0.36, 0.78), 2)
+
+    day_offsets = rng.integers(0, days, n_rows)
+    # Overpasses cluster around ~09-10 UTC (night) and ~19-21 UTC (day) over North America
+    daytime = rng.random(n_rows) < 0.6
+    minutes = np.where(daytime, rng.integers(19 * 60, 21 * 60 + 30, n_rows), rng.integers(8 * 60 + 30, 10 * 60 + 30, n_rows))
+    confidence = rng.choice(np.array(["l", "n", "h"]), size=n_rows, p=[0.1, 0.75, 0.15])
+
+    rows = []
+    for k in range(n_rows):
+        rows.append({
+            "latitude": f"{lats[k]:.5f}",
+            "longitude": f"{lons[k]:.5f}",
+            "bright_ti4": f"{bright_ti4[k]:.2f}",
+            "scan": f"{scan[k]:.2f}",
+            "track": f"{track[k]:.2f}",
+            "acq_date": (start_date + timedelta(days=int(day_offsets[k]))).isoformat(),
+            "acq_time": f"{minutes[k] // 60:02d}{minutes[k] % 60:02d}",
+            "satellite": "N",
+            "instrument": "VIIRS",
+            "confidence": str(confidence[k]),
+            "version": "2.0NRT",
+            "bright_ti5": f"{bright_ti5[k]:.2f}",
+            "frp": f"{frp[k]:.2f}",
+            "daynight": "D" if daytime[k] else "N",
+        })
+    return rows
+
+
+def _hotspot_points(rng, n_points):
+    """Points for a set of elongated fires on the 375 m pixel grid."""
+    if n_points == 0:
+        return np.empty(0), np.empty(0)
+
+    # Fire sizes are heavy-tailed: a few megafires and many small ones
+    sizes = []
+    remaining = n_points
+    while remaining > 0:
+        size = int(min(remaining, max(1, rng.pareto(1.2) * 15)))
+        sizes.append(size)
+        remaining -= size
+
+    region_boxes = [box for box, _ in FIRE_REGIONS]
+    weights = np.array([w for _, w in FIRE_REGIONS])
+    regions = rng.choice(len(region_boxes), size=len(sizes), p=weights / weights.sum())
+
+    all_lats = []
+    all_lons = []
+    for size, region in zip(sizes, regions):
+        west, south, east, north = region_boxes[region]
+        center_lat = rng.uniform(south, north)
+        center_lon = rng.uniform(west, east)
+
+        # Ellipse stretched along the wind direction; area grows with pixel count
+        length_km = max(VIIRS_PIXEL_KM, math.sqrt(size) * VIIRS_PIXEL_KM * rng.uniform(1.5, 3.0))
+        width_km = length_km * rng.uniform(0.2, 0.6)
+        heading = rng.uniform(0, math.pi)
+
+        # Active front on the ellipse edge, the rest scattered inside
+        on_front = rng.random(size) < 0.6
+        angle = rng.uniform(0, 2 * math.pi, size)
+        radius = np.where(on_front, rng.uniform(0.85, 1.0, size), np.sqrt(rng.random(size)))
+        along = radius * np.cos(angle) * length_km / 2
+        across = radius * np.sin(angle) * width_km / 2
+
+        north_km = along * math.cos(heading) - across * math.sin(heading)
+        east_km = along * math.sin(heading) + across * math.cos(heading)
+
+        # Snap to the pixel grid so neighbouring detections sit ~375 m apart
+        north_km = np.round(north_km / VIIRS_PIXEL_KM) * VIIRS_PIXEL_KM
+        east_km = np.round(east_km / VIIRS_PIXEL_KM) * VIIRS_PIXEL_KM
+
+        lat = center_lat + north_km / KM_PER_DEGREE_LAT
+        lon = center_lon + east_km / (KM_PER_DEGREE_LAT * math.cos(math.radians(center_lat)))
+        all_lats.append(lat)
+        all_lons.append(lon)
+
+    return np.concatenate(all_lats), np.concatenate(all_lons)
+
+
+def generate_firms_csv(n_rows, seed=42, **kwargs):
+    """Synthetic FIRMS CSV text, byte-for-byte reproducible for a given seed."""
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=VIIRS_COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(generate_firms_rows(n_rows, seed=seed, **kwargs))
+    return out.getvalue()
+
+
+if __name__ == "__main__":
+    # python tests/benchmarks/firms_generator.py 10000 > firms.csv
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 42
+    sys.stdout.write(generate_firms_csv(rows, seed=seed))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for the synthetic FIRMS generator and the benchmark regression check.
+"""
+
+import sys
+import os
+import csv
+import io
+import pytest
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from firms_generator import DEFAULT_BBOX, VIIRS_COLUMNS, generate_firms_csv
+from bench_ingest import compare_to_baseline
+
+
+class TestFirmsGenerator:
+    """Test cases for the seeded VIIRS CSV generator."""
+
+    def test_same_seed_same_csv(self):
+        assert generate_firms_csv(500, seed=7) == generate_firms_csv(500, seed=7)
+        assert generate_firms_csv(500, seed=7) != generate_firms_csv(500, seed=8)
+
+    def test_rows_have_every_firms_column(self):
+        rows = list(csv.DictReader(io.StringIO(generate_firms_csv(1000))))
+        assert len(rows) == 1000
+        assert list(rows[0].keys()) == VIIRS_COLUMNS
+
+        west, south, east, north = DEFAULT_BBOX
+        for row in rows:
+            assert south <= float(row["latitude"]) <= north
+            assert west <= float(row["longitude"]) <= east
+            assert len(row["acq_time"]) == 4
+            assert row["confidence"] in ("l", "n", "h")
+            assert row["daynight"] in ("D", "N")
+
+    def test_hotspots_are_dense(self):
+        rows = list(csv.DictReader(io.StringIO(generate_firms_csv(2000, hotspot_fraction=1.0))))
+        pixels = {(row["latitude"], row["longitude"]) for row in rows}
+        # Fires sit on the 375 m grid, so many detections share a pixel neighbourhood
+        assert len(pixels) < len(rows)
+
+
+class TestBaselineComparison:
+    """Test cases for flagging benchmark regressions."""
+
+    def test_flags_slow_stage(self):
+        baseline = {"parse_csv@1000": {"seconds": 0.5, "peak_mb": 10.0}}
+        results = {"parse_csv@1000": {"seconds": 1.2, "peak_mb": 10.0}}
+        assert compare_to_baseline(results, baseline) == [("parse_csv@1000", "seconds", 0.5, 1.2)]
+
+    def test_ignores_noise_on_tiny_stages(self):
+        baseline = {"cluster_indices@1000": {"seconds": 0.001, "peak_mb": 0.1}}
+        results = {"cluster_indices@1000": {"seconds": 0.004, "peak_mb": 0.5}}
+        assert compare_to_baseline(results, baseline) == []
+
+    def test_new_stages_are_not_regressions(self):
+        assert compare_to_baseline({"parse_csv@200000": {"seconds": 9.0, "peak_mb": 900}}, {}) == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Tests for vectorized cluster aggregation.
+"""
+
+import sys
+import os
+import csv
+import io
+import json
+import random
+import pytest
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from firms_generator import VIIRS_COLUMNS, generate_firms_rows
+from utils.aggregate import aggregate_clusters, aggregate_detection_clusters
+from utils.firms import merge_detections, parse_firms_csv
+from utils.geo import cluster_detections, cluster_geojson_points, cluster_point_indices, create_cluster_feature
+
+
+def _detections(rows, columns=VIIRS_COLUMNS):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=columns, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+    return parse_firms_csv([out.getvalue().encode("utf-8")])
+
+
+def _expected(features, clusters):
+    return [create_cluster_feature([features[k] for k in cluster]) for cluster in clusters]
+
+
+def _point(lon, lat, **properties):
+    return {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]}, "properties": properties}
+
+
+def _same(actual, expected):
+    """
+    Same features as create_cluster_feature's, allowing for sums taken in a
+    different order: centroids to 1e-9 degrees, averages to one rounding step.
+    Everything else must match exactly; json.dumps also compares key order and
+    float reprs, and treats NaN as equal to itself.
+    """
+    assert len(actual) == len(expected)
+    for got, want in zip(actual, expected):
+        assert got["geometry"]["coordinates"] == pytest.approx(want["geometry"]["coordinates"], rel=0, abs=1e-9)
+        assert list(got["properties"]) == list(want["properties"])
+        for key, value in want["properties"].items():
+            if key.startswith("avg_"):
+                assert got["properties"][key] == pytest.approx(value, rel=0, abs=0.01 + 1e-9, nan_ok=True), key
+            else:
+                assert json.dumps(got["properties"][key]) == json.dumps(value), key
+    return True
+
+
+@pytest.fixture(scope="module")
+def detections():
+    return _detections(generate_firms_rows(3000, seed=16))
+
+
+class TestAggregateClusters:
+    """aggregate_clusters must reproduce create_cluster_feature."""
+
+    @pytest.mark.parametrize("distance_km", [0.2, 1.0, 5.0])
+    def test_matches_create_cluster_feature(self, detections, distance_km):
+        features = detections.to_features()
+        clusters = [c for c in cluster_point_indices(detections.lat.tolist(), detections.lon.tolist(), distance_km)
+                    if len(c) > 1]
+        assert clusters
+        assert _same(aggregate_clusters(features, clusters), _expected(features, clusters))
+
+    def test_messy_properties(self):
+        features = [
+            _point(-120, 38, brightness="310.5", frp=2, confidence="n", satellite="N", instrument="VIIRS",
+                   acq_date="2025-08-02", track=1),
+            _point(-120.01, 38.01, brightness=None, frp="abc", confidence="nan", satellite="", version=2.0,
+                   acq_date="2025-08-01", track=True),
+            _point(-120.02, 38, brightness="1e3", confidence=80, satellite="1", type=0, track="1"),
+            _point(-121, 39, frp=1.5, satellite="N"),
+            _point(-121.01, 39, frp=float("nan"), satellite="N", acq_date="2025-08-03"),
+            _point(-121.02, 39, frp=3.0, satellite="N", acq_date="2025-08-03"),
+        ]
+        clusters = [[0, 1, 2], [3, 4, 5], [5, 3]]
+        assert _same(aggregate_clusters(features, clusters), _expected(features, clusters))
+
+    def test_large_clusters(self):
+        rng = random.Random(5)
+        values = [1.0, 0.1, 0.2, 0.3, 1e-9, 250.75, 1e4]
+        features = [
+            _point(rng.uniform(-1, 1) * 1e-3 + 10, rng.uniform(-1, 1) * 1e-3 + 20, frp=rng.choice(values),
+                   brightness=rng.uniform(300, 400))
+            for _ in range(300)
+        ]
+        clusters = [list(range(0, 7)), list(range(7, 107)), list(range(107, 300))]
+        assert _same(aggregate_clusters(features, clusters), _expected(features, clusters))
+
+    def test_empty(self):
+        assert aggregate_clusters([], []) == []
+
+
+class TestAggregateDetectionClusters:
+    """The columnar path must match the feature-dict path."""
+
+    @pytest.mark.parametrize("distance_km", [0.2, 5.0])
+    def test_matches_create_cluster_feature(self, detections, distance_km):
+        features = detections.to_features()
+        clusters = [c for c in cluster_point_indices(detections.lat.tolist(), detections.lon.tolist(), distance_km)
+                    if len(c) > 1]
+        assert _same(aggregate_detection_clusters(detections, clusters), _expected(features, clusters))
+
+    def test_merged_sources_with_absent_columns(self):
+        viirs_rows = generate_firms_rows(800, seed=3)
+        modis_columns = ["brightness" if c == "bright_ti4" else "bright_t31" if c == "bright_ti5" else c
+                         for c in VIIRS_COLUMNS]
+        rng = random.Random(4)
+        modis_rows = []
+        for row in generate_firms_rows(800, seed=3):
+            row = {modis_columns[k]: row[c] for k, c in enumerate(VIIRS_COLUMNS)}
+            row["confidence"] = rng.choice(["55", "80", "", "nan", "abc"])
+            modis_rows.append(row)
+        merged = merge_detections(
+            {"VIIRS_SNPP_NRT": _detections(viirs_rows), "MODIS_NRT": _detections(modis_rows, modis_columns)},
+            distance_km=0.0001
+        )
+        assert merged.absent
+
+        features = merged.to_features()
+        clusters = [c for c in cluster_point_indices(merged.lat.tolist(), merged.lon.tolist(), 2.0) if len(c) > 1]
+        assert _same(aggregate_detection_clusters(merged, clusters), _expected(features, clusters))
+
+
+class TestClusteringOutputUnchanged:
+    """The clustering entry points still return what the per-cluster loop built."""
+
+    def test_cluster_geojson_points(self, detections):
+        features = detections.to_features()
+        clusters = cluster_point_indices(detections.lat.tolist(), detections.lon.tolist(), 1.0)
+        expected = [features[c[0]] if len(c) == 1 else create_cluster_feature([features[k] for k in c])
+                    for c in clusters]
+        assert _same(cluster_geojson_points(features, 1.0, workers=1), expected)
+
+    def test_cluster_detections(self, detections):
+        assert _same(cluster_detections(detections, 1.0, workers=1),
+                     cluster_geojson_points(detections.to_features(), 1.0, workers=1))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
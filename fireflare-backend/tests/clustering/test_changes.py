@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for stable cluster ids and snapshot change sets.
+"""
+
+import sys
+import os
+import csv
+import io
+import pytest
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from firms_generator import VIIRS_COLUMNS, generate_firms_rows
+from utils.changes import (
+    cluster_index, detection_key, detection_keys, diff_clusters, load_changes, load_cluster_index,
+    prune_changes, stable_ids, store_changes, store_cluster_index
+)
+from utils.externalapi import cluster_nasa_detections
+from utils.firms import parse_firms_csv
+from utils.geo import cluster_detections
+from utils.incremental import IncrementalClusterer
+
+
+def _detections(rows):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=VIIRS_COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+    return parse_firms_csv([out.getvalue().encode("utf-8")])
+
+
+def _without_ids(features):
+    return [{key: value for key, value in feature.items() if key != "id"} for feature in features]
+
+
+@pytest.fixture(scope="module")
+def windows():
+    """Two overlapping refresh windows: the oldest 10% expire, 10% new rows arrive."""
+    rows = generate_firms_rows(3000, seed=21)
+    new_rows = generate_firms_rows(300, seed=22)
+    return rows, rows[300:] + new_rows
+
+
+class TestClusterIds:
+    """Ids come from the seed detection, so unchanged clusters keep them."""
+
+    def test_detection_keys_match_feature_keys(self, windows):
+        detections = _detections(windows[0])
+        features = detections.to_features()
+        assert detection_keys(detections, range(len(detections))) == [detection_key(f) for f in features]
+
+    def test_repeated_keys_get_distinct_ids(self):
+        ids = stable_ids(["a", "b", "a", "a"])
+        assert len(set(ids)) == 4
+        assert stable_ids(["a", "b"]) == ids[:2]
+
+    def test_ids_are_unique_and_do_not_change_clusters(self, windows):
+        detections = _detections(windows[0])
+        clustered = cluster_detections(detections, 0.5, workers=1, with_ids=True)
+        assert len({f["id"] for f in clustered}) == len(clustered)
+        assert _without_ids(clustered) == cluster_detections(detections, 0.5, workers=1)
+
+    def test_incremental_ids_match_full(self, windows):
+        clusterer = IncrementalClusterer()
+        clusterer.cluster(_detections(windows[0]), 0.5, workers=1, with_ids=True)
+        detections = _detections(windows[1])
+        assert clusterer.cluster(detections, 0.5, workers=1, with_ids=True) == \
+            cluster_detections(detections, 0.5, workers=1, with_ids=True)
+        # The features kept for the next refresh have no ids of their own
+        assert clusterer.cluster(detections, 0.5, workers=1) == cluster_detections(detections, 0.5, workers=1)
+
+    def test_ids_survive_refresh(self, windows):
+        before = {f["id"]: f for f in cluster_detections(_detections(windows[0]), 0.5, workers=1, with_ids=True)}
+        after = cluster_detections(_detections(windows[1]), 0.5, workers=1, with_ids=True)
+        kept = [f for f in after if f["id"] in before]
+        assert len(kept) > len(after) // 2
+        assert sum(before[f["id"]] == f for f in kept) > len(kept) // 2
+
+    def test_unclustered_snapshot_has_ids(self, windows):
+        detections = _detections(windows[0][:50])
+        result = cluster_nasa_detections(detections, enable_clustering=False)
+        features = result["clustered"]["features"]
+        assert [f["id"] for f in features] == stable_ids(detection_key(f) for f in features)
+
+
+class TestChangeSets:
+    """Applying a change set to the old snapshot must give the new one."""
+
+    def test_diff_applies(self, windows):
+        old = cluster_detections(_detections(windows[0]), 0.5, workers=1, with_ids=True)
+        new = cluster_detections(_detections(windows[1]), 0.5, workers=1, with_ids=True)
+        changes = diff_clusters(cluster_index(old), new, cluster_index(new))
+        assert changes["added"] and changes["updated"] and changes["removed"]
+
+        applied = {f["id"]: f for f in old}
+        for cluster_id in changes["removed"]:
+            del applied[cluster_id]
+        for feature in changes["added"] + changes["updated"]:
+            applied[feature["id"]] = feature
+        assert sorted(applied) == sorted(f["id"] for f in new)
+        assert all(applied[f["id"]] == f for f in new)
+
+    def test_no_index_without_ids(self, windows):
+        assert cluster_index(cluster_detections(_detections(windows[0]), 0.5, workers=1)) is None
+
+    def test_store_load_and_prune(self, windows):
+        mongomock = pytest.importorskip("mongomock")
+        collection = mongomock.MongoClient().db.NasaWildfireChanges
+        old = cluster_detections(_detections(windows[0]), 0.5, workers=1, with_ids=True)
+        new = cluster_detections(_detections(windows[1]), 0.5, workers=1, with_ids=True)
+        old_index, new_index = cluster_index(old), cluster_index(new)
+
+        store_cluster_index(collection, "s1", old_index)
+        assert load_cluster_index(collection, "s1") == old_index
+        store_cluster_index(collection, "s2", new_index)
+        store_changes(collection, "s1", "s2", diff_clusters(old_index, new, new_index), len(new))
+        stored = load_changes(collection, "s1", "s2")
+        assert not stored["full"]
+        assert stored["removed"] == diff_clusters(old_index, new, new_index)["removed"]
+
+        prune_changes(collection, "s3", ["s2", "s3"])
+        assert load_changes(collection, "s1", "s2") is None
+        assert load_cluster_index(collection, "s1") is None
+        assert load_cluster_index(collection, "s2") == new_index
+
+    def test_large_change_is_full_reload(self, windows):
+        mongomock = pytest.importorskip("mongomock")
+        collection = mongomock.MongoClient().db.NasaWildfireChanges
+        new = cluster_detections(_detections(windows[1]), 0.5, workers=1, with_ids=True)
+        doc = store_changes(collection, "s1", "s2", diff_clusters({}, new, cluster_index(new)), len(new))
+        assert doc["full"] and "added" not in load_changes(collection, "s1", "s2")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
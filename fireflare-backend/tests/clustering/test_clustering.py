@@ -205,5 +205,94 @@ def test_clustering_performance():
     assert processing_time < 10.0, f"Clustering took too long: {processing_time:.3f}s"
     assert len(result) < len(large_features), "Should reduce the number of features"
 
+def test_grid_clustering_matches_pairwise_scan():
+    """Grid-indexed clustering must give the same greedy membership as a full pairwise scan."""
+    import random
+    from utils.geo import cluster_point_indices
+
+    random.seed(42)
+    lats, lons = [], []
+    for center_lon, center_lat in [(-120.5, 38.2), (-115.0, 64.8), (-81.3, 27.9)]:
+        for _ in range(300):
+            lons.append(center_lon + random.gauss(0, 0.02))
+            lats.append(center_lat + random.gauss(0, 0.02))
+
+    from utils.calculate import haversine_many_to_many
+    distances = haversine_many_to_many(lats, lons, lats, lons)
+
+    for distance_km in (0.2, 1.0, 5.0):
+        expected = []
+        used = set()
+        for i in range(len(lats)):
+            if i in used:
+                continue
+            members = [i]
+            used.add(i)
+            for j in range(len(lats)):
+                if j not in used and distances[i, j] <= distance_km:
+                    members.append(j)
+                    used.add(j)
+            expected.append(members)
+
+        assert cluster_point_indices(lats, lons, distance_km) == expected
+
+def test_grid_index_bbox_query():
+    """GridIndex bbox queries return exactly the points inside the box."""
+    from utils.spatial import GridIndex
+
+    grid = GridIndex(0.5)
+    points = {0: (-120.0, 35.0), 1: (-119.6, 35.4), 2: (-118.0, 36.0), 3: (-120.2, 34.9)}
+    for idx, (x, y) in points.items():
+        grid.insert(idx, x, y)
+
+    assert sorted(grid.query_bbox(-120.1, 34.95, -119.5, 35.5)) == [0, 1]
+
+    grid.remove(1, *points[1])
+    assert grid.query_bbox(-120.1, 34.95, -119.5, 35.5) == [0]
+    assert len(grid) == 3
+
+def test_batch_haversine_matches_scalar():
+    """One-to-many and many-to-many distances agree with the scalar function."""
+    import numpy as np
+    from utils.calculate import haversine_one_to_many, haversine_many_to_many
+
+    lats = np.array([34.0522, 37.7749, 40.7128, 64.8378])
+    lons = np.array([-118.2437, -122.4194, -74.0060, -147.7164])
+
+    row = haversine_one_to_many(lats[0], lons[0], lats, lons)
+    matrix = haversine_many_to_many(lats, lons, lats, lons, block_size=3)
+
+    for i in range(len(lats)):
+        assert row[i] == pytest.approx(haversine_distance(lats[0], lons[0], lats[i], lons[i]))
+        for j in range(len(lats)):
+            assert matrix[i, j] == pytest.approx(haversine_distance(lats[i], lons[i], lats[j], lons[j]))
+
+def test_haversine_pairs_within_radius():
+    """Pairwise-within-radius matches a brute-force matrix, including at high latitudes."""
+    import numpy as np
+    from utils.calculate import haversine_pairs_within, haversine_many_to_many
+
+    rng = np.random.default_rng(3)
+    lats = np.concatenate([45 + rng.normal(0, 0.3, 300), 69 + rng.normal(0, 0.1, 200)])
+    lons = np.concatenate([-120 + rng.normal(0, 0.3, 300), -140 + rng.normal(0, 0.3, 200)])
+
+    i, j, d = haversine_pairs_within(lats, lons, 3.0, block_size=97)
+    full = haversine_many_to_many(lats, lons, lats, lons)
+    expected_i, expected_j = np.nonzero(np.triu(full <= 3.0, k=1))
+
+    assert i.tolist() == expected_i.tolist()
+    assert j.tolist() == expected_j.tolist()
+    assert np.allclose(d, full[i, j])
+
+    # Cross join against a second set (e.g. addresses), which may lie outside the first set's extent
+    other_lats = np.concatenate([lats[:100] + 0.01, [45.5, 10.0]])
+    other_lons = np.concatenate([lons[:100], [-121.5, 20.0]])
+    ci, cj, cd = haversine_pairs_within(lats, lons, 3.0, other_lats, other_lons, block_size=97)
+    cross = haversine_many_to_many(lats, lons, other_lats, other_lons)
+    expected_i, expected_j = np.nonzero(cross <= 3.0)
+    assert ci.tolist() == expected_i.tolist()
+    assert cj.tolist() == expected_j.tolist()
+    assert np.allclose(cd, cross[ci, cj])
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
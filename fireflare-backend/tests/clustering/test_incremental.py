@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental clustering across refreshes.
+"""
+
+import sys
+import os
+import csv
+import io
+import pytest
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from firms_generator import VIIRS_COLUMNS, generate_firms_rows
+from utils.externalapi import cluster_nasa_detections
+from utils.firms import FirmsDetections, parse_firms_csv
+from utils.geo import cluster_detections
+from utils.incremental import IncrementalClusterer
+
+
+def _detections(rows):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=VIIRS_COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+    return parse_firms_csv([out.getvalue().encode("utf-8")])
+
+
+@pytest.fixture(scope="module")
+def windows():
+    """Two overlapping refresh windows: the oldest 10% expire, 10% new rows arrive."""
+    rows = generate_firms_rows(4000, seed=11)
+    new_rows = generate_firms_rows(400, seed=12)
+    return rows, rows[400:] + new_rows
+
+
+class TestIncrementalClusterer:
+    """Reused clusters must be indistinguishable from a full re-cluster."""
+
+    def test_first_run_matches_full(self, windows):
+        detections = _detections(windows[0])
+        clusterer = IncrementalClusterer()
+        assert clusterer.cluster(detections, 0.5, workers=1) == cluster_detections(detections, 0.5, workers=1)
+        assert clusterer.last_stats["reclustered_count"] == len(detections)
+
+    @pytest.mark.parametrize("distance_km", [0.2, 0.5, 5.0])
+    def test_refresh_matches_full(self, windows, distance_km):
+        clusterer = IncrementalClusterer()
+        clusterer.cluster(_detections(windows[0]), distance_km, workers=1)
+
+        detections = _detections(windows[1])
+        assert clusterer.cluster(detections, distance_km, workers=1) == cluster_detections(detections, distance_km, workers=1)
+        stats = clusterer.last_stats
+        assert stats["reused_count"] + stats["reclustered_count"] == len(detections)
+
+    def test_only_changes_are_reclustered(self, windows):
+        clusterer = IncrementalClusterer()
+        clusterer.cluster(_detections(windows[0]), 0.5, workers=1)
+        clusterer.cluster(_detections(windows[1]), 0.5, workers=1)
+        assert 0 < clusterer.last_stats["reclustered_count"] < len(windows[1])
+
+        # Nothing changed since the last refresh
+        clusterer.cluster(_detections(windows[1]), 0.5, workers=1)
+        assert clusterer.last_stats["reclustered_count"] == 0
+
+    def test_changed_properties_are_picked_up(self, windows):
+        rows = [dict(row) for row in windows[0]]
+        clusterer = IncrementalClusterer()
+        clusterer.cluster(_detections(rows), 0.5, workers=1)
+
+        rows[7]["frp"] = "123456.78"    # also widens the frp column
+        detections = _detections(rows)
+        result = clusterer.cluster(detections, 0.5, workers=1)
+        assert result == cluster_detections(detections, 0.5, workers=1)
+        assert any(
+            f["properties"].get("frp") == "123456.78" or f["properties"].get("max_frp") == 123456.78
+            for f in result
+        )
+
+    def test_distance_change_starts_over(self, windows):
+        detections = _detections(windows[0])
+        clusterer = IncrementalClusterer()
+        clusterer.cluster(detections, 0.5, workers=1)
+        assert clusterer.cluster(detections, 1.0, workers=1) == cluster_detections(detections, 1.0, workers=1)
+        assert clusterer.last_stats["reclustered_count"] == len(detections)
+
+    def test_warm_from_stored_features(self, windows):
+        # A restarted process rebuilds the memo from the last snapshot's stored originals
+        stored = _detections(windows[0]).to_features()
+        clusterer = IncrementalClusterer()
+        clusterer.warm(FirmsDetections.from_features(stored), 0.5, workers=1)
+
+        detections = _detections(windows[1])
+        assert clusterer.cluster(detections, 0.5, workers=1) == cluster_detections(detections, 0.5, workers=1)
+        assert 0 < clusterer.last_stats["reclustered_count"] < len(windows[1])
+
+        # Only an empty memo is rebuilt
+        clusterer.warm(FirmsDetections.from_features(stored), 0.5, workers=1)
+        clusterer.cluster(detections, 0.5, workers=1)
+        assert clusterer.last_stats["reclustered_count"] == 0
+
+    def test_from_features_round_trip(self, windows):
+        detections = _detections(windows[0][:50])
+        features = detections.to_features()
+        del features[3]["properties"]["frp"]
+        features[4]["properties"]["satellites"] = ["N", "N20"]
+        rebuilt = FirmsDetections.from_features(features)
+        assert rebuilt.to_features() == features
+        assert list(rebuilt.columns) == list(detections.columns) + ["satellites"]
+
+    def test_cluster_nasa_detections_reports_reclustered(self, windows):
+        clusterer = IncrementalClusterer()
+        detections = _detections(windows[0])
+        first = cluster_nasa_detections(detections, True, 0.5, cluster_workers=1, clusterer=clusterer)
+        second = cluster_nasa_detections(detections, True, 0.5, cluster_workers=1, clusterer=clusterer)
+        assert first["reclustered_count"] == len(detections)
+        assert second["reclustered_count"] == 0
+        assert second["clustered"] == first["clustered"]
+        assert "reclustered_count" not in cluster_nasa_detections(detections, True, 0.5, cluster_workers=1)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test script for the multi-zoom cluster pyramid.
+"""
+
+import sys
+import os
+import random
+import pytest
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from utils.pyramid import build_cluster_pyramid, get_clusters
+
+WORLD = [-180, -85, 180, 85]
+
+class TestClusterPyramid:
+    """Test cases for the cluster pyramid."""
+    
+    @pytest.fixture
+    def hotspot_features(self):
+        """Three fire hotspots of detections plus a few isolated ones."""
+        random.seed(3)
+        features = []
+        for center_lon, center_lat in [(-120.5, 38.2), (-115.0, 54.8), (-81.3, 27.9)]:
+            for _ in range(200):
+                features.append({
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [center_lon + random.gauss(0, 0.05), center_lat + random.gauss(0, 0.05)]},
+                    "properties": {"frp": str(round(random.uniform(1, 40), 2)), "acq_date": "2025-08-01", "acq_time": "1030"}
+                })
+        for lon, lat in [(-100.0, 40.0), (-70.0, 45.0)]:
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": {"frp": "5.0", "acq_date": "2025-08-02", "acq_time": "0100"}
+            })
+        return features
+    
+    def test_point_counts_preserved_at_every_zoom(self, hotspot_features):
+        """Every level accounts for every detection exactly once."""
+        pyramid = build_cluster_pyramid(hotspot_features)
+        
+        for zoom in range(0, 18):
+            features = get_clusters(pyramid, WORLD, zoom)["features"]
+            total = sum(f["properties"].get("point_count", 1) for f in features)
+            assert total == len(hotspot_features), f"Zoom {zoom} lost points"
+    
+    def test_low_zoom_merges_and_high_zoom_splits(self, hotspot_features):
+        """Zoomed out shows a handful of clusters; past max zoom shows raw points."""
+        pyramid = build_cluster_pyramid(hotspot_features)
+        
+        zoomed_out = get_clusters(pyramid, WORLD, 0)["features"]
+        assert len(zoomed_out) <= 5
+        assert any(f["properties"].get("cluster") for f in zoomed_out)
+        
+        zoomed_in = get_clusters(pyramid, WORLD, 20)["features"]
+        assert len(zoomed_in) == len(hotspot_features)
+        assert all("cluster" not in f["properties"] for f in zoomed_in)
+    
+    def test_bbox_filters_viewport(self, hotspot_features):
+        """Only clusters inside the viewport are returned."""
+        pyramid = build_cluster_pyramid(hotspot_features)
+        
+        california = get_clusters(pyramid, [-125, 35, -115, 42], 8)["features"]
+        assert california
+        for feature in california:
+            lon, lat = feature["geometry"]["coordinates"]
+            assert -125 <= lon <= -115 and 35 <= lat <= 42
+        assert sum(f["properties"].get("point_count", 1) for f in california) == 200
+    
+    def test_cluster_aggregates(self, hotspot_features):
+        """Cluster summaries carry FRP aggregates and the latest acquisition."""
+        pyramid = build_cluster_pyramid(hotspot_features)
+        
+        cluster = next(f for f in get_clusters(pyramid, WORLD, 0)["features"] if f["properties"].get("cluster"))
+        props = cluster["properties"]
+        assert props["point_count"] > 1
+        assert 1 <= props["avg_frp"] <= props["max_frp"] <= 40
+        assert props["latest_acquisition"].startswith("2025-08-0")
+    
+    def test_empty_features(self):
+        """An empty snapshot yields empty levels."""
+        pyramid = build_cluster_pyramid([])
+        assert get_clusters(pyramid, WORLD, 5)["features"] == []
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
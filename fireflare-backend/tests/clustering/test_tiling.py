@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for tiled clustering across a process pool.
+"""
+
+import sys
+import os
+import numpy as np
+import pytest
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from firms_generator import generate_firms_rows
+from utils.geo import cluster_geojson_points, cluster_point_indices
+from utils.calculate import haversine_pairs_within
+from utils.tiling import connected_components, partition_tiles, tiled_cluster_indices
+
+
+@pytest.fixture(scope="module")
+def firms_points():
+    """Hotspot-heavy synthetic FIRMS detections."""
+    rows = generate_firms_rows(6000, seed=7)
+    return [float(r["latitude"]) for r in rows], [float(r["longitude"]) for r in rows]
+
+
+def _seam_chain():
+    """A chain of points 0.15 km apart crossing the lon=-120 / lat=38 tile corner."""
+    step = 0.15 / 111.19
+    lats = [38.0 + step * (k - 20) for k in range(40)]
+    lons = [-120.0 + step * (k - 20) for k in range(40)]
+    # Shuffle so the chain's lowest index is not at one end
+    order = np.random.default_rng(3).permutation(40)
+    return [lats[k] for k in order], [lons[k] for k in order]
+
+
+class TestPartition:
+    """Tiles must never separate points that can end up in one cluster."""
+
+    def test_connected_components(self):
+        labels = connected_components(6, np.array([0, 3, 4]), np.array([5, 4, 1]))
+        assert labels.tolist() == [0, 1, 2, 1, 1, 0]
+
+    def test_components_stay_in_one_tile(self, firms_points):
+        lats, lons = firms_points
+        tiles = partition_tiles(lats, lons, 0.5, tile_degrees=0.5)
+        tile_of = np.empty(len(lats), dtype=int)
+        for t, tile in enumerate(tiles):
+            tile_of[tile] = t
+            assert np.all(np.diff(tile) > 0)
+        assert sorted(np.concatenate(tiles).tolist()) == list(range(len(lats)))
+
+        i, j, _ = haversine_pairs_within(lats, lons, 0.5)
+        assert np.all(tile_of[i] == tile_of[j])
+        assert len(tiles) > 1
+
+    def test_seam_component_kept_whole(self):
+        lats, lons = _seam_chain()
+        tiles = partition_tiles(lats, lons, 0.2, tile_degrees=1.0)
+        assert len(tiles) == 1
+
+
+class TestTiledClustering:
+    """Parallel clustering returns exactly the single-process result."""
+
+    @pytest.mark.parametrize("distance_km", [0.2, 1.0, 5.0])
+    def test_matches_serial(self, firms_points, distance_km):
+        lats, lons = firms_points
+        expected = cluster_point_indices(lats, lons, distance_km)
+        tiled = tiled_cluster_indices(lats, lons, distance_km, workers=2, tile_degrees=0.5, min_points=1)
+        assert tiled == expected
+
+    def test_seam_cluster_not_split(self, firms_points):
+        chain_lats, chain_lons = _seam_chain()
+        lats = firms_points[0] + chain_lats
+        lons = firms_points[1] + chain_lons
+        expected = cluster_point_indices(lats, lons, 0.2)
+        assert tiled_cluster_indices(lats, lons, 0.2, workers=3, tile_degrees=1.0, min_points=1) == expected
+
+    def test_small_inputs_stay_in_process(self):
+        lats, lons = _seam_chain()
+        assert tiled_cluster_indices(lats, lons, 0.2, workers=4) == cluster_point_indices(lats, lons, 0.2)
+        assert tiled_cluster_indices([], [], 0.2, workers=4, min_points=0) == []
+
+    def test_cluster_geojson_points_workers(self, firms_points):
+        lats, lons = firms_points
+        features = [
+            {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]}, "properties": {"frp": 1.0}}
+            for lat, lon in zip(lats, lons)
+        ]
+        serial = cluster_geojson_points(features, 0.5, workers=1)
+        assert cluster_geojson_points(features, 0.5, workers=2) == serial
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
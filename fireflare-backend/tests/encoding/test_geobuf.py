@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test script for the Geobuf encoder used by the format=geobuf responses.
+"""
+
+import sys
+import os
+import json
+import struct
+import pytest
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from firms_generator import generate_firms_csv
+from utils.firms import parse_firms_csv
+from utils.geo import cluster_detections
+from utils.geobuf import encode_geobuf
+from test_vector_tiles import read_fields, read_varint
+
+
+GEOMETRY_NAMES = ["Point", "MultiPoint", "LineString"]
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def _packed(data):
+    values, pos = [], 0
+    while pos < len(data):
+        value, pos = read_varint(data, pos)
+        values.append(value)
+    return values
+
+
+def _value(data):
+    (field, _, raw), = read_fields(data)
+    if field == 1:
+        return raw.decode("utf-8")
+    if field == 2:
+        return struct.unpack("<d", raw)[0]
+    if field == 3:
+        return raw
+    if field == 4:
+        return -raw
+    if field == 5:
+        return bool(raw)
+    return json.loads(raw)
+
+
+def _properties(fields, keys, index_field):
+    values = [_value(raw) for field, _, raw in fields if field == 13]
+    indexes = [index for field, _, raw in fields if field == index_field for index in _packed(raw)]
+    return {keys[indexes[k]]: values[indexes[k + 1]] for k in range(0, len(indexes), 2)}
+
+
+def decode_geobuf(data):
+    """Geobuf back to GeoJSON, following geobuf.js decode()."""
+    fields = read_fields(data)
+    keys = [raw.decode("utf-8") for field, _, raw in fields if field == 1]
+    precision = next((raw for field, _, raw in fields if field == 3), 6)
+    scale = 10 ** precision
+    collection_fields = read_fields(next(raw for field, _, raw in fields if field == 4))
+
+    features = []
+    for field, _, raw in collection_fields:
+        if field != 1:
+            continue
+        feature_fields = read_fields(raw)
+        geometry_fields = read_fields(next(r for f, _, r in feature_fields if f == 1))
+        geometry_type = GEOMETRY_NAMES[next(r for f, _, r in geometry_fields if f == 1)]
+        coords = [_unzigzag(v) for f, _, r in geometry_fields if f == 3 for v in _packed(r)]
+        if geometry_type == "Point":
+            coordinates = [c / scale for c in coords]
+        else:
+            coordinates, x, y = [], 0, 0
+            for k in range(0, len(coords), 2):
+                x, y = x + coords[k], y + coords[k + 1]
+                coordinates.append([x / scale, y / scale])
+        feature = {"type": "Feature", "geometry": {"type": geometry_type, "coordinates": coordinates}}
+        for f, _, r in feature_fields:
+            if f == 11:
+                feature["id"] = r.decode("utf-8")
+            elif f == 12:
+                feature["id"] = _unzigzag(r)
+        feature["properties"] = _properties(feature_fields, keys, 14)
+        features.append(feature)
+
+    collection = {"type": "FeatureCollection", "features": features}
+    collection.update(_properties(collection_fields, keys, 15))
+    return collection
+
+
+def _assert_same_features(decoded, features, precision=6):
+    assert len(decoded) == len(features)
+    for got, expected in zip(decoded, features):
+        assert got["properties"] == expected["properties"]
+        assert got.get("id") == expected.get("id")
+        assert got["geometry"]["type"] == expected["geometry"]["type"]
+        for a, b in zip(got["geometry"]["coordinates"], expected["geometry"]["coordinates"][:2]):
+            assert a == pytest.approx(b, abs=10 ** -precision)
+
+
+@pytest.fixture(scope="module")
+def detections():
+    return parse_firms_csv([generate_firms_csv(2000, seed=19).encode("utf-8")])
+
+
+class TestGeobuf:
+    """Encoded collections must decode back to the same GeoJSON."""
+
+    def test_firms_detections_round_trip(self, detections):
+        features = detections.to_features()
+        data = encode_geobuf({"type": "FeatureCollection", "features": features})
+        _assert_same_features(decode_geobuf(data)["features"], features)
+        assert len(data) < len(json.dumps({"type": "FeatureCollection", "features": features})) / 2
+
+    def test_clusters_round_trip(self, detections):
+        clusters = cluster_detections(detections, 2.0, workers=1, with_ids=True)
+        decoded = decode_geobuf(encode_geobuf({"type": "FeatureCollection", "features": clusters}))
+        _assert_same_features(decoded["features"], clusters)
+
+    def test_value_types(self):
+        properties = {"s": "310.5", "i": 7, "neg": -3, "f": 0.25, "whole": 2.0, "b": True, "zero": False,
+                      "none": None, "list": ["N", "1"], "big": 2 ** 60}
+        feature = {"type": "Feature", "id": 42, "geometry": {"type": "Point", "coordinates": [-120.5, 38.25]},
+                   "properties": properties}
+        decoded = decode_geobuf(encode_geobuf({"type": "FeatureCollection", "features": [feature]}))["features"][0]
+        assert decoded["id"] == 42
+        assert decoded["properties"] == properties
+        assert type(decoded["properties"]["s"]) is str and type(decoded["properties"]["b"]) is bool
+
+    def test_custom_properties_and_lines(self):
+        collection = {
+            "type": "FeatureCollection",
+            "features": [{"type": "Feature",
+                          "geometry": {"type": "LineString", "coordinates": [[-120, 38], [-120.5, 38.25], [-121, 39]]},
+                          "properties": {}}],
+            "metadata": {"original_count": 1, "source": "NASA_VIIRS_SNPP_NRT"}
+        }
+        decoded = decode_geobuf(encode_geobuf(collection, precision=4))
+        assert decoded["metadata"] == collection["metadata"]
+        _assert_same_features(decoded["features"], collection["features"], precision=4)
+
+    def test_unsupported_geometry(self):
+        polygon = {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": []}, "properties": {}}
+        with pytest.raises(ValueError):
+            encode_geobuf({"type": "FeatureCollection", "features": [polygon]})
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the versioned response cache and precompressed payloads.
+"""
+
+import sys
+import os
+import gzip
+import pytest
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import utils.cache
+from utils.cache import (
+    LRUCache,
+    EncodedPayload,
+    accepts_encoding,
+    encoded_etag,
+    etag_matches,
+    load_payload,
+    negotiate_encoding,
+    payload_etag,
+    prune_payloads,
+    store_payload
+)
+
+
+class TestResponseCache:
+    """Test cases for LRUCache versioning and EncodedPayload."""
+
+    def test_new_version_drops_entries(self):
+        cache = LRUCache(max_entries=4)
+        cache.put("snap-1:t1", "nasa", EncodedPayload(b"{}"))
+        assert cache.get("snap-1:t1", "nasa").body == b"{}"
+        assert cache.get("snap-2:t2", "nasa") is None
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        cache = LRUCache(max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.put("v", key, key)
+        assert cache.get("v", "a") is None
+        assert cache.get("v", "c") == "c"
+
+    def test_gzip_variant_is_stable(self):
+        body = b'{"type":"FeatureCollection","features":[]}\n' * 20
+        payload = EncodedPayload(body)
+        assert gzip.decompress(payload.gzipped()) == body
+        assert payload.gzipped() is payload.gzipped()
+        assert EncodedPayload(body).gzipped() == payload.gzipped()
+
+    def test_accepts_encoding(self):
+        assert accepts_encoding("gzip, deflate, br", "gzip")
+        assert accepts_encoding("*", "gzip")
+        assert not accepts_encoding("gzip;q=0, deflate", "gzip")
+        assert not accepts_encoding("identity", "gzip")
+        assert not accepts_encoding(None, "gzip")
+
+
+class TestConditionalResponses:
+    """Test cases for ETags, content negotiation and the ingest-time payload store."""
+
+    def test_etag_depends_on_version_and_key(self):
+        etag = payload_etag("snap-1:t1", "nasa")
+        assert etag.startswith('"') and etag.endswith('"')
+        assert etag == payload_etag("snap-1:t1", "nasa")
+        assert etag != payload_etag("snap-1:t2", "nasa")
+        assert etag != payload_etag("snap-1:t1", "original")
+
+    def test_etag_matches_any_encoding(self):
+        etag = payload_etag("snap-1:t1", "nasa")
+        assert encoded_etag(etag, None) == etag
+        assert etag_matches(etag, etag)
+        assert etag_matches(encoded_etag(etag, "gzip"), etag)
+        assert etag_matches(f'"other", W/{encoded_etag(etag, "br")}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches(payload_etag("snap-2:t2", "nasa"), etag)
+        assert not etag_matches(None, etag)
+
+    def test_negotiate_encoding(self, monkeypatch):
+        monkeypatch.setattr(utils.cache, "brotli", None)
+        assert negotiate_encoding("gzip, deflate, br") == "gzip"
+        assert negotiate_encoding("identity") is None
+        assert negotiate_encoding(None) is None
+
+    def test_brotli_variant(self):
+        brotli = pytest.importorskip("brotli")
+        body = b'{"type":"FeatureCollection","features":[]}\n' * 20
+        assert negotiate_encoding("gzip, br") == "br"
+        assert negotiate_encoding("gzip, br;q=0") == "gzip"
+        assert brotli.decompress(EncodedPayload(body).encoded("br")) == body
+
+    def test_store_and_load_payload(self):
+        mongomock = pytest.importorskip("mongomock")
+        collection = mongomock.MongoClient().db.EncodedResponses
+        body = b'{"features":[1,2,3]}' * 50
+        etag = payload_etag("snap-1:t1", "nasa")
+        assert store_payload(collection, "snap-1:t1", "nasa", EncodedPayload(body, etag=etag))
+
+        loaded = load_payload(collection, "snap-1:t1", "nasa")
+        assert loaded.etag == etag
+        assert gzip.decompress(loaded.gzipped()) == body
+        assert loaded.body == body
+        assert load_payload(collection, "snap-2:t2", "nasa") is None
+
+    def test_oversized_payload_is_not_stored(self, monkeypatch):
+        mongomock = pytest.importorskip("mongomock")
+        collection = mongomock.MongoClient().db.EncodedResponses
+        monkeypatch.setattr(utils.cache, "MAX_STORED_PAYLOAD_BYTES", 10)
+        assert not store_payload(collection, "snap-1:t1", "original", EncodedPayload(b"{}" * 100))
+        assert collection.count_documents({}) == 0
+
+    def test_prune_keeps_listed_versions(self):
+        mongomock = pytest.importorskip("mongomock")
+        collection = mongomock.MongoClient().db.EncodedResponses
+        for version in ("snap-1:t1", "snap-2:t2", "snap-3:t3"):
+            store_payload(collection, version, "nasa", EncodedPayload(b"{}"))
+        store_payload(collection, "aqi-1:t1", "openweather", EncodedPayload(b"{}"))
+
+        assert prune_payloads(collection, ["nasa"], ["snap-3:t3", "snap-2:t2"]) == 1
+        assert load_payload(collection, "snap-1:t1", "nasa") is None
+        assert load_payload(collection, "snap-2:t2", "nasa") is not None
+        assert load_payload(collection, "aqi-1:t1", "openweather") is not None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
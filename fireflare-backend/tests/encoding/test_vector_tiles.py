@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test script for the hand-rolled protobuf writer and Mapbox Vector Tile encoder.
+"""
+
+import sys
+import os
+import pytest
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from utils.pbf import PbfWriter, zigzag
+from utils.pyramid import build_cluster_pyramid
+from utils.mvt import encode_wildfire_tile
+
+
+def read_varint(data, pos):
+    """Decode one varint, returning (value, new_pos)."""
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def read_fields(data):
+    """Decode a protobuf message into a list of (field, wire_type, value)."""
+    fields = []
+    pos = 0
+    while pos < len(data):
+        key, pos = read_varint(data, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, pos = read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        else:
+            raise ValueError(f"Unexpected wire type {wire_type}")
+        fields.append((field, wire_type, value))
+    return fields
+
+
+class TestPbfWriter:
+    """Test cases for protobuf primitives."""
+    
+    def test_varint_encoding(self):
+        writer = PbfWriter()
+        writer.varint(1)
+        writer.varint(300)
+        assert writer.getvalue() == b"\x01\xac\x02"
+    
+    def test_zigzag(self):
+        assert [zigzag(v) for v in (0, -1, 1, -2, 2)] == [0, 1, 2, 3, 4]
+    
+    def test_string_field(self):
+        writer = PbfWriter()
+        writer.field_string(1, "fire")
+        assert read_fields(writer.getvalue()) == [(1, 2, b"fire")]
+
+
+class TestVectorTiles:
+    """Test cases for wildfire vector tiles."""
+    
+    @pytest.fixture
+    def pyramid(self):
+        features = [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [-120.0 + i * 0.001, 38.0]},
+                "properties": {"frp": "4.5", "satellite": "N", "acq_date": "2025-08-01", "acq_time": "0130"}
+            }
+            for i in range(20)
+        ]
+        return build_cluster_pyramid(features)
+    
+    def test_world_tile_contains_cluster(self, pyramid):
+        tile = encode_wildfire_tile(pyramid, 0, 0, 0)
+        layers = [value for field, _, value in read_fields(tile) if field == 3]
+        assert len(layers) == 1
+        
+        layer = read_fields(layers[0])
+        assert (1, 2, b"wildfires") in layer
+        assert (15, 0, 2) in layer
+        assert (5, 0, 4096) in layer
+        
+        features = [value for field, _, value in layer if field == 2]
+        assert len(features) == 1  # All 20 detections merge at zoom 0
+        keys = [value.decode() for field, _, value in layer if field == 3]
+        assert "point_count" in keys
+    
+    def test_empty_tile(self, pyramid):
+        # Tile 1/1/1 is the south-east quadrant, far from the California detections
+        assert encode_wildfire_tile(pyramid, 1, 1, 1) == b""
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
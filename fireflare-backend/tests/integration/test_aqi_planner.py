@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for the priority-tiered AQI refresh planner.
+"""
+
+import sys
+import os
+import pytest
+from datetime import datetime, timedelta
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from utils.geo import GridPoint
+from utils.aqiplanner import due_zones, merge_features, plan_refresh, refresh_interval
+
+
+def _feature(lon, lat, aqi):
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [lon, lat]},
+        "properties": {"aqi": aqi}
+    }
+
+
+class TestAQIPlanner:
+    """Test cases for tiered zone refreshes and snapshot merging."""
+
+    @pytest.fixture
+    def grid_points(self):
+        return [
+            GridPoint(lat=36.0, lon=-120.0, zone="california_forests", spacing_km=25, priority=1),
+            GridPoint(lat=36.2, lon=-120.0, zone="california_forests", spacing_km=25, priority=1),
+            GridPoint(lat=40.0, lon=-90.0, zone="eastern_us_plains", spacing_km=100, priority=8),
+            GridPoint(lat=33.0, lon=-110.0, zone="southwest_deserts", spacing_km=40, priority=4),
+        ]
+
+    def test_everything_due_without_history(self, grid_points):
+        points, zones = plan_refresh(grid_points, {}, datetime(2025, 8, 1, 12))
+        assert len(points) == len(grid_points)
+        # Highest priority first
+        assert zones == ["california_forests", "southwest_deserts", "eastern_us_plains"]
+        assert [p.priority for p in points] == [1, 1, 4, 8]
+
+    def test_tiers_refresh_at_different_rates(self, grid_points):
+        now = datetime(2025, 8, 1, 12)
+        two_hours_ago = (now - timedelta(hours=2)).isoformat()
+        refreshed = {
+            "california_forests": two_hours_ago,
+            "southwest_deserts": two_hours_ago,
+            "eastern_us_plains": two_hours_ago,
+        }
+        assert due_zones(grid_points, refreshed, now) == {"california_forests": 1}
+
+        points, _ = plan_refresh(grid_points, refreshed, now + timedelta(hours=9))
+        assert {p.zone for p in points} == {"california_forests", "southwest_deserts"}
+
+    def test_unknown_priority_uses_slowest_tier(self):
+        assert refresh_interval(99) == timedelta(hours=12)
+        assert refresh_interval(1) == timedelta(hours=1)
+
+    def test_merge_keeps_unrefreshed_points(self):
+        previous = [_feature(-120.0, 36.0, 40), _feature(-90.0, 40.0, 20)]
+        fresh = [_feature(-120.0, 36.0, 150)]
+        merged = merge_features(previous, fresh)
+        assert len(merged) == 2
+        by_lon = {f["geometry"]["coordinates"][0]: f["properties"]["aqi"] for f in merged}
+        assert by_lon == {-120.0: 150, -90.0: 20}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
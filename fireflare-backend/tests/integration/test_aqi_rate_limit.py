@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the AQI fetcher's token bucket and retry backoff.
+"""
+
+import sys
+import os
+import asyncio
+import time
+import pytest
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from utils.ratelimit import TokenBucket, backoff_delay, is_retryable_status
+
+
+class TestRateLimit:
+    """Test cases for the OpenWeather request limiter."""
+
+    def test_token_bucket_holds_the_rate(self):
+        async def drain():
+            bucket = TokenBucket(rate=200, capacity=1)
+            start = time.monotonic()
+            await asyncio.gather(*(bucket.acquire() for _ in range(41)))
+            return time.monotonic() - start
+
+        # First token is free, the other 40 arrive at 200/s
+        assert asyncio.run(drain()) >= 0.19
+
+    def test_token_bucket_allows_burst(self):
+        async def burst():
+            bucket = TokenBucket(rate=1, capacity=10)
+            start = time.monotonic()
+            for _ in range(10):
+                await bucket.acquire()
+            return time.monotonic() - start
+
+        assert asyncio.run(burst()) < 0.1
+
+    def test_invalid_rate(self):
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0)
+
+    def test_backoff_grows_and_is_capped(self):
+        for attempt in range(10):
+            delay = backoff_delay(attempt, base_seconds=0.5, max_seconds=8)
+            assert 0 <= delay <= min(8, 0.5 * 2 ** attempt)
+
+    def test_backoff_honours_retry_after(self):
+        assert backoff_delay(0, retry_after="3") == 3.0
+        assert backoff_delay(0, retry_after="120", max_seconds=30) == 30.0
+        assert backoff_delay(0, base_seconds=0.5, retry_after="soon") <= 0.5
+
+    def test_retryable_statuses(self):
+        assert is_retryable_status(429)
+        assert is_retryable_status(503)
+        assert not is_retryable_status(401)
+        assert not is_retryable_status(404)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
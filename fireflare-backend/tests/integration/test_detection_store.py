@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Tests for split (per-detection) NASA storage helpers.
+"""
+
+import sys
+import os
+import datetime
+import pytest
+import numpy as np
+from unittest.mock import MagicMock
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from firms_generator import generate_firms_csv
+from utils.detectionindex import DetectionIndex
+from utils.detectionstore import (
+    MANIFEST_ID, bbox_polygon, confidence_score, detection_document, detection_query, detection_to_feature,
+    ensure_detection_indexes, find_detection_page, find_detections, parse_acquired_at, parse_since, publish_manifest,
+    validate_bbox, validate_circle, write_detections
+)
+from utils.firms import parse_firms_csv
+
+
+def _great_circle_latitudes(a, b, samples=50):
+    """Latitudes along the great-circle arc between [lon, lat] points a and b."""
+    def unit(point):
+        lon, lat = np.radians(point)
+        return np.array([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+    u, v = unit(a), unit(b)
+    omega = np.arccos(np.clip(u @ v, -1, 1))
+    t = np.linspace(0, 1, samples)[:, None]
+    points = (np.sin((1 - t) * omega) * u + np.sin(t * omega) * v) / np.sin(omega)
+    return np.degrees(np.arcsin(points[:, 2] / np.linalg.norm(points, axis=1)))
+
+
+def _matches(feature, bbox=None, since=None, min_confidence=None, min_frp=None):
+    lon, lat = feature["geometry"]["coordinates"]
+    properties = feature["properties"]
+    acquired_at = parse_acquired_at(properties.get("acq_date"), properties.get("acq_time"))
+    confidence = confidence_score(properties.get("confidence"))
+    return ((bbox is None or (bbox[0] <= lon <= bbox[2] and bbox[1] <= lat <= bbox[3]))
+            and (since is None or (acquired_at is not None and acquired_at >= since))
+            and (min_confidence is None or (confidence is not None and confidence >= min_confidence))
+            and (min_frp is None or float(properties["frp"]) >= min_frp))
+
+
+def _all_pages(query, **filters):
+    features, after = [], None
+    while True:
+        page, after = query(after, **filters)
+        features += page
+        if after is None:
+            return features
+
+
+class TestDetectionStore:
+    """Test cases for the per-detection collection helpers."""
+
+    @pytest.fixture
+    def sample_features(self):
+        return [
+            {"type": "Feature", "geometry": {"type": "Point", "coordinates": [-118.2437 + i * 0.01, 34.0522]},
+             "properties": {"frp": "4.2", "acq_date": "2025-08-01", "acq_time": "130", "satellite": "N"}}
+            for i in range(7)
+        ]
+
+    def test_document_round_trip(self, sample_features):
+        doc = detection_document("snap-1", sample_features[0])
+        assert doc["snapshotId"] == "snap-1"
+        assert doc["location"] == {"type": "Point", "coordinates": [-118.2437, 34.0522]}
+        assert doc["frp"] == 4.2
+        assert doc["acquiredAt"] == datetime.datetime(2025, 8, 1, 1, 30)
+        assert detection_to_feature(doc) == sample_features[0]
+
+    def test_parse_acquired_at_invalid(self):
+        assert parse_acquired_at(None, "130") is None
+        assert parse_acquired_at("not-a-date", "130") is None
+
+    def test_write_detections_batches(self, sample_features):
+        coll = MagicMock()
+        coll.insert_many.side_effect = lambda docs, ordered: MagicMock(inserted_ids=list(range(len(docs))))
+
+        assert write_detections(coll, "snap-1", sample_features, batch_size=3) == 7
+        assert [len(c.args[0]) for c in coll.insert_many.call_args_list] == [3, 3, 1]
+        assert all(c.kwargs["ordered"] is False for c in coll.insert_many.call_args_list)
+
+    def test_pages_are_indexed(self):
+        # find_detection_page filters on snapshotId and walks _id in order
+        coll = MagicMock()
+        ensure_detection_indexes(coll)
+        keys = [call.args[0] for call in coll.create_index.call_args_list]
+        assert [("snapshotId", 1), ("_id", 1)] in keys
+
+    def test_publish_manifest_keeps_recent_snapshots(self):
+        coll = MagicMock()
+        coll.find_one.return_value = {"_id": MANIFEST_ID, "recentSnapshotIds": ["b", "a", "z"]}
+
+        recent = publish_manifest(coll, "c", "2025-08-01T00:00:00", 10, keep_snapshots=3)
+        assert recent == ["c", "b", "a"]
+        update = coll.update_one.call_args.args[1]["$set"]
+        assert update["snapshotId"] == "c"
+        assert update["detectionCount"] == 10
+
+    def test_query_and_exact_bbox_filter(self, sample_features):
+        bbox = [-118.25, 34.0, -118.22, 34.1]
+        polygon = bbox_polygon(bbox)
+        ring = polygon["coordinates"][0]
+        assert ring[0] == ring[-1]
+
+        query = detection_query("snap-1", bbox=bbox, center=[-118.24, 34.05], radius_km=5)
+        assert "$and" in query
+
+        # The 2dsphere polygon may return edge points just outside the bbox
+        coll = MagicMock()
+        coll.find.return_value = [detection_document("snap-1", f) for f in sample_features]
+        features = find_detections(coll, "snap-1", bbox=bbox)
+        lons = [f["geometry"]["coordinates"][0] for f in features]
+        assert lons and all(bbox[0] <= lon <= bbox[2] for lon in lons)
+
+    @pytest.mark.parametrize("south, north", [(24.0, 50.0), (40.0, 60.0), (60.0, 72.0), (-50.0, -10.0), (-5.0, 5.0)])
+    def test_polygon_edges_cover_the_bbox(self, south, north):
+        # Great-circle edges bow poleward; no arc may cut inside the bbox
+        ring = bbox_polygon([-140.0, south, -50.0, north])["coordinates"][0]
+        for a, b in zip(ring[:-1], ring[1:]):
+            if a[1] != b[1]:
+                continue
+            lats = _great_circle_latitudes(a, b)
+            if a[0] < b[0]:
+                assert lats.max() <= south + 1e-9
+            else:
+                assert lats.min() >= north - 1e-9
+
+    def test_wide_bbox_is_split(self):
+        polygon = bbox_polygon([-180, -85, 180, 85])
+        assert polygon["type"] == "MultiPolygon" and len(polygon["coordinates"]) == 2
+        for (ring,) in polygon["coordinates"]:
+            lons = [lon for lon, _ in ring]
+            assert max(lons) - min(lons) <= 180
+        assert bbox_polygon([-140, 24, -50, 72])["type"] == "Polygon"
+
+    @pytest.mark.parametrize("bbox", [[-50, 24, -140, 72], [-140, 72, -50, 24], [-200, 0, 0, 10],
+                                      [0, 0, 10, 95], [float("nan"), 0, 1, 1]])
+    def test_validate_bbox(self, bbox):
+        with pytest.raises(ValueError):
+            validate_bbox(bbox)
+
+    @pytest.mark.parametrize("center,radius_km", [([200, 10], 5), ([0, -91], 5), ([float("nan"), 0], 5),
+                                                  ([0, 0], float("inf")), ([0, 0], 0), ([0, 0], -1), ([0, 0], 501)])
+    def test_validate_circle(self, center, radius_km):
+        with pytest.raises(ValueError):
+            validate_circle(center, radius_km)
+        validate_circle([-120.5, 50.1], 10)
+
+    def test_confidence_score(self):
+        assert [confidence_score(v) for v in ("l", "n", "h", "nominal", "85", 42, "nan", "", None)] == \
+            [0.0, 30.0, 80.0, 30.0, 85.0, 42.0, None, None, None]
+
+    def test_parse_since(self):
+        now = datetime.datetime(2025, 8, 2, 12, 0)
+        assert parse_since("6h", now) == datetime.datetime(2025, 8, 2, 6, 0)
+        assert parse_since("90m", now) == datetime.datetime(2025, 8, 2, 10, 30)
+        assert parse_since("2025-08-01T12:00") == datetime.datetime(2025, 8, 1, 12, 0)
+        assert parse_since("2025-08-01T12:00-07:00") == datetime.datetime(2025, 8, 1, 19, 0)
+        with pytest.raises(ValueError):
+            parse_since("yesterday")
+
+    def test_filtered_pages(self):
+        mongomock = pytest.importorskip("mongomock")
+        coll = mongomock.MongoClient().db.NasaWildfireDetections
+        features = parse_firms_csv([generate_firms_csv(600, seed=4).encode("utf-8")]).to_features()
+        write_detections(coll, "snap-1", features)
+        write_detections(coll, "snap-2", features[:10])
+        # mongomock has no $geoWithin; the bbox path is covered above
+        filters = {"since": datetime.datetime(2025, 8, 1, 12, 0), "min_confidence": 30.0, "min_frp": 3.0}
+
+        def query(after, **filters):
+            return find_detection_page(coll, "snap-1", after_id=after, limit=25, **filters)
+
+        expected = [f for f in features if _matches(f, **filters)]
+        assert 25 < len(expected) < len(features)
+        assert _all_pages(query, **filters) == expected
+        assert _all_pages(query) == features
+
+
+@pytest.fixture(scope="module")
+def detections():
+    return parse_firms_csv([generate_firms_csv(2000, seed=8).encode("utf-8")])
+
+
+class TestDetectionIndex:
+    """The in-memory index must return what the filters select, page by page."""
+
+    @pytest.mark.parametrize("filters", [
+        {},
+        {"bbox": [-125, 32, -100, 50]},
+        {"since": datetime.datetime(2025, 8, 1, 20, 0), "min_confidence": 80.0},
+        {"bbox": [-125, 32, -100, 50], "min_frp": 5.0, "min_confidence": 30.0},
+    ])
+    def test_matches_brute_force(self, detections, filters):
+        features = detections.to_features()
+        expected = [f for f in features if _matches(f, **filters)]
+        for index in (DetectionIndex.from_detections(detections), DetectionIndex.from_features(features)):
+            pages = _all_pages(lambda after, **f: index.query(after=-1 if after is None else after, limit=97, **f),
+                               **filters)
+            assert pages == expected
+
+    def test_last_page_has_no_cursor(self, detections):
+        features, cursor = DetectionIndex.from_detections(detections).query(limit=len(detections))
+        assert len(features) == len(detections) and cursor is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
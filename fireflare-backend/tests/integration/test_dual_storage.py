@@ -156,30 +156,24 @@ class TestDualStorage:
         assert "avg_brightness" in cluster["properties"]
         assert cluster["properties"]["cluster_size"] == 3
     
-    @patch('utils.externalapi.fetch_nasa_geojson')
-    def test_fetch_nasa_geojson_return_both_parameter(self, mock_fetch):
+    def test_fetch_nasa_geojson_return_both_parameter(self):
         """Test that fetch_nasa_geojson respects return_both parameter."""
         from utils.externalapi import fetch_nasa_geojson
         
-        # Mock the actual API call components
-        with patch('utils.externalapi.requests.get') as mock_requests, \
-             patch('utils.externalapi.csv.DictReader') as mock_csv:
-            
-            # Mock HTTP response
+        # Mock the streamed FIRMS CSV response
+        with patch('utils.externalapi.requests.get') as mock_requests:
             mock_response = MagicMock()
             mock_response.ok = True
-            mock_response.text = "latitude,longitude,brightness\n34.0522,-118.2437,320.0"
+            mock_response.iter_content.side_effect = lambda chunk_size: iter([
+                b"latitude,longitude,brightness\n34.0522,-118.2437,320.0\n"
+            ])
             mock_requests.return_value = mock_response
             
-            # Mock CSV reader
-            mock_csv.return_value = [
-                {"latitude": "34.0522", "longitude": "-118.2437", "brightness": "320.0"}
-            ]
-            
             # Test return_both=False (should return only clustered GeoJSON)
             result_single = fetch_nasa_geojson("test_key", "VIIRS", [-120, 34, -118, 35], 1, return_both=False)
             assert "type" in result_single
             assert result_single["type"] == "FeatureCollection"
+            assert len(result_single["features"]) == 1
             
             # Test return_both=True (should return both versions)
             result_both = fetch_nasa_geojson("test_key", "VIIRS", [-120, 34, -118, 35], 1, return_both=True)
@@ -188,6 +182,8 @@ class TestDualStorage:
             assert "clustering_enabled" in result_both
             assert "original_count" in result_both
             assert "clustered_count" in result_both
+            assert result_both["original"]["features"][0]["properties"]["brightness"] == "320.0"
+            assert mock_requests.call_args.kwargs["stream"] is True
     
     def test_legacy_data_handling(self):
         """Test handling of legacy data without clustering metadata."""
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Tests for proximity alerts on new fire clusters (utils.alerts).
+"""
+
+import sys
+import os
+import time
+import pytest
+import numpy as np
+import mongomock
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from utils.alerts import (AddressPoints, alerts_by_cluster, ensure_alert_indexes, load_addresses,
+                          proximity_matches, record_new_alerts)
+from utils.calculate import haversine_many_to_many
+
+
+def _cluster(cluster_id, lon, lat):
+    return {"id": cluster_id, "type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]}}
+
+
+def _match(user_id, cluster_id, distance, coordinates=(-120.0, 50.0)):
+    return {"userID": user_id, "clusterId": cluster_id, "distanceKm": distance, "label": "Home",
+            "coordinates": list(coordinates)}
+
+
+def _alerts_collection():
+    alerts = mongomock.MongoClient().db.FireAlerts
+    ensure_alert_indexes(alerts)
+    return alerts
+
+
+class RacingCollection:
+    """FireAlerts as seen by an ingest that looked before another one recorded its alerts."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        return []
+
+    def insert_many(self, documents, ordered=True):
+        return self.collection.insert_many(documents, ordered=ordered)
+
+
+class TestAddressPoints:
+    """Loading saved addresses."""
+
+    def test_invalid_coordinates_are_skipped(self):
+        points = AddressPoints.from_documents([
+            {"userID": "a", "coordinates": [-120.5, 50.1], "label": "Cabin"},
+            {"userID": "a", "coordinates": [-120.5, 50.1], "label": "Cabin again"},
+            {"userID": "b", "coordinates": [0, 0]},
+            {"userID": "c", "coordinates": ["x", 1]},
+            {"userID": "d", "coordinates": [200, 10]},
+            {"userID": "e"},
+            {"coordinates": [-100, 40]},
+            {"userID": "f", "coordinates": [-100, 40]},
+        ])
+        assert points.user_ids == ["a", "f"]
+        assert points.labels == ["Cabin", "Home"]
+        assert points.lons.tolist() == [-120.5, -100] and points.lats.tolist() == [50.1, 40]
+
+    def test_load_addresses_reads_both_collections(self):
+        db = mongomock.MongoClient().db
+        db.Addresses.insert_one({"userID": "a", "coordinates": [-120.5, 50.1], "label": "Cabin"})
+        db.Users.insert_many([
+            {"userID": "b", "addresses": [{"coordinates": [-110, 45], "label": "Home"},
+                                          {"coordinates": [-111, 46], "label": "Work"}]},
+            {"userID": "c"},
+        ])
+
+        points = load_addresses(db.Addresses, db.Users)
+        assert points.user_ids == ["a", "b", "b"]
+        assert points.labels == ["Cabin", "Home", "Work"]
+
+
+class TestProximityMatches:
+    """Clusters against addresses with the grid join."""
+
+    def test_closest_address_per_user_and_cluster(self):
+        clusters = [_cluster("near", -120.0, 50.0), _cluster("far", -100.0, 40.0), _cluster(None, -120.0, 50.0)]
+        addresses = AddressPoints(["a", "a", "b"], [-120.05, -120.01, -100.5], [50.0, 50.0, 40.0],
+                                  ["Cabin", "Home", "Ranch"])
+
+        matches = proximity_matches(clusters, addresses, radius_km=10)
+        assert len(matches) == 1
+        assert matches[0]["userID"] == "a" and matches[0]["clusterId"] == "near"
+        assert matches[0]["label"] == "Home" and matches[0]["distanceKm"] < 1
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(3)
+        cluster_lons, cluster_lats = rng.uniform(-125, -115, 300), rng.uniform(45, 52, 300)
+        address_lons, address_lats = rng.uniform(-125, -115, 2000), rng.uniform(45, 52, 2000)
+        user_ids = [f"user-{k % 1500}" for k in range(2000)]
+        clusters = [_cluster(f"c{k}", lon, lat) for k, (lon, lat) in enumerate(zip(cluster_lons, cluster_lats))]
+
+        matches = proximity_matches(clusters, AddressPoints(user_ids, address_lons, address_lats, ["Home"] * 2000), 15)
+
+        distances = haversine_many_to_many(cluster_lats, cluster_lons, address_lats, address_lons)
+        expected = {}
+        for c, a in zip(*np.nonzero(distances <= 15)):
+            key = (user_ids[a], f"c{c}")
+            expected[key] = min(expected.get(key, float("inf")), distances[c, a])
+        found = {(m["userID"], m["clusterId"]): m["distanceKm"] for m in matches}
+        assert expected and found.keys() == expected.keys()
+        assert all(found[key] == pytest.approx(d, abs=0.01) for key, d in expected.items())
+
+    def test_no_addresses(self):
+        assert proximity_matches([_cluster("c", -120, 50)], AddressPoints([], [], [], [])) == []
+
+    def test_continent_scale_is_fast(self):
+        rng = np.random.default_rng(11)
+        addresses = AddressPoints([f"user-{k}" for k in range(100000)], rng.uniform(-165, -55, 100000),
+                                  rng.uniform(15, 70, 100000), ["Home"] * 100000)
+        clusters = [_cluster(f"c{k}", lon, lat)
+                    for k, (lon, lat) in enumerate(zip(rng.uniform(-165, -55, 10000), rng.uniform(15, 70, 10000)))]
+
+        started = time.perf_counter()
+        matches = proximity_matches(clusters, addresses, radius_km=10)
+        elapsed = time.perf_counter() - started
+
+        assert matches and all(m["distanceKm"] <= 10 for m in matches)
+        assert elapsed < 5, f"100k addresses x 10k clusters took {elapsed:.2f}s"
+
+
+class TestRecordNewAlerts:
+    """Each user hears about a fire once."""
+
+    def test_only_the_closest_fire_is_sent_and_recorded(self):
+        alerts = _alerts_collection()
+        recorded = record_new_alerts(alerts, [_match("a", "c1", 5.0, (-120.0, 50.0)),
+                                              _match("a", "c2", 1.0, (-121.0, 50.0)),
+                                              _match("b", "c1", 2.0, (-120.0, 50.0))], snapshot_id="s1")
+
+        assert sorted((m["userID"], m["clusterId"]) for m in recorded) == [("a", "c2"), ("b", "c1")]
+        assert sorted((d["userID"], d["clusterId"]) for d in alerts.find()) == [("a", "c2"), ("b", "c1")]
+        assert alerts.find_one({"userID": "a"})["coordinates"] == [-121.0, 50.0]
+        assert alerts.find_one({"userID": "a"})["snapshotId"] == "s1"
+
+    def test_fire_near_an_earlier_alert_is_not_sent_again(self):
+        alerts = _alerts_collection()
+        record_new_alerts(alerts, [_match("a", "c1", 2.0, (-120.0, 50.0))])
+
+        # Same fire under a new cluster id (its seed detection aged out), centroid moved ~3 km
+        again = record_new_alerts(alerts, [_match("a", "c9", 2.5, (-120.0, 50.03))])
+        assert again == []
+
+        # A fire elsewhere, and another user near the first fire, are still alerted
+        recorded = record_new_alerts(alerts, [_match("a", "c3", 4.0, (-118.0, 50.0)),
+                                              _match("b", "c9", 3.0, (-120.0, 50.03))])
+        assert sorted((m["userID"], m["clusterId"]) for m in recorded) == [("a", "c3"), ("b", "c9")]
+        assert alerts.count_documents({}) == 3
+
+    def test_closest_unsent_fire_is_picked(self):
+        alerts = _alerts_collection()
+        record_new_alerts(alerts, [_match("a", "c1", 1.0, (-120.0, 50.0))])
+
+        recorded = record_new_alerts(alerts, [_match("a", "c2", 1.0, (-120.0, 50.01)),
+                                              _match("a", "c3", 6.0, (-118.0, 50.0))])
+        assert [m["clusterId"] for m in recorded] == ["c3"]
+
+    def test_racing_insert_is_not_reported(self):
+        alerts = _alerts_collection()
+        record_new_alerts(alerts, [_match("a", "c1", 2.0)])
+
+        recorded = record_new_alerts(RacingCollection(alerts), [_match("a", "c1", 2.0), _match("b", "c1", 3.0)])
+        assert [(m["userID"], m["clusterId"]) for m in recorded] == [("b", "c1")]
+        assert alerts.count_documents({}) == 2
+
+
+class TestAlertsByCluster:
+    """Alerts grouped for broadcast."""
+
+    def test_grouped_by_cluster(self):
+        groups = alerts_by_cluster([_match("a", "c2", 1.0), _match("b", "c1", 2.0), _match("c", "c2", 3.0)])
+        assert {cluster: [m["userID"] for m in alerts] for cluster, alerts in groups.items()} == \
+            {"c2": ["a", "c"], "c1": ["b"]}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
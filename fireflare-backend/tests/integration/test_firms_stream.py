@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming, columnar FIRMS CSV parser.
+"""
+
+import sys
+import os
+import csv
+import io
+import pytest
+import numpy as np
+from unittest.mock import MagicMock, patch
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from firms_generator import generate_firms_csv
+from utils.firms import parse_firms_csv
+from utils.geo import cluster_detections, cluster_geojson_points
+from utils.pyramid import build_cluster_pyramid, get_clusters
+from utils.externalapi import fetch_nasa_detections, fetch_nasa_geojson
+
+
+def _chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _reference_features(text):
+    """What the DictReader-based parser produced."""
+    features = []
+    for row in csv.DictReader(io.StringIO(text.lstrip("﻿"))):
+        try:
+            lat = float(row["latitude"])
+            lon = float(row["longitude"])
+        except (ValueError, KeyError):
+            continue
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {k: v for k, v in row.items() if k not in ["latitude", "longitude"]}
+        })
+    return features
+
+
+class TestFirmsStream:
+    """Test cases for parsing FIRMS CSV chunks into columns."""
+
+    @pytest.fixture
+    def csv_text(self):
+        return generate_firms_csv(2000, seed=11)
+
+    @pytest.mark.parametrize("chunk_size", [7, 1000, 1 << 20])
+    def test_matches_row_parser_for_any_chunking(self, csv_text, chunk_size):
+        detections = parse_firms_csv(_chunks(csv_text.encode("utf-8"), chunk_size))
+        assert len(detections) == 2000
+        assert detections.to_features() == _reference_features(csv_text)
+
+    def test_bom_crlf_and_bad_rows(self):
+        text = "﻿latitude,longitude,frp,acq_date,acq_time\r\n" \
+               "34.05,-118.24,12.5,2025-08-01,0130\r\n" \
+               "bad,-118.0,1.0,2025-08-01,0200\r\n" \
+               "35.0,-119.0\r\n" \
+               "\r\n" \
+               "36.0,-120.0,,2025-08-02,2210"
+        detections = parse_firms_csv([text.encode("utf-8")])
+        assert len(detections) == 2
+        assert detections[0]["properties"] == {"frp": "12.5", "acq_date": "2025-08-01", "acq_time": "0130"}
+        assert detections.lat.tolist() == [34.05, 36.0]
+        assert detections.frp[0] == 12.5 and np.isnan(detections.frp[1])
+        assert detections.acq_date.tolist()[1].isoformat() == "2025-08-02"
+        assert detections.acq_time.tolist() == [130, 2210]
+
+    def test_typed_columns(self, csv_text):
+        detections = parse_firms_csv([csv_text.encode("utf-8")])
+        rows = list(csv.DictReader(io.StringIO(csv_text)))
+        assert detections.frp.dtype == np.float64
+        assert detections.brightness[5] == float(rows[5]["bright_ti4"])
+        assert detections.confidence[5].decode() == rows[5]["confidence"]
+
+    def test_empty_body(self):
+        assert len(parse_firms_csv([])) == 0
+        assert parse_firms_csv([b"latitude,longitude,frp\n"]).to_features() == []
+
+    def test_clustering_matches_feature_clustering(self, csv_text):
+        detections = parse_firms_csv([csv_text.encode("utf-8")])
+        features = _reference_features(csv_text)
+        assert cluster_detections(detections, 0.5) == cluster_geojson_points(features, 0.5)
+
+    def test_pyramid_matches_feature_pyramid(self, csv_text):
+        detections = parse_firms_csv([csv_text.encode("utf-8")])
+        from_columns = build_cluster_pyramid(detections)
+        from_features = build_cluster_pyramid(_reference_features(csv_text))
+        for zoom in (0, 4, 9, 17):
+            bbox = [-180, -85, 180, 85]
+            assert get_clusters(from_columns, bbox, zoom) == get_clusters(from_features, bbox, zoom)
+
+    def test_fetch_streams_the_response(self, csv_text):
+        response = MagicMock()
+        response.ok = True
+        response.iter_content.return_value = _chunks(csv_text.encode("utf-8"), 4096)
+        with patch("utils.externalapi.requests.get", return_value=response) as mock_get:
+            detections = fetch_nasa_detections("key", "VIIRS_SNPP_NRT", [-140, 24, -50, 72], 2)
+            assert mock_get.call_args.kwargs["stream"] is True
+        assert len(detections) == 2000
+        response.close.assert_called_once()
+
+        response.iter_content.return_value = _chunks(csv_text.encode("utf-8"), 4096)
+        with patch("utils.externalapi.requests.get", return_value=response):
+            result = fetch_nasa_geojson("key", "VIIRS_SNPP_NRT", [-140, 24, -50, 72], 2,
+                                        cluster_distance_km=0.5, return_both=True)
+        assert result["original"]["features"] == _reference_features(csv_text)
+        assert result["clustered_count"] == len(result["clustered"]["features"])
+        assert "detections" not in result
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tests for parallel multi-sensor FIRMS ingest and cross-sensor dedup.
+"""
+
+import sys
+import os
+import time
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from firms_generator import generate_firms_csv
+from utils.firms import merge_detections, parse_firms_csv
+from utils.externalapi import fetch_nasa_sources
+
+VIIRS_HEADER = "latitude,longitude,bright_ti4,acq_date,acq_time,satellite,confidence,bright_ti5,frp"
+MODIS_HEADER = "latitude,longitude,brightness,acq_date,acq_time,satellite,confidence,bright_t31,frp"
+
+
+def _parse(header, *rows):
+    return parse_firms_csv([("\n".join([header] + list(rows)) + "\n").encode("utf-8")])
+
+
+class TestCrossSensorDedup:
+    """Test cases for merging detections from several FIRMS sources."""
+
+    def test_same_pixel_from_two_satellites_is_merged(self):
+        snpp = _parse(VIIRS_HEADER, "40.0000,-120.0000,330.1,2025-08-01,2030,N,n,290.0,12.5")
+        noaa20 = _parse(VIIRS_HEADER, "40.0010,-120.0010,331.0,2025-08-01,2118,1,h,291.0,14.0")
+        merged = merge_detections({"VIIRS_SNPP_NRT": snpp, "VIIRS_NOAA20_NRT": noaa20})
+
+        assert len(merged) == 1
+        feature = merged[0]
+        # The higher-priority source's detection is kept
+        assert feature["properties"]["satellite"] == "N"
+        assert feature["properties"]["satellites"] == ["Suomi NPP", "NOAA-20"]
+
+    def test_far_apart_in_space_or_time_are_kept(self):
+        snpp = _parse(VIIRS_HEADER,
+                      "40.0000,-120.0000,330.1,2025-08-01,2030,N,n,290.0,12.5",
+                      "41.0000,-121.0000,330.1,2025-08-01,2030,N,n,290.0,12.5")
+        noaa20 = _parse(VIIRS_HEADER,
+                        "40.0200,-120.0000,331.0,2025-08-01,2100,1,h,291.0,14.0",   # ~2.2 km away
+                        "41.0000,-121.0000,331.0,2025-08-01,2330,1,h,291.0,14.0")   # 3 hours later
+        merged = merge_detections({"VIIRS_SNPP_NRT": snpp, "VIIRS_NOAA20_NRT": noaa20})
+        assert len(merged) == 4
+
+    def test_neighbouring_pixels_from_one_sensor_are_kept(self):
+        rows = generate_firms_csv(3000, seed=4)
+        snpp = parse_firms_csv([rows.encode("utf-8")])
+        merged = merge_detections({"VIIRS_SNPP_NRT": snpp})
+        assert len(merged) == len(snpp)
+        assert merged.to_features()[0]["properties"]["satellites"] == ["Suomi NPP"]
+
+    def test_one_duplicate_per_other_source(self):
+        snpp = _parse(VIIRS_HEADER, "40.0000,-120.0000,330.1,2025-08-01,2030,N,n,290.0,12.5")
+        noaa20 = _parse(VIIRS_HEADER,
+                        "40.0030,-120.0000,331.0,2025-08-01,2100,1,h,291.0,14.0",
+                        "40.0010,-120.0000,331.0,2025-08-01,2100,1,h,291.0,15.0")
+        merged = merge_detections({"VIIRS_SNPP_NRT": snpp, "VIIRS_NOAA20_NRT": noaa20})
+        assert len(merged) == 2
+        # The closest NOAA-20 pixel is the one absorbed
+        assert merged[1]["properties"]["frp"] == "14.0"
+
+    def test_modis_columns_and_satellites(self):
+        snpp = _parse(VIIRS_HEADER, "40.0000,-120.0000,330.1,2025-08-01,2030,N,n,290.0,12.5")
+        modis = _parse(MODIS_HEADER,
+                       "40.0020,-120.0010,320.5,2025-08-01,2045,A,80,295.0,30.1",
+                       "45.0000,-110.0000,318.0,2025-08-01,1800,T,65,294.0,10.0")
+        merged = merge_detections({"VIIRS_SNPP_NRT": snpp, "MODIS_NRT": modis})
+
+        assert len(merged) == 2
+        viirs_feature, terra_feature = merged.to_features()
+        assert viirs_feature["properties"]["satellites"] == ["Suomi NPP", "Aqua"]
+        assert "brightness" not in viirs_feature["properties"]
+        assert "bright_ti4" not in terra_feature["properties"]
+        assert terra_feature["properties"]["brightness"] == "318.0"
+        assert terra_feature["properties"]["satellites"] == ["Terra"]
+        assert merged.brightness.tolist() == [330.1, 318.0]
+        assert merged[1] == terra_feature
+
+
+class TestParallelFetch:
+    """Test cases for fetching FIRMS sources concurrently."""
+
+    def _session(self, delay, failing=()):
+        session = MagicMock()
+        in_flight = {"now": 0, "max": 0}
+        lock = threading.Lock()
+
+        def get(url, timeout=None, stream=False):
+            with lock:
+                in_flight["now"] += 1
+                in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            time.sleep(delay)
+            with lock:
+                in_flight["now"] -= 1
+            response = MagicMock()
+            response.ok = not any(source in url for source in failing)
+            response.status_code = 200 if response.ok else 500
+            body = generate_firms_csv(200, seed=len(url)).encode("utf-8")
+            response.iter_content.return_value = [body]
+            return response
+
+        session.get.side_effect = get
+        return session, in_flight
+
+    def test_sources_are_fetched_concurrently(self):
+        sources = ["VIIRS_SNPP_NRT", "VIIRS_NOAA20_NRT", "VIIRS_NOAA21_NRT", "MODIS_NRT"]
+        session, in_flight = self._session(delay=0.3)
+        with patch("utils.externalapi.requests.Session", return_value=session):
+            start = time.monotonic()
+            results = fetch_nasa_sources("key", sources, [-140, 24, -50, 72], 2)
+            elapsed = time.monotonic() - start
+
+        assert list(results) == sources
+        assert all(len(d) == 200 for d in results.values())
+        assert in_flight["max"] == len(sources)
+        assert elapsed < 0.3 * len(sources) * 0.75
+        session.close.assert_called_once()
+
+    def test_failed_source_is_skipped(self):
+        session, _ = self._session(delay=0, failing=("MODIS_NRT",))
+        with patch("utils.externalapi.requests.Session", return_value=session):
+            results = fetch_nasa_sources("key", ["VIIRS_SNPP_NRT", "MODIS_NRT"], [-140, 24, -50, 72], 2)
+        assert list(results) == ["VIIRS_SNPP_NRT"]
+
+    def test_all_sources_failing_raises(self):
+        session, _ = self._session(delay=0, failing=("VIIRS_SNPP_NRT",))
+        with patch("utils.externalapi.requests.Session", return_value=session):
+            with pytest.raises(RuntimeError):
+                fetch_nasa_sources("key", ["VIIRS_SNPP_NRT"], [-140, 24, -50, 72], 2)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
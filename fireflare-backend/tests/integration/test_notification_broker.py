@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Tests for cross-worker notification fan-out (utils.notificationbroker).
+"""
+
+import sys
+import os
+import datetime
+import threading
+import time
+import pytest
+import mongomock
+from bson import ObjectId
+from pymongo.errors import AutoReconnect
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from utils.notificationbroker import (
+    InMemoryBroker,
+    MongoChangeStreamBroker,
+    SocketBroker,
+    ensure_event_indexes,
+    find_missed_events,
+    make_relay_server
+)
+from utils.notifications import NotificationHub
+
+
+class ChangeStreamCollection:
+    """
+    mongomock collection with the insert change stream MongoChangeStreamBroker
+    watches (mongomock has no change streams; a real deployment needs a replica set).
+    """
+
+    def __init__(self):
+        self.collection = mongomock.MongoClient().db.NotificationEvents
+        self.changes = []
+        self.cond = threading.Condition()
+        self.drop_streams = 0
+        self.fail_next = False
+
+    def insert_many(self, documents, ordered=True):
+        result = self.collection.insert_many(documents, ordered=ordered)
+        with self.cond:
+            for document in documents:
+                self.changes.append({"_id": {"_data": len(self.changes)}, "operationType": "insert",
+                                     "fullDocument": document})
+            self.cond.notify_all()
+        return result
+
+    def watch(self, pipeline, resume_after=None, max_await_time_ms=None):
+        if self.drop_streams:
+            self.drop_streams -= 1
+            raise AutoReconnect("connection reset")
+        with self.cond:
+            start = len(self.changes) if resume_after is None else resume_after["_data"] + 1
+        return _ChangeStream(self, start, max_await_time_ms / 1000)
+
+
+class _ChangeStream:
+
+    def __init__(self, source, position, max_await):
+        self.source = source
+        self.position = position
+        self.max_await = max_await
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def try_next(self):
+        with self.source.cond:
+            if self.position >= len(self.source.changes):
+                self.source.cond.wait(self.max_await)
+            if self.position >= len(self.source.changes):
+                return None
+            if self.source.fail_next:
+                self.source.fail_next = False
+                raise AutoReconnect("connection reset")
+            self.position += 1
+            return self.source.changes[self.position - 1]
+
+
+def _recorder():
+    """Handler recording (user_ids, message) in `received` and the event ids in handler.ids."""
+    received = []
+    ids = []
+
+    def handler(user_ids, message, event_id):
+        received.append((list(user_ids), message))
+        ids.append(event_id)
+    handler.ids = ids
+    return received, handler
+
+
+def _wait_for(predicate, timeout=3):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestInMemoryBroker:
+    """A single worker delivers straight to its own hub."""
+
+    def test_publish_reaches_hub(self):
+        broker = InMemoryBroker()
+        hub = NotificationHub(keepalive_seconds=60)
+        broker.subscribe(hub.publish)
+        connection = hub.register("alice")
+
+        broker.publish(["alice", "alice", "bob"], {"title": "Fire nearby"})
+
+        (event_id, frame), = connection.frames
+        assert frame == f'id: {event_id}\ndata: {{"title": "Fire nearby"}}\n\n'
+
+    def test_events_are_stored_for_replay(self):
+        collection = mongomock.MongoClient().db.NotificationEvents
+        ensure_event_indexes(collection)
+        broker = InMemoryBroker(collection, chunk_size=2)
+        received, handler = _recorder()
+        broker.subscribe(handler)
+
+        broker.publish(["alice", "bob", "carol"], {"n": 1})
+        broker.publish(["bob"], {"n": 2})
+        broker.publish(["alice"], {"n": 3})
+
+        assert collection.count_documents({}) == 4
+        first_for_alice = handler.ids[0]
+        assert find_missed_events(collection, "alice", first_for_alice) == [(handler.ids[3], {"n": 3})]
+        assert [m for _, m in find_missed_events(collection, "bob", first_for_alice)] == [{"n": 2}]
+        assert find_missed_events(collection, "alice", "not-an-id") == []
+
+    def test_replay_follows_publish_time_across_processes(self):
+        # Another process's ObjectIds can sort before ours even when it published later
+        collection = mongomock.MongoClient().db.NotificationEvents
+        ensure_event_indexes(collection)
+        # Whole seconds, as ObjectId times are; recent enough for the TTL index
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None, microsecond=0)
+        ours, theirs = ObjectId(), ObjectId.from_datetime(now - datetime.timedelta(hours=1))
+        collection.insert_many([
+            {"_id": ours, "userIDs": ["alice"], "event": {"n": 1}, "createdAt": now},
+            {"_id": theirs, "userIDs": ["alice"], "event": {"n": 2}, "createdAt": now + datetime.timedelta(seconds=1)},
+        ])
+
+        assert find_missed_events(collection, "alice", str(ours)) == [(str(theirs), {"n": 2})]
+        assert find_missed_events(collection, "alice", str(theirs)) == []
+        # An id no longer stored replays from the time in the id
+        assert [m for _, m in find_missed_events(collection, "alice", str(ObjectId.from_datetime(now)))] == \
+            [{"n": 1}, {"n": 2}]
+
+    def test_failing_handler_does_not_stop_others(self):
+        broker = InMemoryBroker()
+        received, handler = _recorder()
+        broker.subscribe(lambda user_ids, message, event_id: 1 / 0)
+        broker.subscribe(handler)
+
+        broker.publish(["alice"], {"n": 1})
+
+        assert received == [(["alice"], {"n": 1})]
+
+
+class TestMongoChangeStreamBroker:
+    """Workers sharing a collection see each other's events exactly once."""
+
+    def _workers(self, collection, count=2, **kwargs):
+        workers = []
+        for _ in range(count):
+            broker = MongoChangeStreamBroker(collection, retry_seconds=0.05, **kwargs)
+            received, handler = _recorder()
+            broker.subscribe(handler)
+            broker.start()
+            workers.append((broker, received))
+        time.sleep(0.1)
+        return workers
+
+    def test_fan_out_across_workers(self):
+        collection = ChangeStreamCollection()
+        (a, a_received), (b, b_received) = self._workers(collection)
+        try:
+            a.publish(["alice", "bob"], {"title": "Fire nearby"})
+            b.publish(["carol"], {"title": "Report approved"})
+
+            assert _wait_for(lambda: len(a_received) == 2 and len(b_received) == 2)
+            time.sleep(0.1)
+            assert a_received == [(["alice", "bob"], {"title": "Fire nearby"}),
+                                  (["carol"], {"title": "Report approved"})]
+            assert sorted(map(str, b_received)) == sorted(map(str, a_received))
+            # Every worker sees the same event ids, so a reconnect to any of them can resume
+            assert sorted(a._handlers[0].ids) == sorted(b._handlers[0].ids)
+        finally:
+            a.close()
+            b.close()
+
+    def test_large_broadcasts_are_chunked(self):
+        collection = ChangeStreamCollection()
+        (a, _), (b, b_received) = self._workers(collection, chunk_size=1000)
+        try:
+            user_ids = [f"user-{k}" for k in range(2500)]
+            a.publish(user_ids, {"title": "Fire nearby"})
+
+            assert collection.collection.count_documents({}) == 3
+            assert _wait_for(lambda: len(b_received) == 3)
+            assert [u for ids, _ in b_received for u in ids] == user_ids
+        finally:
+            a.close()
+            b.close()
+
+    def test_resumes_after_dropped_stream(self):
+        collection = ChangeStreamCollection()
+        (a, _), (b, b_received) = self._workers(collection)
+        try:
+            a.publish(["alice"], {"n": 1})
+            assert _wait_for(lambda: len(b_received) == 1)
+
+            # b's stream dies on the next change and its first reconnect fails too;
+            # it must resume from its token without losing events
+            collection.fail_next = True
+            collection.drop_streams = 1
+            a.publish(["alice"], {"n": 2})
+            a.publish(["alice"], {"n": 3})
+
+            assert _wait_for(lambda: len(b_received) == 3)
+            assert [message["n"] for _, message in b_received] == [1, 2, 3]
+        finally:
+            a.close()
+            b.close()
+
+
+class TestSocketBroker:
+    """Workers connected to the relay receive each other's events."""
+
+    def test_relay_fan_out(self):
+        server = make_relay_server("127.0.0.1:0")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        address = "127.0.0.1:%d" % server.server_address[1]
+        workers = []
+        try:
+            for _ in range(3):
+                broker = SocketBroker(address, retry_seconds=0.05)
+                received, handler = _recorder()
+                broker.subscribe(handler)
+                broker.start()
+                assert broker.connected.wait(2)
+                workers.append((broker, received))
+            assert _wait_for(lambda: len(server.clients) == 3)
+
+            workers[0][0].publish(["alice"], {"title": "Fire nearby"})
+
+            for _, received in workers:
+                assert _wait_for(lambda: len(received) == 1)
+            time.sleep(0.1)
+            assert all(received == [(["alice"], {"title": "Fire nearby"})] for _, received in workers)
+            assert len({broker._handlers[0].ids[0] for broker, _ in workers}) == 1
+        finally:
+            for broker, _ in workers:
+                broker.close()
+            server.shutdown()
+            server.server_close()
+
+    def test_relay_unavailable(self):
+        broker = SocketBroker("127.0.0.1:1", retry_seconds=2, max_pending=2)
+        received, handler = _recorder()
+        broker.subscribe(handler)
+        try:
+            started = time.monotonic()
+            for n in range(5):
+                broker.publish(["alice"], {"n": n})
+            # Publishing never waits for the relay; the backlog past max_pending is dropped
+            assert time.monotonic() - started < 0.5
+            assert broker._outbox.qsize() <= 2
+        finally:
+            broker.close()
+
+        # Still delivered to this worker's own streams
+        assert received == [(["alice"], {"n": n}) for n in range(5)]
+
+    def test_publish_before_connecting_is_forwarded(self):
+        server = make_relay_server("127.0.0.1:0")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        address = "127.0.0.1:%d" % server.server_address[1]
+        listener = SocketBroker(address, retry_seconds=0.05)
+        publisher = SocketBroker(address, retry_seconds=0.05)
+        received, handler = _recorder()
+        listener.subscribe(handler)
+        try:
+            listener.start()
+            assert listener.connected.wait(2)
+            assert _wait_for(lambda: len(server.clients) == 1)
+
+            # A publish-only process (the scheduler) sends once its first connection is up
+            publisher.publish(["alice"], {"n": 1})
+            assert _wait_for(lambda: received == [(["alice"], {"n": 1})])
+        finally:
+            listener.close()
+            publisher.close()
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-user SSE notification hub.
+"""
+
+import sys
+import os
+import json
+import threading
+import time
+import pytest
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from utils.notifications import KEEPALIVE_FRAME, NotificationHub
+
+
+def _reader(hub, connection, frames, count):
+    """Collect `count` frames after the opening one from a stream in a thread, then close it like a disconnecting client."""
+    def run():
+        stream = hub.stream(connection)
+        assert next(stream) == KEEPALIVE_FRAME
+        for frame in stream:
+            frames.append((time.monotonic(), frame))
+            if len(frames) == count:
+                stream.close()
+                return
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+class TestNotificationHub:
+    """Delivery goes only to the recipients' streams, immediately, and keep-alives come from the wheel."""
+
+    def test_publish_reaches_only_recipients(self):
+        hub = NotificationHub(keepalive_seconds=60)
+        alice = [hub.register("alice"), hub.register("alice")]
+        bob = hub.register("bob")
+
+        delivered = hub.publish(["alice", "alice", "carol"], {"title": "Fire nearby"})
+
+        assert delivered == 2
+        assert [list(c.frames) for c in alice] == [[(None, 'data: {"title": "Fire nearby"}\n\n')]] * 2
+        assert all(c.wakeup.is_set() for c in alice)
+        assert not bob.frames and not bob.wakeup.is_set()
+        assert sorted(hub.connected_user_ids()) == ["alice", "bob"]
+
+    def test_stream_wakes_immediately_and_unregisters(self):
+        hub = NotificationHub(keepalive_seconds=60)
+        connection = hub.register("alice")
+        frames = []
+        thread = _reader(hub, connection, frames, 2)
+
+        time.sleep(0.05)
+        sent_at = time.monotonic()
+        hub.publish(["alice"], {"n": 1})
+        hub.publish(["alice"], {"n": 2})
+        thread.join(timeout=2)
+
+        assert [json.loads(frame[len("data: "):]) for _, frame in frames] == [{"n": 1}, {"n": 2}]
+        assert frames[0][0] - sent_at < 0.5
+        assert hub.connected_user_ids() == []
+        assert hub.connection_count() == 0
+
+    def test_keepalive_only_for_idle_connections(self):
+        hub = NotificationHub(keepalive_seconds=10, slots=2)
+        idle = hub.register("alice")
+        busy = hub.register("bob")
+        assert idle.slot != busy.slot
+        now = time.monotonic()
+        busy.last_sent = now + 5
+
+        assert hub.tick(idle.slot, now=now + 10) == 1
+        assert hub.tick(busy.slot, now=now + 10) == 0
+        assert idle.keepalive_due and idle.wakeup.is_set()
+
+        frames = []
+        _reader(hub, idle, frames, 1).join(timeout=2)
+        assert [frame for _, frame in frames] == [KEEPALIVE_FRAME]
+        assert idle.last_sent >= now
+
+    def test_wheel_sends_keepalives(self):
+        hub = NotificationHub(keepalive_seconds=0.2, slots=4)
+        connection = hub.register("alice")
+        frames = []
+        _reader(hub, connection, frames, 2).join(timeout=3)
+
+        assert [frame for _, frame in frames] == [KEEPALIVE_FRAME] * 2
+        assert frames[1][0] - frames[0][0] >= 0.15
+
+    def test_reconnect_replays_from_memory(self):
+        hub = NotificationHub(keepalive_seconds=60, replay_size=3)
+        first = hub.register("alice")
+        for n in range(5):
+            hub.publish(["alice"], {"n": n}, event_id=f"e{n}")
+        hub.unregister(first)
+
+        # Events published while alice was away are remembered too
+        hub.publish(["alice"], {"n": 5}, event_id="e5")
+        connection = hub.register("alice", last_event_id="e3")
+        frames = []
+        _reader(hub, connection, frames, 2).join(timeout=2)
+
+        assert [frame for _, frame in frames] == ['id: e4\ndata: {"n": 4}\n\n', 'id: e5\ndata: {"n": 5}\n\n']
+        assert not connection.needs_replay
+
+    def test_evicted_id_needs_replay(self):
+        hub = NotificationHub(keepalive_seconds=60, replay_size=2)
+        hub.register("alice")
+        for n in range(4):
+            hub.publish(["alice"], {"n": n}, event_id=f"e{n}")
+
+        connection = hub.register("alice", last_event_id="e0")
+        assert connection.needs_replay and not connection.frames
+        # Published between registering and the Mongo lookup; must not be sent twice
+        hub.publish(["alice"], {"n": 4}, event_id="e4")
+
+        replayed = hub.replay(connection, [(f"e{n}", {"n": n}) for n in range(1, 5)])
+
+        assert replayed == 3
+        assert [event_id for event_id, _ in connection.frames] == ["e1", "e2", "e3", "e4"]
+        assert not connection.needs_replay
+
+    def test_new_user_without_history_needs_replay(self):
+        hub = NotificationHub(keepalive_seconds=60)
+        assert hub.register("alice", last_event_id="e0").needs_replay
+        assert not hub.register("bob").needs_replay
+
+    def test_replay_buffers_are_bounded(self):
+        hub = NotificationHub(keepalive_seconds=60, max_replay_users=2)
+        connected = hub.register("alice")
+        for user_id in ("bob", "carol", "dave"):
+            hub.unregister(hub.register(user_id))
+
+        assert set(hub._recent) == {"alice", "dave"}
+        assert connected.user_id in hub.connected_user_ids()
+
+    def test_many_connections(self):
+        hub = NotificationHub(keepalive_seconds=60)
+        connections = [hub.register(f"user-{k}") for k in range(10000)]
+
+        started = time.perf_counter()
+        delivered = hub.publish([f"user-{k}" for k in range(0, 10000, 100)], {"title": "Fire nearby"})
+        elapsed = time.perf_counter() - started
+
+        assert delivered == 100
+        assert sum(1 for c in connections if c.frames) == 100
+        assert elapsed < 0.05
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
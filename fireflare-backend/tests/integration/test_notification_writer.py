@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for bulk notification writes (utils.notificationwriter).
+"""
+
+import sys
+import os
+import threading
+import time
+import pytest
+import mongomock
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from utils.notificationwriter import NotificationWriter, write_notifications
+
+
+class CountingCollection:
+    """mongomock collection counting insert_many round trips, optionally held until released."""
+
+    def __init__(self, hold=False):
+        self.collection = mongomock.MongoClient().db.Notifications
+        self.calls = []
+        self.release = threading.Event()
+        if not hold:
+            self.release.set()
+
+    def insert_many(self, documents, ordered=True):
+        self.release.wait(5)
+        self.calls.append(len(documents))
+        return self.collection.insert_many(documents, ordered=ordered)
+
+
+def _documents(count, start=0):
+    return [{"userID": f"user-{k}", "message": "🔥 A new report was approved near your area.", "seen": False}
+            for k in range(start, start + count)]
+
+
+class TestWriteNotifications:
+    """Chunked, unordered inserts."""
+
+    def test_chunks(self):
+        collection = CountingCollection()
+        assert write_notifications(collection, _documents(2500), chunk_size=1000) == (2500, 0)
+        assert collection.calls == [1000, 1000, 500]
+        assert collection.collection.count_documents({"seen": False}) == 2500
+
+    def test_failed_documents_do_not_stop_the_rest(self):
+        collection = mongomock.MongoClient().db.Notifications
+        documents = _documents(5)
+        documents[1]["_id"] = documents[3]["_id"] = "duplicate"
+
+        assert write_notifications(collection, documents, chunk_size=2) == (4, 1)
+        assert collection.count_documents({}) == 4
+
+
+class TestNotificationWriter:
+    """Synchronous and queued writers end up with the same documents."""
+
+    def test_synchronous(self):
+        collection = CountingCollection()
+        writer = NotificationWriter(collection, chunk_size=100)
+        writer.submit(_documents(250))
+
+        assert collection.calls == [100, 100, 50]
+        assert writer.stats()["written"] == 250 and writer.stats()["pending"] == 0
+
+    def test_asynchronous_returns_before_writing(self):
+        collection = CountingCollection(hold=True)
+        writer = NotificationWriter(collection, chunk_size=100, asynchronous=True)
+
+        writer.submit(_documents(150))
+        assert collection.calls == [] and writer.stats()["pending"] == 150
+
+        collection.release.set()
+        assert writer.flush(timeout=5)
+        stats = writer.stats()
+        assert (stats["submitted"], stats["written"], stats["failed"], stats["pending"]) == (150, 150, 0, 0)
+        assert collection.collection.count_documents({}) == 150
+
+    def test_small_submissions_are_coalesced(self):
+        collection = CountingCollection(hold=True)
+        writer = NotificationWriter(collection, chunk_size=100, asynchronous=True)
+        for k in range(20):
+            writer.submit(_documents(5, start=5 * k))
+
+        collection.release.set()
+        assert writer.flush(timeout=5)
+        # The first submission may be picked up alone before the rest are queued
+        assert len(collection.calls) <= 2 and sum(collection.calls) == 100
+
+    def test_backpressure_writes_inline_when_full(self):
+        collection = CountingCollection(hold=True)
+        writer = NotificationWriter(collection, chunk_size=100, asynchronous=True, max_pending=100, put_timeout=0.05)
+        writer.submit(_documents(80))
+
+        done = threading.Event()
+        threading.Thread(target=lambda: (writer.submit(_documents(80, start=80)), done.set()), daemon=True).start()
+        # Waits for the full queue until the timeout, then writes itself (held here like the queued batch)
+        time.sleep(0.2)
+        assert writer.stats()["inline"] == 80 and not done.is_set()
+        collection.release.set()
+        assert done.wait(5)
+        assert writer.flush(timeout=5)
+
+        stats = writer.stats()
+        assert stats["inline"] == 80 and stats["written"] == 160
+        assert collection.collection.count_documents({}) == 160
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
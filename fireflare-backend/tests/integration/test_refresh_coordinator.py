@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-flight NASA refresh coordinator.
+"""
+
+import sys
+import os
+import threading
+import time
+import pytest
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from utils.refresh import RefreshCoordinator
+
+
+class TestRefreshCoordinator:
+    """Test cases for in-process and cross-worker refresh locking."""
+
+    def test_concurrent_callers_share_one_refresh(self):
+        coordinator = RefreshCoordinator("nasa")
+        calls = []
+
+        def slow_refresh():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"snapshot": len(calls)}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(coordinator.refresh(slow_refresh)))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(calls) == 1
+        assert results == [{"snapshot": 1}] * 8
+        assert not coordinator.in_progress()
+
+    def test_background_refresh_runs_once(self):
+        coordinator = RefreshCoordinator("nasa")
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_refresh():
+            started.set()
+            release.wait(2)
+
+        assert coordinator.refresh_in_background(blocking_refresh) is True
+        assert started.wait(2)
+        assert coordinator.refresh_in_background(blocking_refresh) is False
+        release.set()
+        for _ in range(100):
+            if not coordinator.in_progress():
+                break
+            time.sleep(0.01)
+        assert not coordinator.in_progress()
+
+    def test_errors_reach_the_caller(self):
+        coordinator = RefreshCoordinator("nasa")
+
+        def failing_refresh():
+            raise RuntimeError("FIRMS unavailable")
+
+        with pytest.raises(RuntimeError):
+            coordinator.refresh(failing_refresh)
+        assert not coordinator.in_progress()
+
+    def test_lease_blocks_other_workers(self):
+        mongomock = pytest.importorskip("mongomock")
+        leases = mongomock.MongoClient().db.RefreshLeases
+        worker_a = RefreshCoordinator("nasa", lease_collection=leases)
+        worker_b = RefreshCoordinator("nasa", lease_collection=leases)
+
+        assert worker_a.acquire_lease()
+        assert not worker_b.acquire_lease()
+        assert worker_b.refresh(lambda: "fetched") is None
+
+        worker_a.release_lease()
+        assert worker_b.wait_for_release(timeout=1)
+        assert worker_b.refresh(lambda: "fetched") == "fetched"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the ingest scheduler (jitter, persisted run state, catch-up).
+"""
+
+import sys
+import os
+import datetime
+import pytest
+
+# Add parent directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from utils.scheduler import Scheduler, _utcnow
+
+
+class TestScheduler:
+    """Test cases for the Mongo-backed interval scheduler."""
+
+    @pytest.fixture
+    def runs_collection(self):
+        mongomock = pytest.importorskip("mongomock")
+        return mongomock.MongoClient().db.SchedulerRuns
+
+    def test_jitter_stays_in_bounds(self):
+        scheduler = Scheduler()
+        job = scheduler.add_job("nasa", lambda: None, interval_seconds=3600, jitter_seconds=300)
+        start = datetime.datetime(2025, 8, 1)
+        for _ in range(50):
+            delay = (scheduler._next_run_after(job, start) - start).total_seconds()
+            assert 3300 <= delay <= 3900
+
+    def test_runs_once_across_schedulers(self, runs_collection):
+        calls = []
+        worker_a = Scheduler(runs_collection)
+        worker_b = Scheduler(runs_collection)
+        for scheduler in (worker_a, worker_b):
+            scheduler.add_job("nasa", lambda: calls.append(1), interval_seconds=3600)
+
+        assert worker_a.run_pending() == ["nasa"]
+        assert worker_b.run_pending() == []
+        assert calls == [1]
+
+        state = runs_collection.find_one({"_id": "nasa"})
+        assert state["lastStatus"] == "ok"
+        assert state["runningUntil"] is None
+        assert state["nextRunAt"] > _utcnow()
+
+    def test_missed_run_is_caught_up_on_start(self, runs_collection):
+        runs_collection.insert_one({
+            "_id": "aqi",
+            "nextRunAt": _utcnow() - datetime.timedelta(hours=5),
+            "runningUntil": None
+        })
+        calls = []
+        scheduler = Scheduler(runs_collection)
+        scheduler.add_job("aqi", lambda: calls.append(1), interval_seconds=3600)
+
+        assert scheduler.run_pending() == ["aqi"]
+        assert calls == [1]
+        # Caught up once, not once per missed interval
+        assert scheduler.run_pending() == []
+
+    def test_failures_are_recorded(self, runs_collection):
+        def failing_job():
+            raise RuntimeError("FIRMS timeout")
+
+        scheduler = Scheduler(runs_collection)
+        scheduler.add_job("nasa", failing_job, interval_seconds=60)
+        assert scheduler.run_pending() == ["nasa"]
+
+        state = runs_collection.find_one({"_id": "nasa"})
+        assert state["lastStatus"] == "error"
+        assert "FIRMS timeout" in state["lastError"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,323 @@
+from operator import itemgetter
+
+import numpy as np
+
+
+# Properties summarised by create_cluster_feature
+NUMERIC_CLUSTER_PROPS = ["brightness", "bright_t31", "frp", "confidence"]
+CATEGORICAL_CLUSTER_PROPS = ["satellite", "instrument", "version", "track", "type"]
+
+
+class _Members:
+    """
+    Values of every cluster member, laid out cluster after cluster.
+
+    `numeric[prop]` is (values, valid); `categorical[prop]` and `acq_date` are
+    (codes, uniques, decode), where code -1 means the value does not count.
+    Only `acq_date` codes need to follow the sort order of `uniques`.
+    """
+
+    def __init__(self, sizes, lats, lons):
+        self.sizes = np.asarray(sizes, dtype=np.int64)
+        self.starts = np.concatenate(([0], np.cumsum(self.sizes)[:-1])).astype(np.int64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.numeric = {}
+        self.categorical = {}
+        self.acq_date = None
+
+
+def _factorize(values, present):
+    """(codes, uniques) for the present values, codes in sorted order; -1 elsewhere."""
+    codes = np.full(len(values), -1, dtype=np.int64)
+    if not present.any():
+        return codes, []
+    uniques, inverse = np.unique(values[present], return_inverse=True)
+    codes[present] = inverse.reshape(-1)
+    return codes, uniques.tolist()
+
+
+def _numeric_summary(values):
+    """avg/max/min as create_cluster_feature rounds them."""
+    return round(sum(values) / len(values), 2), round(max(values), 2), round(min(values), 2)
+
+
+def _code_extremes(codes, starts):
+    """Per-cluster (count, lowest, highest) of the codes that are not -1."""
+    present = codes >= 0
+    counts = np.add.reduceat(present.astype(np.int64), starts)
+    lowest = np.minimum.reduceat(np.where(present, codes, np.iinfo(np.int64).max), starts)
+    highest = np.maximum.reduceat(codes, starts)
+    return counts.tolist(), lowest.tolist(), highest.tolist()
+
+
+def _aggregate(members):
+    """Cluster features for every cluster in `members`, in order."""
+    sizes = members.sizes
+    starts = members.starts
+    if len(sizes) == 0:
+        return []
+    size_list = sizes.tolist()
+    centroid_lats = (np.add.reduceat(members.lats, starts) / sizes).tolist()
+    centroid_lons = (np.add.reduceat(members.lons, starts) / sizes).tolist()
+
+    numeric = []
+    for prop in NUMERIC_CLUSTER_PROPS:
+        values, valid = members.numeric[prop]
+        if not valid.any():
+            continue
+        # Clusters laid out by their valid values only, as create_cluster_feature collects them
+        counts = np.add.reduceat(valid.astype(np.int64), starts)
+        kept = values[valid]
+        kept_starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+        has_values = counts > 0
+        sums = np.zeros(len(sizes))
+        maxes = np.zeros(len(sizes))
+        mins = np.zeros(len(sizes))
+        sums[has_values] = np.add.reduceat(kept, kept_starts[has_values])
+        maxes[has_values] = np.maximum.reduceat(kept, kept_starts[has_values])
+        mins[has_values] = np.minimum.reduceat(kept, kept_starts[has_values])
+        # max()/min() with NaN depend on order, so those clusters take the plain Python route
+        has_nan = np.zeros(len(sizes), dtype=bool)
+        has_nan[has_values] = np.logical_or.reduceat(np.isnan(kept), kept_starts[has_values])
+        numeric.append((
+            prop, counts.tolist(), sums.tolist(), maxes.tolist(), mins.tolist(), has_nan.tolist(),
+            kept, kept_starts.tolist()
+        ))
+
+    categorical = []
+    for prop in CATEGORICAL_CLUSTER_PROPS:
+        codes, uniques, decode = members.categorical[prop]
+        if not uniques:
+            continue
+        counts, lowest, highest = _code_extremes(codes, starts)
+        categorical.append((prop, counts, lowest, highest, codes, uniques, decode))
+
+    dates = None
+    if members.acq_date is not None and members.acq_date[1]:
+        codes, uniques, decode = members.acq_date
+        dates = (_code_extremes(codes, starts), uniques, decode)
+
+    clustered = []
+    for g, size in enumerate(size_list):
+        properties = {
+            "cluster_size": size,
+            "cluster_type": "wildfire_cluster"
+        }
+        for prop, counts, sums, maxes, mins, has_nan, kept, kept_starts in numeric:
+            count = counts[g]
+            if not count:
+                continue
+            if has_nan[g]:
+                start = kept_starts[g]
+                avg, high, low = _numeric_summary(kept[start:start + count].tolist())
+            else:
+                avg, high, low = round(sums[g] / count, 2), round(maxes[g], 2), round(mins[g], 2)
+            properties[f"avg_{prop}"] = avg
+            properties[f"max_{prop}"] = high
+            properties[f"min_{prop}"] = low
+        for prop, counts, lowest, highest, codes, uniques, decode in categorical:
+            if not counts[g]:
+                continue
+            if lowest[g] == highest[g]:
+                properties[prop] = [decode(uniques[lowest[g]])]
+            else:
+                # A set built in member order, so the list comes out as create_cluster_feature's does
+                start = int(starts[g])
+                properties[prop] = list(set(
+                    decode(uniques[code]) for code in codes[start:start + size].tolist() if code >= 0
+                ))
+        if dates is not None:
+            (counts, lowest, highest), uniques, decode = dates
+            if counts[g]:
+                properties["latest_acq_date"] = decode(uniques[highest[g]])
+                properties["earliest_acq_date"] = decode(uniques[lowest[g]])
+
+        clustered.append({
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [centroid_lons[g], centroid_lats[g]]
+            },
+            "properties": properties
+        })
+    return clustered
+
+
+def _as_is(value):
+    return value
+
+
+def _to_float(value):
+    try:
+        return float(value), True
+    except (ValueError, TypeError):
+        return np.nan, False
+
+
+# Stands in for a property a feature does not have
+_MISSING = object()
+
+
+def _objects_to_float(values):
+    """float() of each value; `valid` is False where float() fails."""
+    valid = values != None  # noqa: E711 - elementwise comparison
+    parsed = np.full(len(values), np.nan)
+    try:
+        parsed[valid] = values[valid].astype(np.float64)
+        return parsed, valid
+    except (ValueError, TypeError):
+        pass
+    try:
+        # Unparseable values are usually a handful of repeated codes, so convert each once
+        lookup = {v: _to_float(v) for v in dict.fromkeys(values[valid].tolist())}
+        converted = [lookup[v] for v in values[valid].tolist()]
+    except TypeError:
+        converted = [_to_float(v) for v in values[valid].tolist()]
+    parsed[valid] = [value for value, _ in converted]
+    valid[valid] = [ok for _, ok in converted]
+    return parsed, valid
+
+
+def _categorical_codes(values):
+    """
+    Codes of str(value) for the truthy values, -1 for the rest. Each distinct
+    value is converted once; the per-member lookup runs in C.
+    """
+    try:
+        distinct = dict.fromkeys(values)
+    except TypeError:
+        distinct = None
+    if distinct is None or not all(v is None or v is _MISSING or type(v) is str for v in distinct):
+        # Unhashable or mixed types (1 and True hash alike but print differently)
+        index = {}
+        codes = [index.setdefault(str(v), len(index)) if v and v is not _MISSING else -1 for v in values]
+        return np.array(codes, dtype=np.int64), list(index), _as_is
+    index = {}
+    lookup = {v: index.setdefault(v, len(index)) if v and v is not _MISSING else -1 for v in distinct}
+    codes = np.fromiter(map(lookup.__getitem__, values), dtype=np.int64, count=len(values))
+    return codes, list(index), _as_is
+
+
+def _sorted_codes(codes, uniques):
+    """Renumber first-seen codes so they follow the sort order of `uniques`."""
+    if not uniques:
+        return codes, uniques, _as_is
+    order = sorted(range(len(uniques)), key=uniques.__getitem__)
+    rank = np.empty(len(uniques), dtype=np.int64)
+    rank[order] = np.arange(len(uniques))
+    return np.where(codes >= 0, rank[codes], -1), [uniques[k] for k in order], _as_is
+
+
+def aggregate_clusters(features, clusters):
+    """
+    create_cluster_feature for many clusters at once: each property is read
+    once per feature, then every cluster's centroid, avg/max/min and
+    categorical values are computed in vectorized passes over the members.
+
+    Args:
+        features: GeoJSON point features
+        clusters: Lists of indices into `features`, each with 2+ members
+
+    Returns:
+        One cluster feature per cluster, as create_cluster_feature builds it;
+        sums are taken with np.add.reduceat, so centroids and averages can
+        differ from sum()'s in the last bits (or by 0.01 where rounding ties)
+    """
+    if not clusters:
+        return []
+    order = [k for cluster in clusters for k in cluster]
+    n = len(order)
+    member_features = list(map(features.__getitem__, order))
+    coordinates = list(map(itemgetter("coordinates"), map(itemgetter("geometry"), member_features)))
+    members = _Members(
+        [len(c) for c in clusters],
+        np.fromiter(map(itemgetter(1), coordinates), dtype=np.float64, count=n),
+        np.fromiter(map(itemgetter(0), coordinates), dtype=np.float64, count=n)
+    )
+
+    # One pass reads every property of a member while its dict is in cache; column k is
+    # then every len(names)-th value
+    names = NUMERIC_CLUSTER_PROPS + CATEGORICAL_CLUSTER_PROPS + ["acq_date"]
+    flat = [p.get(name, _MISSING) for p in map(itemgetter("properties"), member_features) for name in names]
+    columns = {name: flat[k::len(names)] for k, name in enumerate(names)}
+
+    for prop in NUMERIC_CLUSTER_PROPS:
+        # A missing property and a None value are both skipped
+        values = np.fromiter(columns[prop], dtype=object, count=n)
+        values[values == _MISSING] = None
+        members.numeric[prop] = _objects_to_float(values)
+
+    for prop in CATEGORICAL_CLUSTER_PROPS:
+        members.categorical[prop] = _categorical_codes(columns[prop])
+
+    index = {}
+    codes = [-1 if date is _MISSING else index.setdefault(date, len(index)) for date in columns["acq_date"]]
+    members.acq_date = _sorted_codes(np.array(codes, dtype=np.int64), list(index))
+
+    return _aggregate(members)
+
+
+def _bytes_to_float(raw):
+    """Parse a bytes column as float() would; `valid` is False where float() fails."""
+    try:
+        return raw.astype(np.float64), np.ones(len(raw), dtype=bool)
+    except ValueError:
+        parsed = [_to_float(v.decode("utf-8")) for v in raw.tolist()]
+        return (
+            np.array([value for value, _ in parsed], dtype=np.float64),
+            np.array([ok for _, ok in parsed], dtype=bool)
+        )
+
+
+def _utf8(value):
+    return value.decode("utf-8")
+
+
+def aggregate_detection_clusters(detections, clusters):
+    """
+    aggregate_clusters for utils.firms.FirmsDetections: the properties come
+    straight from the raw columns, so no feature dicts are built for members.
+    """
+    if not clusters:
+        return []
+    order = np.fromiter((k for cluster in clusters for k in cluster), dtype=np.int64)
+    members = _Members([len(c) for c in clusters], detections.lat[order], detections.lon[order])
+    n = len(order)
+
+    def column(prop):
+        """The member values of `prop` and where the property exists at all."""
+        if prop not in detections.columns:
+            return None, np.zeros(n, dtype=bool)
+        raw = detections.columns[prop][order]
+        exists = ~detections.absent[prop][order] if prop in detections.absent else np.ones(n, dtype=bool)
+        return raw, exists
+
+    for prop in NUMERIC_CLUSTER_PROPS:
+        raw, exists = column(prop)
+        if raw is None:
+            members.numeric[prop] = (np.full(n, np.nan), exists)
+            continue
+        values, valid = _bytes_to_float(raw[exists])
+        all_values = np.full(n, np.nan)
+        all_valid = np.zeros(n, dtype=bool)
+        all_values[exists] = values
+        all_valid[exists] = valid
+        members.numeric[prop] = (all_values, all_valid)
+
+    for prop in CATEGORICAL_CLUSTER_PROPS:
+        raw, exists = column(prop)
+        if raw is None:
+            members.categorical[prop] = (np.full(n, -1, dtype=np.int64), [], _utf8)
+            continue
+        # Empty strings are falsy, so create_cluster_feature skips them
+        codes, uniques = _factorize(raw, exists & (raw != b""))
+        members.categorical[prop] = (codes, uniques, _utf8)
+
+    raw, exists = column("acq_date")
+    if raw is not None:
+        # UTF-8 byte order is code point order, so bytes sort like the decoded strings
+        codes, uniques = _factorize(raw, exists)
+        members.acq_date = (codes, uniques, _utf8)
+
+    return _aggregate(members)
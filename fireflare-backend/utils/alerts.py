@@ -0,0 +1,173 @@
+import datetime
+
+import numpy as np
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+
+from utils.calculate import haversine_pairs_within
+
+
+# Same reach as the moderator-approval alerts in approveReport
+DEFAULT_ALERT_RADIUS_KM = 10.0
+# Sent alerts are remembered this long; a fire near one of them doesn't alert the user again
+ALERT_TTL_SECONDS = 30 * 24 * 3600
+ALERT_WRITE_CHUNK = 1000
+
+
+def _utcnow():
+    # Naive UTC, which is what pymongo stores and returns by default
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def ensure_alert_indexes(alerts_collection):
+    # Also serves the per-user lookup of earlier alerts; unique so a racing ingest can't repeat one
+    alerts_collection.create_index([("userID", ASCENDING), ("clusterId", ASCENDING)], unique=True)
+    alerts_collection.create_index("sentAt", expireAfterSeconds=ALERT_TTL_SECONDS)
+
+
+class AddressPoints:
+    """Saved addresses as parallel arrays: owner userID, longitude, latitude and label."""
+
+    def __init__(self, user_ids, lons, lats, labels):
+        self.user_ids = user_ids
+        self.lons = np.asarray(lons, dtype=float)
+        self.lats = np.asarray(lats, dtype=float)
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    @classmethod
+    def from_documents(cls, documents):
+        """
+        From `{userID, coordinates: [lon, lat], label}` documents. Missing,
+        malformed and [0, 0] placeholder coordinates are skipped, as are
+        repeats of the same user and position.
+        """
+        seen = set()
+        user_ids, lons, lats, labels = [], [], [], []
+        for doc in documents:
+            user_id = doc.get("userID")
+            coordinates = doc.get("coordinates")
+            try:
+                lon, lat = float(coordinates[0]), float(coordinates[1])
+            except (TypeError, ValueError, IndexError, KeyError):
+                continue
+            if not user_id or (lon == 0 and lat == 0) or not (-180 <= lon <= 180 and -90 <= lat <= 90):
+                continue
+            if (user_id, lon, lat) in seen:
+                continue
+            seen.add((user_id, lon, lat))
+            user_ids.append(user_id)
+            lons.append(lon)
+            lats.append(lat)
+            labels.append(doc.get("label") or "Home")
+        return cls(user_ids, lons, lats, labels)
+
+
+def load_addresses(addresses_collection, users_collection):
+    """
+    Every saved address: the Addresses collection plus the `addresses[]`
+    still embedded in Users documents (new users only have those).
+    """
+    def documents():
+        yield from addresses_collection.find({}, {"userID": 1, "coordinates": 1, "label": 1, "_id": 0})
+        for user in users_collection.find({"addresses.coordinates": {"$exists": True}},
+                                          {"userID": 1, "addresses.coordinates": 1, "addresses.label": 1, "_id": 0}):
+            for address in user.get("addresses") or []:
+                yield dict(address, userID=user.get("userID"))
+    return AddressPoints.from_documents(documents())
+
+
+def proximity_matches(clusters, addresses, radius_km=DEFAULT_ALERT_RADIUS_KM):
+    """
+    Each (user, cluster) pair where one of the user's addresses is within
+    `radius_km` of the cluster, with the closest such address.
+
+    Returns:
+        list of {userID, clusterId, distanceKm, label, coordinates}; clusters
+        without an id are skipped
+    """
+    clusters = [c for c in clusters if c.get("id") is not None]
+    if not clusters or not len(addresses):
+        return []
+    lons, lats = np.array([c["geometry"]["coordinates"][:2] for c in clusters], dtype=float).T
+    ci, aj, distance = haversine_pairs_within(lats, lons, radius_km, addresses.lats, addresses.lons)
+    if not ci.size:
+        return []
+
+    # Keep the closest address per (user, cluster)
+    users, user_codes = np.unique(np.asarray(addresses.user_ids, dtype=object), return_inverse=True)
+    pair_keys = user_codes[aj].astype(np.int64) * len(clusters) + ci
+    order = np.lexsort((distance, pair_keys))
+    first = order[np.r_[True, pair_keys[order][1:] != pair_keys[order][:-1]]]
+
+    return [
+        {
+            "userID": users[user_codes[a]],
+            "clusterId": clusters[c]["id"],
+            "distanceKm": round(float(d), 2),
+            "label": addresses.labels[a],
+            "coordinates": clusters[c]["geometry"]["coordinates"][:2]
+        }
+        for c, a, d in zip(ci[first].tolist(), aj[first].tolist(), distance[first].tolist())
+    ]
+
+
+def record_new_alerts(alerts_collection, matches, radius_km=DEFAULT_ALERT_RADIUS_KM, snapshot_id=None):
+    """
+    Pick the alerts to send from `matches` and record them in
+    `alerts_collection`: each user's closest match, unless it lies within
+    `radius_km` of a fire they were already alerted about (while that alert
+    is kept, see ALERT_TTL_SECONDS).
+
+    Repeats are judged by location rather than cluster id: a cluster's id
+    follows its seed detection, which changes once that detection ages out
+    of the FIRMS window, while the fire is still burning in the same place.
+
+    Returns:
+        the alerts that were recorded, at most one per user
+    """
+    if not matches:
+        return []
+    user_ids = list({m["userID"] for m in matches})
+    previous = list(alerts_collection.find({"userID": {"$in": user_ids}}, {"userID": 1, "coordinates": 1, "_id": 0}))
+    previous = [doc for doc in previous if len(doc.get("coordinates") or []) >= 2]
+
+    alerted = np.zeros(len(matches), dtype=bool)
+    if previous:
+        lons, lats = np.array([m["coordinates"][:2] for m in matches], dtype=float).T
+        previous_lons, previous_lats = np.array([doc["coordinates"][:2] for doc in previous], dtype=float).T
+        mi, pj, _ = haversine_pairs_within(lats, lons, radius_km, previous_lats, previous_lons)
+        same_user = [matches[i]["userID"] == previous[j]["userID"] for i, j in zip(mi.tolist(), pj.tolist())]
+        alerted[mi[np.array(same_user, dtype=bool)]] = True
+
+    nearest = {}
+    for match, seen in zip(matches, alerted):
+        current = nearest.get(match["userID"])
+        if not seen and (current is None or match["distanceKm"] < current["distanceKm"]):
+            nearest[match["userID"]] = match
+    fresh = list(nearest.values())
+
+    sent_at = _utcnow()
+    recorded = []
+    for k in range(0, len(fresh), ALERT_WRITE_CHUNK):
+        chunk = fresh[k:k + ALERT_WRITE_CHUNK]
+        documents = [{"userID": m["userID"], "clusterId": m["clusterId"], "coordinates": m["coordinates"][:2],
+                      "distanceKm": m["distanceKm"], "snapshotId": snapshot_id, "sentAt": sent_at} for m in chunk]
+        try:
+            alerts_collection.insert_many(documents, ordered=False)
+            recorded += chunk
+        except BulkWriteError as e:
+            # Another ingest recorded some of them first
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            recorded += [m for n, m in enumerate(chunk) if n not in failed]
+    return recorded
+
+
+def alerts_by_cluster(alerts):
+    """Alerts grouped by their fire's cluster id, so each group can go out as a single broadcast."""
+    groups = {}
+    for alert in alerts:
+        groups.setdefault(alert["clusterId"], []).append(alert)
+    return groups
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+
+# Hours between refreshes for each WildfireZone.priority (1 = highest risk)
+DEFAULT_TIER_HOURS = {
+    1: 1,   # california_forests
+    2: 1,   # pacific_northwest_forests, british_columbia_forests
+    3: 3,
+    4: 3,
+    5: 6,
+    6: 6,
+    7: 12,
+    8: 12,  # eastern_us_plains and points outside every zone
+}
+
+
+def refresh_interval(priority: int, tier_hours: Dict[int, float] = DEFAULT_TIER_HOURS) -> timedelta:
+    """Refresh interval for a zone priority; unknown priorities get the slowest tier."""
+    return timedelta(hours=tier_hours.get(priority, max(tier_hours.values())))
+
+
+def _parse_time(value) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+def due_zones(grid_points, zone_refreshed_at: Dict[str, str], now: datetime,
+              tier_hours: Dict[int, float] = DEFAULT_TIER_HOURS) -> Dict[str, int]:
+    """
+    Zones whose last refresh is older than their tier interval (or that were
+    never refreshed), mapped to their priority.
+    """
+    priorities = {}
+    for point in grid_points:
+        priorities.setdefault(point.zone, point.priority)
+
+    due = {}
+    for zone, priority in priorities.items():
+        last = _parse_time(zone_refreshed_at.get(zone))
+        if last is None or now - last >= refresh_interval(priority, tier_hours):
+            due[zone] = priority
+    return due
+
+
+def plan_refresh(grid_points, zone_refreshed_at: Dict[str, str], now: datetime,
+                 tier_hours: Dict[int, float] = DEFAULT_TIER_HOURS) -> Tuple[List, List[str]]:
+    """
+    Pick the grid points to fetch on this run.
+
+    Returns:
+        (points, zones): points of every due zone, highest priority first, and
+        the names of those zones
+    """
+    due = due_zones(grid_points, zone_refreshed_at, now, tier_hours)
+    points = sorted((p for p in grid_points if p.zone in due), key=lambda p: p.priority)
+    zones = sorted(due, key=lambda zone: (due[zone], zone))
+    return points, zones
+
+
+def merge_features(previous_features: List[Dict], new_features: List[Dict]) -> List[Dict]:
+    """
+    Overlay freshly fetched AQI features onto the previous snapshot's features.
+
+    Features are matched on their coordinates, so a point that failed this run
+    keeps its last good reading instead of disappearing from the map.
+    """
+    merged = {}
+    for feature in previous_features:
+        merged[tuple(feature["geometry"]["coordinates"])] = feature
+    for feature in new_features:
+        merged[tuple(feature["geometry"]["coordinates"])] = feature
+    return list(merged.values())
@@ -0,0 +1,218 @@
+import datetime
+import gzip
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+try:
+    import brotli
+except ImportError:  # Optional: without it responses are gzip-only
+    brotli = None
+
+
+GZIP_LEVEL = 6
+# Close to quality 11's ratio at a fraction of its CPU time
+BROTLI_QUALITY = 9
+# Stored encodings must fit in one MongoDB document (16 MB)
+MAX_STORED_PAYLOAD_BYTES = 15 * 1024 * 1024
+
+
+class LRUCache:
+    """
+    Small bounded LRU cache tied to a data version.
+
+    Every read and write names the version it belongs to (e.g. the snapshot's
+    `lastUpdated`); as soon as a different version shows up the whole cache is
+    dropped, so entries from an older snapshot are never served.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_version(self, version):
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+    def get(self, version, key, default=None):
+        with self._lock:
+            self._check_version(version)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, version, key, value):
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.version = None
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": self.version
+        }
+
+
+class EncodedPayload:
+    """
+    A response body encoded once and served as-is on later requests.
+    The gzip and brotli variants are compressed on first use, or all up front
+    by precompress(), and kept alongside it.
+    """
+
+    def __init__(self, body, status=200, mimetype="application/json", etag=None):
+        self._body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.etag = etag
+        self._encoded = {}
+
+    @property
+    def body(self):
+        if self._body is None:
+            # Loaded from the store, which only keeps compressed variants
+            self._body = gzip.decompress(self._encoded["gzip"])
+        return self._body
+
+    def gzipped(self):
+        return self.encoded("gzip")
+
+    def encoded(self, encoding=None):
+        """The body in `encoding` ("gzip", "br", or None for identity)."""
+        if encoding is None:
+            return self.body
+        if encoding not in self._encoded:
+            if encoding == "gzip":
+                # mtime=0 keeps the bytes identical between processes
+                self._encoded["gzip"] = gzip.compress(self.body, compresslevel=GZIP_LEVEL, mtime=0)
+            elif encoding == "br" and brotli is not None:
+                self._encoded["br"] = brotli.compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                raise ValueError(f"Unsupported content encoding: {encoding}")
+        return self._encoded[encoding]
+
+    def precompress(self):
+        """Compress every supported encoding now, e.g. at ingest time."""
+        for encoding in supported_encodings():
+            self.encoded(encoding)
+        return self
+
+
+def supported_encodings():
+    """Content encodings this process can produce, most preferred first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_encoding(accept_encoding):
+    """The content encoding to send for an Accept-Encoding header value, or None for identity."""
+    for encoding in supported_encodings():
+        if accepts_encoding(accept_encoding, encoding):
+            return encoding
+    return None
+
+
+def payload_etag(version, key):
+    """Strong ETag of the `key` response for one snapshot version."""
+    digest = hashlib.blake2b(f"{version}|{key}".encode("utf-8"), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def encoded_etag(etag, encoding):
+    """A distinct strong ETag per content encoding, as each is a different byte sequence."""
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    True if an If-None-Match header value names `etag` in any encoding.
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match.
+    """
+    if not if_none_match or not etag:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag or candidate.startswith(etag[:-1] + "-"):
+            return True
+    return False
+
+
+def store_payload(collection, version, key, payload):
+    """
+    Save a payload's compressed encodings so every worker can serve them
+    without encoding the snapshot again. Returns False when they are too big
+    for one document; readers then encode on first use as before.
+    """
+    payload.precompress()
+    encodings = {encoding: payload.encoded(encoding) for encoding in supported_encodings()}
+    if sum(len(body) for body in encodings.values()) > MAX_STORED_PAYLOAD_BYTES:
+        return False
+    collection.replace_one({"_id": f"{key}|{version}"}, {
+        "_id": f"{key}|{version}",
+        "key": key,
+        "version": version,
+        "status": payload.status,
+        "mimetype": payload.mimetype,
+        "etag": payload.etag,
+        "encodings": encodings,
+        "storedAt": datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    }, upsert=True)
+    return True
+
+
+def load_payload(collection, version, key):
+    """The payload store_payload saved for `key` at `version`, or None."""
+    doc = collection.find_one({"_id": f"{key}|{version}"})
+    if not doc or "gzip" not in doc.get("encodings", {}):
+        return None
+    payload = EncodedPayload(None, doc.get("status", 200), doc.get("mimetype", "application/json"), doc.get("etag"))
+    for encoding, body in doc["encodings"].items():
+        if encoding in supported_encodings():
+            payload._encoded[encoding] = bytes(body)
+    return payload
+
+
+def prune_payloads(collection, keys, keep_versions):
+    """Drop stored payloads of `keys` for every version not in `keep_versions`."""
+    return collection.delete_many({"key": {"$in": list(keys)}, "version": {"$nin": list(keep_versions)}}).deleted_count
+
+
+def accepts_encoding(accept_encoding, encoding):
+    """True if an Accept-Encoding header value allows `encoding` (q=0 opts out)."""
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() not in (encoding, "*"):
+            continue
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
@@ -1,12 +1,15 @@
 import math
 
+import numpy as np
 
 
+EARTH_RADIUS_KM = 6371  # Earth's radius in kilometers
+KM_PER_DEGREE_LAT = EARTH_RADIUS_KM * math.pi / 180  # ~111.195 km
 
 
 def haversine_distance(lat1, lon1, lat2, lon2):
     """Calculate the great circle distance between two points on Earth in kilometers."""
-    R = 6371  # Earth's radius in kilometers
+    R = EARTH_RADIUS_KM
     
     # Convert latitude and longitude to radians
     lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
@@ -19,3 +22,151 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     
     return R * c
 
+
+def haversine_one_to_many(lat, lon, lats, lons):
+    """
+    Distances in kilometers from one point to every point in `lats`/`lons`.
+    Scalars and arrays both work; the result has the shape of `lats`.
+    """
+    lat1 = np.radians(lat)
+    lon1 = np.radians(lon)
+    lat2 = np.radians(np.asarray(lats, dtype=float))
+    lon2 = np.radians(np.asarray(lons, dtype=float))
+    return _haversine_radians(lat1, lon1, np.cos(lat1), lat2, lon2, np.cos(lat2))
+
+
+def haversine_many_to_many(lats1, lons1, lats2, lons2, block_size=1024):
+    """
+    Full (len(lats1), len(lats2)) distance matrix in kilometers.
+    Rows are computed `block_size` at a time to keep temporaries small.
+    """
+    lat1 = np.radians(np.asarray(lats1, dtype=float))
+    lon1 = np.radians(np.asarray(lons1, dtype=float))
+    lat2 = np.radians(np.asarray(lats2, dtype=float))
+    lon2 = np.radians(np.asarray(lons2, dtype=float))
+    cos1 = np.cos(lat1)
+    cos2 = np.cos(lat2)
+
+    out = np.empty((lat1.size, lat2.size))
+    for start in range(0, lat1.size, block_size):
+        rows = slice(start, start + block_size)
+        out[rows] = _haversine_radians(
+            lat1[rows, None], lon1[rows, None], cos1[rows, None], lat2, lon2, cos2
+        )
+    return out
+
+
+def lon_reach_degrees(lat, distance_km):
+    """
+    Widest longitude difference (in degrees) two points can have and still be
+    within `distance_km` of each other, when one of them sits at `lat`.
+
+    Uses the haversine lower bound  d >= 2R * asin(cos(L) * sin(dlon / 2)),
+    where L is the highest latitude either point can reach.
+    """
+    R = EARTH_RADIUS_KM
+    max_lat = min(90.0, abs(lat) + math.degrees(distance_km / R))
+    cos_lat = math.cos(math.radians(max_lat))
+    half_angle = math.sin(min(distance_km / (2 * R), math.pi / 2))
+    if cos_lat <= half_angle:
+        return 180.0  # Close enough to a pole that any longitude can be in range
+    return math.degrees(2 * math.asin(half_angle / cos_lat))
+
+
+def haversine_pairs_within(lats, lons, radius_km, other_lats=None, other_lons=None, block_size=65536):
+    """
+    Find every pair of points within `radius_km` of each other.
+
+    With only `lats`/`lons` this is a self-join and returns pairs with i < j.
+    With `other_lats`/`other_lons` it joins the first set against the second,
+    and j indexes the second set.
+
+    Points are bucketed into a grid of cells at least `radius_km` wide, so
+    each point is only compared with the cells next to its own. Unlike a
+    latitude sweep this stays fast for dense, continent-wide sets.
+
+    Returns:
+        (i, j, distance_km) arrays sorted by i, then j
+    """
+    q_lat = np.asarray(lats, dtype=float)
+    q_lon = np.asarray(lons, dtype=float)
+    self_join = other_lats is None
+    t_lat = q_lat if self_join else np.asarray(other_lats, dtype=float)
+    t_lon = q_lon if self_join else np.asarray(other_lons, dtype=float)
+    empty = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0))
+    if q_lat.size == 0 or t_lat.size == 0 or (self_join and q_lat.size < 2) or radius_km < 0:
+        return empty
+
+    max_abs_lat = max(float(np.abs(q_lat).max()), float(np.abs(t_lat).max()))
+    lat_cell = max(radius_km / KM_PER_DEGREE_LAT * (1 + 1e-9) + 1e-12, 1e-6)
+    lon_cell = max(lon_reach_degrees(max_abs_lat, radius_km) * (1 + 1e-9) + 1e-12, 1e-6)
+    q_cy = np.floor(q_lat / lat_cell).astype(np.int64)
+    q_cx = np.floor(q_lon / lon_cell).astype(np.int64)
+    t_cy = q_cy if self_join else np.floor(t_lat / lat_cell).astype(np.int64)
+    t_cx = q_cx if self_join else np.floor(t_lon / lon_cell).astype(np.int64)
+    # Shift so neighbouring cells of every point have non-negative coordinates
+    cy_min = min(q_cy.min(), t_cy.min()) - 1
+    cx_min = min(q_cx.min(), t_cx.min()) - 1
+    stride = int(max(q_cy.max(), t_cy.max()) - cy_min) + 2
+    keys = (q_cx - cx_min) * stride + (q_cy - cy_min)
+    t_keys = keys if self_join else (t_cx - cx_min) * stride + (t_cy - cy_min)
+
+    order = np.argsort(t_keys, kind="stable")
+    sorted_keys = t_keys[order]
+    q_lat_r = np.radians(q_lat)
+    q_lon_r = np.radians(q_lon)
+    q_cos = np.cos(q_lat_r)
+    t_lat_r = q_lat_r if self_join else np.radians(t_lat)
+    t_lon_r = q_lon_r if self_join else np.radians(t_lon)
+    t_cos = q_cos if self_join else np.cos(t_lat_r)
+    if self_join:
+        # Half of the 3x3 neighbourhood: every pair of cells is visited once
+        neighbours = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1))
+    else:
+        neighbours = tuple((dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+
+    found_i, found_j, found_d = [], [], []
+    for start in range(0, q_lat.size, block_size):
+        queries = np.arange(start, min(start + block_size, q_lat.size))
+        for dx, dy in neighbours:
+            target = keys[queries] + dx * stride + dy
+            lo = np.searchsorted(sorted_keys, target, side="left")
+            counts = np.searchsorted(sorted_keys, target, side="right") - lo
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            # Expand each query's [lo, hi) range of the sorted keys into pairs
+            a = np.repeat(queries, counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            b = order[np.repeat(lo, counts) + offsets]
+            if self_join:
+                if dx == 0 and dy == 0:
+                    keep = a < b
+                    a, b = a[keep], b[keep]
+                i = np.minimum(a, b)
+                j = np.maximum(a, b)
+            else:
+                i, j = a, b
+            d = _haversine_radians(q_lat_r[i], q_lon_r[i], q_cos[i], t_lat_r[j], t_lon_r[j], t_cos[j])
+            close = d <= radius_km
+            found_i.append(i[close])
+            found_j.append(j[close])
+            found_d.append(d[close])
+
+    if not found_i:
+        return empty
+    i = np.concatenate(found_i)
+    j = np.concatenate(found_j)
+    d = np.concatenate(found_d)
+    order = np.lexsort((j, i))
+    return i[order], j[order], d[order]
+
+
+def _haversine_radians(lat1, lon1, cos_lat1, lat2, lon2, cos_lat2):
+    # Haversine formula on inputs already converted to radians
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + cos_lat1 * cos_lat2 * np.sin(dlon / 2) ** 2
+    # Rounding can push `a` a hair past 1 for antipodal points
+    c = 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    return EARTH_RADIUS_KM * c
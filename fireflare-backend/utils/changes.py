@@ -0,0 +1,156 @@
+import datetime
+import hashlib
+import json
+
+from pymongo import ASCENDING
+from pymongo.errors import DocumentTooLarge
+
+
+# Snapshots whose diff to the newest one is precomputed at ingest
+DEFAULT_CHANGES_HISTORY = 6
+# Past this share of changed clusters a diff saves little over a full reload
+FULL_RELOAD_FRACTION = 0.5
+DIGEST_SIZE = 8
+
+
+def detection_key(feature):
+    """What identifies one FIRMS observation: position, acquisition time and satellite."""
+    properties = feature.get("properties") or {}
+    lon, lat = feature["geometry"]["coordinates"][:2]
+    return (f"{float(lat)!r},{float(lon)!r},"
+            f"{properties.get('acq_date', '')} {properties.get('acq_time', '')},{properties.get('satellite', '')}")
+
+
+def detection_keys(detections, indices):
+    """detection_key for rows of utils.firms.FirmsDetections, without building their features."""
+    rows = detections.take(list(indices))
+
+    def column(name):
+        if name not in rows.columns:
+            return [""] * len(rows)
+        values = [v.decode("utf-8") for v in rows.columns[name].tolist()]
+        if name in rows.absent:
+            values = ["" if absent else v for v, absent in zip(values, rows.absent[name].tolist())]
+        return values
+
+    return [
+        f"{lat!r},{lon!r},{acq_date} {acq_time},{satellite}"
+        for lat, lon, acq_date, acq_time, satellite in zip(
+            rows.lat.tolist(), rows.lon.tolist(), column("acq_date"), column("acq_time"), column("satellite")
+        )
+    ]
+
+
+def stable_ids(keys):
+    """A short id per key; a repeated key gets a distinct id per repeat, in order."""
+    seen = {}
+    ids = []
+    for key in keys:
+        repeat = seen.get(key, 0)
+        seen[key] = repeat + 1
+        text = key if repeat == 0 else f"{key}#{repeat}"
+        ids.append(hashlib.blake2b(text.encode("utf-8"), digest_size=DIGEST_SIZE).hexdigest())
+    return ids
+
+
+def assign_ids(features, ids):
+    """Set each feature's GeoJSON `id`. Returns `features`."""
+    for feature, feature_id in zip(features, ids):
+        feature["id"] = feature_id
+    return features
+
+
+def _digest(feature):
+    text = json.dumps(feature, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+def cluster_index(features):
+    """{id: content digest} for a snapshot's clustered features, or None if any lacks an id."""
+    if any("id" not in feature for feature in features):
+        return None
+    return {feature["id"]: _digest(feature) for feature in features}
+
+
+def diff_clusters(previous_index, features, index):
+    """
+    Clusters added, updated (same id, different content) and removed between
+    a snapshot whose cluster_index was `previous_index` and `features`.
+    """
+    added = []
+    updated = []
+    for feature in features:
+        previous = previous_index.get(feature["id"])
+        if previous is None:
+            added.append(feature)
+        elif previous != index[feature["id"]]:
+            updated.append(feature)
+    removed = [cluster_id for cluster_id in previous_index if cluster_id not in index]
+    return {"added": added, "updated": updated, "removed": removed}
+
+
+def ensure_changes_indexes(changes_collection):
+    changes_collection.create_index([("kind", ASCENDING), ("snapshotId", ASCENDING)])
+
+
+def store_cluster_index(changes_collection, snapshot_id, index):
+    """Save a snapshot's cluster ids and digests, so later snapshots can diff against it."""
+    changes_collection.replace_one({"_id": f"index:{snapshot_id}"}, {
+        "_id": f"index:{snapshot_id}",
+        "kind": "index",
+        "snapshotId": str(snapshot_id),
+        "ids": list(index),
+        "digests": b"".join(index.values())
+    }, upsert=True)
+
+
+def load_cluster_index(changes_collection, snapshot_id):
+    doc = changes_collection.find_one({"_id": f"index:{snapshot_id}"})
+    if not doc:
+        return None
+    digests = bytes(doc["digests"])
+    return {
+        cluster_id: digests[k * DIGEST_SIZE:(k + 1) * DIGEST_SIZE]
+        for k, cluster_id in enumerate(doc["ids"])
+    }
+
+
+def store_changes(changes_collection, since_id, snapshot_id, changes, cluster_count):
+    """
+    Save the diff from `since_id` to `snapshot_id`. A diff touching more than
+    FULL_RELOAD_FRACTION of the clusters, or too large for one document, is
+    recorded as a full reload instead.
+    """
+    changed = len(changes["added"]) + len(changes["updated"])
+    full = cluster_count > 0 and changed > FULL_RELOAD_FRACTION * cluster_count
+    doc = {
+        "_id": f"changes:{since_id}:{snapshot_id}",
+        "kind": "changes",
+        "since": str(since_id),
+        "snapshotId": str(snapshot_id),
+        "full": full,
+        "createdAt": datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    }
+    if not full:
+        diff_doc = dict(doc, **changes)
+        try:
+            changes_collection.replace_one({"_id": doc["_id"]}, diff_doc, upsert=True)
+            return diff_doc
+        except DocumentTooLarge:
+            doc["full"] = True
+    changes_collection.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+    return doc
+
+
+def load_changes(changes_collection, since_id, snapshot_id):
+    """The stored diff from `since_id` to `snapshot_id`, or None."""
+    return changes_collection.find_one({"_id": f"changes:{since_id}:{snapshot_id}"})
+
+
+def prune_changes(changes_collection, snapshot_id, keep_index_ids):
+    """Keep only diffs into `snapshot_id` and the cluster indexes of `keep_index_ids`."""
+    removed = changes_collection.delete_many({"kind": "changes", "snapshotId": {"$ne": str(snapshot_id)}}).deleted_count
+    removed += changes_collection.delete_many(
+        {"kind": "index", "snapshotId": {"$nin": [str(i) for i in keep_index_ids]}}
+    ).deleted_count
+    return removed
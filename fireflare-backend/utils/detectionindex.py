@@ -0,0 +1,102 @@
+import datetime
+
+import numpy as np
+
+from utils.detectionstore import DEFAULT_PAGE_SIZE, confidence_score, parse_acquired_at
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class DetectionIndex:
+    """
+    Filter columns over one snapshot's original detections, for document
+    storage where they only exist inside the snapshot's originalData.
+
+    Longitude, latitude, acquisition time, confidence (0-100, see
+    utils.detectionstore.confidence_score) and FRP are numpy arrays in
+    snapshot order, so a query is a few vectorized comparisons; GeoJSON
+    features are only built for the page a query returns.
+    """
+
+    def __init__(self, lon, lat, acquired_minutes, confidence, frp, build_features):
+        self.lon = lon
+        self.lat = lat
+        self.acquired_minutes = acquired_minutes
+        self.confidence = confidence
+        self.frp = frp
+        self._build_features = build_features
+
+    def __len__(self):
+        return len(self.lon)
+
+    @classmethod
+    def from_detections(cls, detections):
+        """Index utils.firms.FirmsDetections without building their features."""
+        codes, inverse = np.unique(detections.confidence, return_inverse=True)
+        scores = np.array([_score(confidence_score(code.decode("utf-8"))) for code in codes.tolist()], dtype=np.float64)
+        return cls(
+            detections.lon,
+            detections.lat,
+            detections.acquired_minutes(),
+            scores[inverse] if len(codes) else np.full(len(detections), np.nan),
+            detections.frp,
+            lambda positions: detections.take(positions).to_features()
+        )
+
+    @classmethod
+    def from_features(cls, features):
+        """Index a list of GeoJSON detection features (e.g. a stored originalData)."""
+        n = len(features)
+        lon = np.empty(n)
+        lat = np.empty(n)
+        acquired = np.full(n, np.nan)
+        confidence = np.full(n, np.nan)
+        frp = np.full(n, np.nan)
+        for k, feature in enumerate(features):
+            properties = feature.get("properties") or {}
+            lon[k], lat[k] = feature["geometry"]["coordinates"][:2]
+            acquired_at = parse_acquired_at(properties.get("acq_date"), properties.get("acq_time"))
+            if acquired_at is not None:
+                acquired[k] = (acquired_at - EPOCH).total_seconds() / 60
+            confidence[k] = _score(confidence_score(properties.get("confidence")))
+            frp[k] = _float(properties.get("frp"))
+        return cls(lon, lat, acquired, confidence, frp, lambda positions: [features[p] for p in positions])
+
+    def query(self, bbox=None, since=None, min_confidence=None, min_frp=None, after=-1, limit=DEFAULT_PAGE_SIZE):
+        """
+        Up to `limit` detections matching the filters (same meaning as
+        utils.detectionstore.detection_query), after position `after`.
+
+        Returns:
+            (features, cursor) where cursor is the position to pass as `after`
+            for the next page, or None after the last page
+        """
+        start = after + 1
+        mask = np.ones(max(len(self) - start, 0), dtype=bool)
+        if bbox is not None:
+            lon = self.lon[start:]
+            lat = self.lat[start:]
+            mask &= (lon >= bbox[0]) & (lon <= bbox[2]) & (lat >= bbox[1]) & (lat <= bbox[3])
+        if since is not None:
+            # NaN (unknown time) never passes
+            mask &= self.acquired_minutes[start:] >= (since - EPOCH).total_seconds() / 60
+        if min_confidence is not None:
+            mask &= self.confidence[start:] >= min_confidence
+        if min_frp is not None:
+            mask &= self.frp[start:] >= min_frp
+        positions = np.flatnonzero(mask)[:limit + 1] + start
+        more = len(positions) > limit
+        positions = positions[:limit].tolist()
+        return self._build_features(positions), (positions[-1] if more else None)
+
+
+def _score(value):
+    return np.nan if value is None else value
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
@@ -0,0 +1,286 @@
+import datetime
+
+import numpy as np
+from pymongo import ASCENDING
+
+
+MANIFEST_ID = "nasa"
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_PAGE_SIZE = 5000
+# Largest radius a detections query may ask for
+MAX_RADIUS_KM = 500
+
+# VIIRS reports a class instead of a percentage; each counts as the lower
+# bound of the matching MODIS band (low < 30 <= nominal < 80 <= high)
+CONFIDENCE_CLASSES = {"l": 0.0, "low": 0.0, "n": 30.0, "nominal": 30.0, "h": 80.0, "high": 80.0}
+DURATION_UNITS = {"m": 1, "h": 60, "d": 1440}
+
+
+def ensure_detection_indexes(detections_collection):
+    """Indexes used by snapshot-scoped bbox/radius and date reads, and by pages in _id order."""
+    detections_collection.create_index([("snapshotId", ASCENDING), ("location", "2dsphere")])
+    detections_collection.create_index([("snapshotId", ASCENDING), ("_id", ASCENDING)])
+    detections_collection.create_index([("snapshotId", ASCENDING), ("acq_date", ASCENDING)])
+    detections_collection.create_index([("snapshotId", ASCENDING), ("acquiredAt", ASCENDING)])
+
+
+def parse_acquired_at(acq_date, acq_time):
+    """FIRMS acq_date ('2025-08-01') + acq_time ('130' / '0130', UTC) -> datetime, or None."""
+    if not acq_date:
+        return None
+    try:
+        hhmm = str(acq_time or "0").zfill(4)
+        return datetime.datetime.strptime(f"{acq_date} {hhmm}", "%Y-%m-%d %H%M")
+    except ValueError:
+        return None
+
+
+def parse_since(value, now=None):
+    """
+    `since` filter -> naive UTC datetime. Takes an ISO 8601 time
+    ('2025-08-01T12:00', UTC unless it has an offset) or a duration back
+    from now ('90m', '6h', '2d'). Raises ValueError otherwise.
+    """
+    text = value.strip()
+    if text[-1:].lower() in DURATION_UNITS and text[:-1].replace(".", "", 1).isdigit():
+        if now is None:
+            now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return now - datetime.timedelta(minutes=float(text[:-1]) * DURATION_UNITS[text[-1].lower()])
+    parsed = datetime.datetime.fromisoformat(text)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def confidence_score(value):
+    """FIRMS confidence on a 0-100 scale (see CONFIDENCE_CLASSES), or None."""
+    if value is None:
+        return None
+    text = str(value).strip().lower()
+    if text in CONFIDENCE_CLASSES:
+        return CONFIDENCE_CLASSES[text]
+    score = _to_float(text)
+    return score if score is not None and not np.isnan(score) else None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def detection_document(snapshot_id, feature):
+    """One NasaWildfireDetections document for a GeoJSON detection feature."""
+    properties = feature.get("properties") or {}
+    lon, lat = feature["geometry"]["coordinates"][:2]
+    return {
+        "snapshotId": snapshot_id,
+        "location": {"type": "Point", "coordinates": [lon, lat]},
+        "acq_date": properties.get("acq_date"),
+        "acq_time": properties.get("acq_time"),
+        "acquiredAt": parse_acquired_at(properties.get("acq_date"), properties.get("acq_time")),
+        "satellite": properties.get("satellite"),
+        "frp": _to_float(properties.get("frp")),
+        "confidence": confidence_score(properties.get("confidence")),
+        "properties": properties,  # Original FIRMS values, untouched
+    }
+
+
+def detection_to_feature(doc):
+    """Rebuild the original GeoJSON feature from a detection document."""
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Point",
+            "coordinates": doc["location"]["coordinates"]
+        },
+        "properties": doc.get("properties", {})
+    }
+
+
+def write_detections(detections_collection, snapshot_id, features, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Write one document per detection, in unordered `insert_many` batches.
+    Returns the number of documents written.
+    """
+    written = 0
+    batch = []
+    for feature in features:
+        batch.append(detection_document(snapshot_id, feature))
+        if len(batch) >= batch_size:
+            written += len(detections_collection.insert_many(batch, ordered=False).inserted_ids)
+            batch = []
+    if batch:
+        written += len(detections_collection.insert_many(batch, ordered=False).inserted_ids)
+    return written
+
+
+def publish_manifest(manifest_collection, snapshot_id, last_updated, detection_count, keep_snapshots=3):
+    """
+    Point the manifest at `snapshot_id` once its detections are fully written.
+    Returns the snapshot ids that are still retained (newest first).
+    """
+    manifest = manifest_collection.find_one({"_id": MANIFEST_ID}) or {}
+    recent = [snapshot_id] + [s for s in manifest.get("recentSnapshotIds", []) if s != snapshot_id]
+    recent = recent[:keep_snapshots]
+    manifest_collection.update_one(
+        {"_id": MANIFEST_ID},
+        {"$set": {
+            "snapshotId": snapshot_id,
+            "lastUpdated": last_updated,
+            "detectionCount": detection_count,
+            "recentSnapshotIds": recent
+        }},
+        upsert=True
+    )
+    return recent
+
+
+def current_manifest(manifest_collection):
+    return manifest_collection.find_one({"_id": MANIFEST_ID})
+
+
+def prune_detections(detections_collection, keep_snapshot_ids):
+    """Delete detections belonging to snapshots that are no longer retained."""
+    result = detections_collection.delete_many({"snapshotId": {"$nin": list(keep_snapshot_ids)}})
+    return result.deleted_count
+
+
+def validate_bbox(bbox):
+    """Raise ValueError unless bbox is [west, south, east, north] in range, west <= east and south <= north."""
+    west, south, east, north = bbox
+    if not all(np.isfinite(bbox)):
+        raise ValueError("bbox values must be finite")
+    if not (-180 <= west <= east <= 180 and -90 <= south <= north <= 90):
+        raise ValueError("bbox must be west,south,east,north within -180..180 and -90..90")
+
+
+def validate_circle(center, radius_km, max_radius_km=MAX_RADIUS_KM):
+    """Raise ValueError unless center is a finite [lon, lat] in range and 0 < radius_km <= max_radius_km."""
+    lon, lat = center
+    if not all(np.isfinite([lon, lat, radius_km])):
+        raise ValueError("lat, lon and radius_km must be finite")
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        raise ValueError("lon must be within -180..180 and lat within -90..90")
+    if not 0 < radius_km <= max_radius_km:
+        raise ValueError(f"radius_km must be greater than 0 and at most {max_radius_km}")
+
+
+def _edge_latitude(lat, half_step_degrees):
+    """
+    Latitude to put a polygon edge's vertices at so the great-circle arcs
+    between them (which bow poleward by up to atan(tan(lat) / cos(half_step))
+    at the midpoint) reach `lat` rather than cut inside it.
+    """
+    return float(np.degrees(np.arctan(np.tan(np.radians(lat)) * np.cos(np.radians(half_step_degrees)))))
+
+
+def _bbox_ring(west, south, east, north, step_degrees):
+    steps = max(1, int(np.ceil((east - west) / step_degrees)))
+    lons = np.linspace(west, east, steps + 1).tolist()
+    half_step = (east - west) / steps / 2
+    # Only an edge on the equator side of its arcs' bulge needs moving: the
+    # south edge north of the equator and the north edge south of it
+    south_vertex = _edge_latitude(south, half_step) if south > 0 else south
+    north_vertex = _edge_latitude(north, half_step) if north < 0 else north
+    ring = [[lon, south_vertex] for lon in lons] + [[lon, north_vertex] for lon in reversed(lons)]
+    ring.append(ring[0])
+    return ring
+
+
+def bbox_polygon(bbox, step_degrees=1.0):
+    """
+    GeoJSON polygon covering [west, south, east, north].
+
+    2dsphere queries treat polygon edges as great circles, which bow poleward
+    between vertices. The east-west edges are densified, and the edge whose
+    arcs would bow into the bbox has its vertices moved out by the sag, so
+    the polygon covers the whole bbox; callers still apply an exact bbox
+    check on the results. A bbox wider than 180 degrees of longitude becomes
+    a MultiPolygon, since Mongo would take the smaller complementary region
+    of a single ring that wide.
+    """
+    west, south, east, north = bbox
+    pieces = max(1, int(np.ceil((east - west) / 180)))
+    edges = np.linspace(west, east, pieces + 1).tolist()
+    rings = [_bbox_ring(w, south, e, north, step_degrees) for w, e in zip(edges[:-1], edges[1:])]
+    if len(rings) == 1:
+        return {"type": "Polygon", "coordinates": rings}
+    return {"type": "MultiPolygon", "coordinates": [[ring] for ring in rings]}
+
+
+def detection_query(snapshot_id, bbox=None, center=None, radius_km=None, since=None, min_confidence=None,
+                    min_frp=None):
+    """
+    Mongo filter for one snapshot's detections inside a bbox and/or radius,
+    acquired at or after `since`, with at least `min_confidence` (0-100) and
+    `min_frp` (MW).
+    """
+    query = {"snapshotId": snapshot_id}
+    if bbox is not None:
+        query["location"] = {"$geoWithin": {"$geometry": bbox_polygon(bbox)}}
+    if since is not None:
+        query["acquiredAt"] = {"$gte": since}
+    if min_confidence is not None:
+        query["confidence"] = {"$gte": min_confidence}
+    if min_frp is not None:
+        query["frp"] = {"$gte": min_frp}
+    if center is not None and radius_km is not None:
+        circle = {"$geoWithin": {"$centerSphere": [list(center), radius_km / 6371]}}
+        if "location" in query:
+            query = {"$and": [query, {"location": circle}]}
+        else:
+            query["location"] = circle
+    return query
+
+
+def find_detections(detections_collection, snapshot_id, bbox=None, center=None, radius_km=None, limit=0):
+    """
+    GeoJSON features for one snapshot's detections inside a bbox ([west, south,
+    east, north]) and/or within `radius_km` of `center` ([lon, lat]).
+    """
+    cursor = detections_collection.find(
+        detection_query(snapshot_id, bbox, center, radius_km),
+        {"_id": 0, "location": 1, "properties": 1}
+    )
+    if limit:
+        cursor = cursor.limit(limit)
+
+    features = []
+    for doc in cursor:
+        if bbox is not None:
+            lon, lat = doc["location"]["coordinates"][:2]
+            if not (bbox[0] <= lon <= bbox[2] and bbox[1] <= lat <= bbox[3]):
+                continue
+        features.append(detection_to_feature(doc))
+    return features
+
+
+def find_detection_page(detections_collection, snapshot_id, bbox=None, since=None, min_confidence=None, min_frp=None,
+                        after_id=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Up to `limit` detections of one snapshot matching the filters (see
+    detection_query), in the order they were written, starting after the
+    document `after_id`.
+
+    Returns:
+        (features, cursor) where cursor is the _id to pass as `after_id` for
+        the next page, or None after the last page
+    """
+    query = detection_query(snapshot_id, bbox, since=since, min_confidence=min_confidence, min_frp=min_frp)
+    if after_id is not None:
+        query = {"$and": [query, {"_id": {"$gt": after_id}}]}
+    # One extra document tells whether another page follows
+    docs = list(detections_collection.find(query, {"location": 1, "properties": 1}).sort("_id", ASCENDING).limit(limit + 1))
+    more = len(docs) > limit
+    docs = docs[:limit]
+
+    features = []
+    for doc in docs:
+        if bbox is not None:
+            lon, lat = doc["location"]["coordinates"][:2]
+            if not (bbox[0] <= lon <= bbox[2] and bbox[1] <= lat <= bbox[3]):
+                continue
+        features.append(detection_to_feature(doc))
+    return features, (docs[-1]["_id"] if more else None)
@@ -1,11 +1,12 @@
 import requests
-import csv
 import os 
-from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from pathlib import Path
-import math
-from .geo import cluster_geojson_points
+from .firms import parse_firms_csv
+from .changes import assign_ids, detection_keys, stable_ids
+from .geo import cluster_detections
 
 # Find .env.local file - try multiple locations
 current_file = Path(__file__)
@@ -40,73 +41,141 @@ OPENAQ_API_KEY = os.getenv("OPEN_AQ_API_KEY")
 # print(f"Script location: {current_file}")
 
 
-def fetch_nasa_geojson(map_key, source, bbox, days, enable_clustering=True, cluster_distance_km=5.0, return_both=False):
+def fetch_nasa_detections(map_key, source, bbox, days, chunk_size=64 * 1024, session=None):
+    """
+    Stream a FIRMS area CSV straight into FirmsDetections columns, without
+    buffering the response body or building a dict per row.
+    Pass a requests.Session to reuse its pooled connections.
+    """
     base_url = "https://firms.modaps.eosdis.nasa.gov/api/area/csv"
     coords = ",".join(map(str, bbox))  # [west, south, east, north]
     url = f"{base_url}/{map_key}/{source}/{coords}/{days}/"
     print(f"Fetching NASA data from: {url}")
     
-    original_features = []
-    response = requests.get(url, timeout=15)
+    http = session if session is not None else requests
+    response = http.get(url, timeout=15, stream=True)
 
     if not response.ok:
         raise RuntimeError(f"NASA API error: {response.status_code}")
     
-    f = StringIO(response.text.lstrip("\ufeff"))  # strip BOM if present
-    reader = csv.DictReader(f)
-
-    for row in reader:
-        try:
-            lat = float(row["latitude"])
-            lon = float(row["longitude"])
-            feature = {
-                "type": "Feature",
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [lon, lat]
-                },
-                "properties": {
-                    k: v for k, v in row.items() if k not in ["latitude", "longitude"]
-                }
+    try:
+        detections = parse_firms_csv(response.iter_content(chunk_size=chunk_size))
+    finally:
+        response.close()
+
+    print(f"Original features count: {len(detections)}")
+    return detections
+
+
+def fetch_nasa_sources(map_key, sources, bbox, days):
+    """
+    Fetch several FIRMS sources (e.g. VIIRS_SNPP_NRT, VIIRS_NOAA20_NRT,
+    MODIS_NRT) concurrently over one pooled session, so the wall time is
+    roughly that of the slowest source.
+
+    Returns:
+        {source: FirmsDetections} in `sources` order, leaving out sources that
+        failed. Raises RuntimeError if every source failed.
+    """
+    sources = list(sources)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, len(sources)))
+    session.mount("https://", adapter)
+    
+    results = {}
+    errors = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(sources)), thread_name_prefix="firms") as pool:
+            futures = {
+                source: pool.submit(fetch_nasa_detections, map_key, source, bbox, days, session=session)
+                for source in sources
             }
-            original_features.append(feature)
-        except (ValueError, KeyError) as e:
-            print("Skipping row:", row)
-            continue
+            for source, future in futures.items():
+                try:
+                    results[source] = future.result()
+                except Exception as e:
+                    print(f"⚠️ FIRMS source {source} failed: {e}")
+                    errors[source] = e
+    finally:
+        session.close()
+    
+    if sources and not results:
+        raise RuntimeError(f"All FIRMS sources failed: {errors}")
+    return results
 
-    print(f"Original features count: {len(original_features)}")
+
+def cluster_nasa_detections(detections, enable_clustering=True, cluster_distance_km=5.0, cluster_workers=None,
+                            clusterer=None):
+    """
+    Cluster fetched detections. Returns the clustered GeoJSON with the same
+    metadata keys as fetch_nasa_geojson(return_both=True), plus the columnar
+    `detections` in place of the original GeoJSON.
     
-    # Create original GeoJSON
-    original_geojson = {
-        "type": "FeatureCollection",
-        "features": original_features
-    }
+    Large pulls are clustered across `cluster_workers` processes (None = one
+    per CPU, 1 = in-process); the result is the same either way. With a
+    utils.incremental.IncrementalClusterer only the detections that changed
+    since its last run are re-clustered (reported as `reclustered_count`).
     
-    # Apply clustering if enabled
-    clustered_features = original_features.copy()
-    if enable_clustering and len(original_features) > 1:
-        clustered_features = cluster_geojson_points(original_features, cluster_distance_km)
+    Every clustered feature gets a GeoJSON `id` that stays the same across
+    refreshes while its seed detection does (see utils.changes).
+    """
+    original_count = len(detections)
+    reclustered_count = None
+    if enable_clustering and original_count > 1:
+        if clusterer is not None:
+            clustered_features = clusterer.cluster(detections, cluster_distance_km, workers=cluster_workers,
+                                                   with_ids=True)
+            reclustered_count = clusterer.last_stats["reclustered_count"]
+        else:
+            clustered_features = cluster_detections(detections, cluster_distance_km, workers=cluster_workers,
+                                                    with_ids=True)
         print(f"Clustered features count: {len(clustered_features)}")
-        reduction_percent = ((len(original_features) - len(clustered_features)) / len(original_features) * 100) if len(original_features) > 0 else 0
+        reduction_percent = ((original_count - len(clustered_features)) / original_count * 100) if original_count > 0 else 0
         print(f"Data reduction: {reduction_percent:.1f}% fewer points")
+    else:
+        clustered_features = detections.to_features()
+        assign_ids(clustered_features, stable_ids(detection_keys(detections, range(original_count))))
     
-    clustered_geojson = {
-        "type": "FeatureCollection",
-        "features": clustered_features
+    result = {
+        "detections": detections,
+        "clustered": {
+            "type": "FeatureCollection",
+            "features": clustered_features
+        },
+        "clustering_enabled": enable_clustering,
+        "cluster_distance_km": cluster_distance_km,
+        "original_count": original_count,
+        "clustered_count": len(clustered_features)
     }
+    if reclustered_count is not None:
+        result["reclustered_count"] = reclustered_count
+    return result
+
+
+def fetch_nasa_geojson(map_key, source, bbox, days, enable_clustering=True, cluster_distance_km=5.0, return_both=False,
+                       cluster_workers=None):
+    detections = fetch_nasa_detections(map_key, source, bbox, days)
+    result = cluster_nasa_detections(detections, enable_clustering, cluster_distance_km, cluster_workers)
     
     if return_both:
-        return {
-            "original": original_geojson,
-            "clustered": clustered_geojson,
-            "clustering_enabled": enable_clustering,
-            "cluster_distance_km": cluster_distance_km,
-            "original_count": len(original_features),
-            "clustered_count": len(clustered_features)
+        # GeoJSON for the original detections is only built when asked for
+        detections = result.pop("detections")
+        if result["clustered_count"] == result["original_count"]:
+            # Nothing was merged, so the clustered features are the originals (less their cluster ids)
+            original_features = [
+                {key: value for key, value in feature.items() if key != "id"}
+                for feature in result["clustered"]["features"]
+            ]
+        else:
+            original_features = detections.to_features()
+        result["original"] = {
+            "type": "FeatureCollection",
+            "features": original_features
         }
+        return result
     else:
         # Return clustered version for backward compatibility
-        return clustered_geojson
+        return result["clustered"]
 
 def _openaq_headers():
     print("=== OpenAQ Headers Debug ===")
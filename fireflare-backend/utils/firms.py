@@ -0,0 +1,408 @@
+import csv
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+
+from utils.calculate import haversine_pairs_within
+
+
+UTF8_BOM = b"\xef\xbb\xbf"
+COORDINATE_COLUMNS = ("latitude", "longitude")
+DEFAULT_FEATURE_BATCH = 5000
+
+# Comma-joined columns that features expose as lists
+LIST_COLUMNS = ("satellites",)
+
+# Satellite names per FIRMS source; MODIS rows name Terra/Aqua in their own column
+SOURCE_SATELLITES = {
+    "VIIRS_SNPP_NRT": "Suomi NPP",
+    "VIIRS_SNPP_SP": "Suomi NPP",
+    "VIIRS_NOAA20_NRT": "NOAA-20",
+    "VIIRS_NOAA20_SP": "NOAA-20",
+    "VIIRS_NOAA21_NRT": "NOAA-21",
+}
+MODIS_SATELLITES = {b"T": "Terra", b"A": "Aqua", b"Terra": "Terra", b"Aqua": "Aqua"}
+
+# Two sensors' detections of one fire pixel: close in space and in overpass time
+DEFAULT_DEDUP_DISTANCE_KM = 0.5
+DEFAULT_DEDUP_WINDOW_MINUTES = 60
+
+
+@dataclass
+class FirmsDetections:
+    """
+    NASA FIRMS detections held as columns instead of one dict per row.
+
+    `columns` keeps every non-coordinate CSV column as raw bytes, in file order,
+    so GeoJSON features rebuilt from it match what the CSV said exactly. The
+    typed arrays are what clustering and storage compute on; unparseable
+    values become NaN / NaT / -1.
+
+    Behaves like a read-only sequence of GeoJSON features: `len()`, indexing
+    and iteration build feature dicts on demand. `absent` marks rows that never
+    had a column (merged sensors report different columns); those rows leave
+    the property out.
+    """
+    lat: np.ndarray
+    lon: np.ndarray
+    columns: Dict[str, np.ndarray]
+    absent: Dict[str, np.ndarray] = field(default_factory=dict)
+    brightness: np.ndarray = field(init=False)
+    frp: np.ndarray = field(init=False)
+    confidence: np.ndarray = field(init=False)
+    acq_date: np.ndarray = field(init=False)
+    acq_time: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        n = len(self.lat)
+        # VIIRS reports bright_ti4, MODIS reports brightness
+        self.brightness = _float_column(self.columns.get("bright_ti4"), n)
+        if "brightness" in self.columns:
+            modis = _float_column(self.columns["brightness"], n)
+            self.brightness = np.where(np.isnan(self.brightness), modis, self.brightness)
+        self.frp = _float_column(self.columns.get("frp"), n)
+        self.confidence = self.columns.get("confidence", np.full(n, b"", dtype="S1"))
+        self.acq_date = _date_column(self.columns.get("acq_date"), n)
+        self.acq_time = _int_column(self.columns.get("acq_time"), n, dtype=np.int16)
+
+    @classmethod
+    def from_features(cls, features) -> "FirmsDetections":
+        """
+        Columns back from GeoJSON features these detections produced (e.g. a
+        stored snapshot's originals), property order and missing properties
+        included.
+        """
+        names = {}
+        for feature in features:
+            for name in feature.get("properties") or {}:
+                names.setdefault(name, None)
+        lons, lats = [], []
+        values = {name: [] for name in names}
+        absent = {name: [] for name in names}
+        for feature in features:
+            lon, lat = feature["geometry"]["coordinates"][:2]
+            lons.append(lon)
+            lats.append(lat)
+            properties = feature.get("properties") or {}
+            for name in names:
+                value = properties.get(name)
+                absent[name].append(name not in properties)
+                if isinstance(value, list):
+                    value = ",".join(value)
+                values[name].append(b"" if value is None else str(value).encode("utf-8"))
+        return cls(
+            lat=np.array(lats, dtype=np.float64),
+            lon=np.array(lons, dtype=np.float64),
+            columns={name: np.array(column, dtype=bytes) if column else np.empty(0, dtype="S1")
+                     for name, column in values.items()},
+            absent={name: np.array(mask) for name, mask in absent.items() if any(mask)}
+        )
+
+    def __len__(self):
+        return len(self.lat)
+
+    def __getitem__(self, index):
+        index = int(index)
+        properties = {
+            name: _decode(name, values[index]) for name, values in self.columns.items()
+            if name not in self.absent or not self.absent[name][index]
+        }
+        return _point_feature(float(self.lon[index]), float(self.lat[index]), properties)
+
+    def __iter__(self):
+        return self.iter_features()
+
+    def iter_features(self, batch_size=DEFAULT_FEATURE_BATCH) -> Iterator[Dict]:
+        """GeoJSON features in file order, decoded `batch_size` rows at a time."""
+        names = list(self.columns)
+        for start in range(0, len(self), batch_size):
+            stop = start + batch_size
+            lons = self.lon[start:stop].tolist()
+            lats = self.lat[start:stop].tolist()
+            decoded = [[_decode(name, v) for v in self.columns[name][start:stop].tolist()] for name in names]
+            if not self.absent:
+                for k in range(len(lons)):
+                    yield _point_feature(lons[k], lats[k], {name: decoded[c][k] for c, name in enumerate(names)})
+                continue
+            absent = [self.absent[name][start:stop].tolist() if name in self.absent else None for name in names]
+            for k in range(len(lons)):
+                properties = {
+                    name: decoded[c][k] for c, name in enumerate(names)
+                    if absent[c] is None or not absent[c][k]
+                }
+                yield _point_feature(lons[k], lats[k], properties)
+
+    def to_features(self) -> List[Dict]:
+        return list(self.iter_features())
+
+    def take(self, indices) -> "FirmsDetections":
+        """The detections at `indices` (an index array or boolean mask), in that order."""
+        return FirmsDetections(
+            lat=self.lat[indices],
+            lon=self.lon[indices],
+            columns={name: values[indices] for name, values in self.columns.items()},
+            absent={name: mask[indices] for name, mask in self.absent.items()}
+        )
+
+    def acquired_minutes(self) -> np.ndarray:
+        """Acquisition time as minutes since the epoch (UTC); NaN when unknown."""
+        days = self.acq_date.astype("datetime64[D]").astype(np.float64)
+        days[np.isnat(self.acq_date)] = np.nan
+        hhmm = self.acq_time.astype(np.float64)
+        hhmm[self.acq_time < 0] = np.nan
+        return days * 1440 + (hhmm // 100) * 60 + hhmm % 100
+
+    def acquisition_keys(self) -> np.ndarray:
+        """'<acq_date> <acq_time>' per row as bytes (b'' when both are missing)."""
+        n = len(self)
+        empty = np.full(n, b"", dtype="S1")
+        dates = self.columns.get("acq_date", empty)
+        times = self.columns.get("acq_time", empty)
+        keys = np.char.add(np.char.add(dates, b" "), times)
+        return np.char.strip(keys)
+
+
+def _decode(name, value):
+    text = value.decode("utf-8")
+    if name in LIST_COLUMNS:
+        return text.split(",") if text else []
+    return text
+
+
+def _point_feature(lon, lat, properties):
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Point",
+            "coordinates": [lon, lat]
+        },
+        "properties": properties
+    }
+
+
+def _float_column(raw, n):
+    if raw is None:
+        return np.full(n, np.nan)
+    try:
+        return raw.astype(np.float64)
+    except ValueError:
+        return np.array([_to_float(v) for v in raw.tolist()], dtype=np.float64)
+
+
+def _int_column(raw, n, dtype=np.int64):
+    if raw is None:
+        return np.full(n, -1, dtype=dtype)
+    try:
+        return raw.astype(dtype)
+    except ValueError:
+        return np.array([_to_int(v) for v in raw.tolist()], dtype=dtype)
+
+
+def _date_column(raw, n):
+    if raw is None:
+        return np.full(n, np.datetime64("NaT"), dtype="datetime64[D]")
+    try:
+        return raw.astype("U").astype("datetime64[D]")
+    except ValueError:
+        return np.array([_to_date(v) for v in raw.tolist()], dtype="datetime64[D]")
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+def _to_date(value):
+    try:
+        return np.datetime64(value.decode("utf-8"), "D")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def _split_line(line):
+    # FIRMS area CSVs are unquoted; only fall back to the csv module when needed
+    if b'"' not in line:
+        return line.split(b",")
+    return [value.encode("utf-8") for value in next(csv.reader([line.decode("utf-8")]))]
+
+
+def parse_firms_csv(chunks: Iterable[bytes]) -> FirmsDetections:
+    """
+    Parse a FIRMS CSV from an iterable of byte chunks (e.g. `response.iter_content()`)
+    into FirmsDetections without holding the whole body or per-row dicts.
+
+    Rows whose latitude/longitude don't parse, or whose field count doesn't
+    match the header, are skipped.
+    """
+    header = None
+    blocks = {}   # column name -> list of per-chunk arrays
+    carry = b""
+    skipped = 0
+
+    def consume(lines):
+        nonlocal header, skipped
+        rows = []
+        for line in lines:
+            line = line.rstrip(b"\r")
+            if not line:
+                continue
+            if header is None:
+                header = [name.decode("utf-8").strip() for name in _split_line(line.removeprefix(UTF8_BOM))]
+                for name in header:
+                    blocks[name] = []
+                continue
+            fields = _split_line(line)
+            if len(fields) != len(header):
+                print("Skipping row:", line[:200])
+                skipped += 1
+                continue
+            rows.append(fields)
+
+        if not rows or header is None:
+            return
+        chunk_columns = {name: np.array(values, dtype=bytes) for name, values in zip(header, zip(*rows))}
+        if not all(name in chunk_columns for name in COORDINATE_COLUMNS):
+            skipped += len(rows)
+            return
+
+        chunk_columns["latitude"] = _float_column(chunk_columns["latitude"], len(rows))
+        chunk_columns["longitude"] = _float_column(chunk_columns["longitude"], len(rows))
+        valid = ~(np.isnan(chunk_columns["latitude"]) | np.isnan(chunk_columns["longitude"]))
+        if not valid.all():
+            for k in np.flatnonzero(~valid).tolist():
+                print("Skipping row:", b",".join(rows[k])[:200])
+            skipped += int((~valid).sum())
+            chunk_columns = {name: values[valid] for name, values in chunk_columns.items()}
+        for name, values in chunk_columns.items():
+            blocks[name].append(values)
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        lines = (carry + chunk).split(b"\n")
+        carry = lines.pop()
+        consume(lines)
+    consume([carry])
+
+    if skipped:
+        print(f"Skipped {skipped} malformed FIRMS rows")
+
+    columns = {}
+    for name in header or []:
+        # Drop each column's chunks as soon as it is joined to keep the peak low
+        parts = blocks.pop(name)
+        columns[name] = np.concatenate(parts) if parts else np.empty(0, dtype="S1")
+        del parts
+    lat = columns.pop("latitude", np.empty(0))
+    lon = columns.pop("longitude", np.empty(0))
+    if len(lat) == 0:
+        columns = {name: np.empty(0, dtype="S1") for name in columns}
+    return FirmsDetections(lat=lat.astype(np.float64), lon=lon.astype(np.float64), columns=columns)
+
+
+def _satellite_labels(source, detections):
+    if source in SOURCE_SATELLITES:
+        return np.full(len(detections), SOURCE_SATELLITES[source].encode("utf-8"))
+    satellite = detections.columns.get("satellite")
+    if satellite is None:
+        return np.full(len(detections), source.encode("utf-8"))
+    return np.array([MODIS_SATELLITES.get(v, v.decode("utf-8") or source).encode("utf-8") for v in satellite.tolist()])
+
+
+def merge_detections(parts: Dict[str, FirmsDetections],
+                     distance_km=DEFAULT_DEDUP_DISTANCE_KM,
+                     window_minutes=DEFAULT_DEDUP_WINDOW_MINUTES) -> FirmsDetections:
+    """
+    Merge detections from several FIRMS sources into one set, collapsing
+    cross-sensor duplicates of the same fire pixel.
+
+    Sources are ranked in `parts` order. Two detections are duplicates when
+    they come from different sources, lie within `distance_km` and were
+    acquired within `window_minutes` of each other. Each kept detection
+    absorbs at most one duplicate per other source, preferring the closest,
+    and lists every contributing satellite in its "satellites" column.
+    """
+    parts = [(source, detections) for source, detections in parts.items()]
+    names = []
+    for _, detections in parts:
+        names.extend(name for name in detections.columns if name not in names)
+
+    columns = {}
+    absent = {}
+    for name in names:
+        values = []
+        missing = []
+        for _, detections in parts:
+            n = len(detections)
+            if name in detections.columns:
+                values.append(detections.columns[name])
+                missing.append(detections.absent.get(name, np.zeros(n, dtype=bool)))
+            else:
+                values.append(np.full(n, b"", dtype="S1"))
+                missing.append(np.ones(n, dtype=bool))
+        columns[name] = np.concatenate(values) if values else np.empty(0, dtype="S1")
+        missing = np.concatenate(missing) if missing else np.empty(0, dtype=bool)
+        if missing.any():
+            absent[name] = missing
+
+    source_codes = np.concatenate([np.full(len(d), code, dtype=np.int16) for code, (_, d) in enumerate(parts)] or [np.empty(0, dtype=np.int16)])
+    labels = np.concatenate([_satellite_labels(source, d) for source, d in parts] or [np.empty(0, dtype="S1")])
+    merged = FirmsDetections(
+        lat=np.concatenate([d.lat for _, d in parts] or [np.empty(0)]),
+        lon=np.concatenate([d.lon for _, d in parts] or [np.empty(0)]),
+        columns=columns,
+        absent=absent
+    )
+
+    keep, satellites = _dedupe_across_sources(merged, source_codes, labels, distance_km, window_minutes)
+    result = merged.take(keep)
+    result.columns["satellites"] = satellites
+    print(f"Merged {len(merged)} detections from {len(parts)} sources into {len(result)} "
+          f"({len(merged) - len(result)} cross-sensor duplicates)")
+    return result
+
+
+def _dedupe_across_sources(merged, source_codes, labels, distance_km, window_minutes):
+    """Greedy cross-source matching over the indexed candidate pairs. Returns (keep, satellites)."""
+    n = len(merged)
+    i, j, d = haversine_pairs_within(merged.lat, merged.lon, distance_km)
+    minutes = merged.acquired_minutes()
+    candidate = (source_codes[i] != source_codes[j]) & (np.abs(minutes[i] - minutes[j]) <= window_minutes)
+    i, j, d = i[candidate], j[candidate], d[candidate]
+    # Pairs are (i < j): the earlier row always comes from an equal or higher-ranked source
+    order = np.lexsort((d, i))
+
+    owner = np.arange(n)
+    absorbed = np.zeros(n, dtype=bool)
+    group_sources = {}
+    for a, b in zip(i[order].tolist(), j[order].tolist()):
+        if absorbed[a] or absorbed[b]:
+            continue
+        seen = group_sources.setdefault(a, {int(source_codes[a])})
+        if int(source_codes[b]) in seen:
+            continue
+        seen.add(int(source_codes[b]))
+        owner[b] = a
+        absorbed[b] = True
+
+    keep = np.flatnonzero(~absorbed)
+    members = {}
+    for b in np.flatnonzero(absorbed).tolist():
+        members.setdefault(int(owner[b]), []).append(b)
+
+    label_list = labels.tolist()
+    satellites = []
+    for k in keep.tolist():
+        group = [label_list[k]] + [label_list[b] for b in sorted(members.get(k, []), key=lambda b: source_codes[b])]
+        satellites.append(b",".join(dict.fromkeys(group)))
+    return keep, np.array(satellites, dtype=bytes) if satellites else np.empty(0, dtype="S1")
@@ -7,8 +7,15 @@ import math
 # def convert_csv_to_geojson(csv_path, geojson_path):
 
 from dataclasses import dataclass
-from utils.calculate import haversine_distance
+import numpy as np
+from utils.aggregate import (
+    CATEGORICAL_CLUSTER_PROPS, NUMERIC_CLUSTER_PROPS, aggregate_clusters, aggregate_detection_clusters
+)
+# haversine_distance is re-exported for callers that import it from here
+from utils.calculate import KM_PER_DEGREE_LAT, haversine_distance, haversine_one_to_many, lon_reach_degrees
+from utils.changes import assign_ids, detection_keys, stable_ids
 from utils.boundaries import WILDFIRE_ZONES
+from utils.spatial import GridIndex
 
 @dataclass
 class GridPoint:
@@ -18,13 +25,15 @@ class GridPoint:
     spacing_km: int
     priority: int
 
-def cluster_geojson_points(features, cluster_distance_km=5.0):
+def cluster_geojson_points(features, cluster_distance_km=5.0, workers=None):
     """
     Cluster nearby GeoJSON points together to reduce data size.
     
     Args:
         features: List of GeoJSON features with Point geometries
         cluster_distance_km: Distance threshold in kilometers for clustering
+        workers: Processes for large inputs (None = one per CPU, 1 = in-process);
+            see utils.tiling.tiled_cluster_indices
     
     Returns:
         List of clustered features with aggregated properties
@@ -32,40 +41,88 @@ def cluster_geojson_points(features, cluster_distance_km=5.0):
     if not features:
         return features
     
+    lats = [f["geometry"]["coordinates"][1] for f in features]
+    lons = [f["geometry"]["coordinates"][0] for f in features]
+    
+    groups = _cluster_indices(lats, lons, cluster_distance_km, workers)
+    
+    # Multiple points become one cluster feature, aggregated in a single pass
+    merged = iter(aggregate_clusters(features, [members for members in groups if len(members) > 1]))
+    # Single points need no clustering
+    return [features[members[0]] if len(members) == 1 else next(merged) for members in groups]
+
+def cluster_detections(detections, cluster_distance_km=5.0, workers=None, with_ids=False):
+    """
+    cluster_geojson_points for FirmsDetections: clusters straight from the
+    lat/lon columns and only builds feature dicts for the clustered output.
+    With `with_ids` each cluster also gets a GeoJSON `id` derived from its
+    seed detection, so it keeps that id across snapshots (see utils.changes).
+    """
+    groups = _cluster_indices(detections.lat.tolist(), detections.lon.tolist(), cluster_distance_km, workers)
+    singles = detections.take([members[0] for members in groups if len(members) == 1]).iter_features()
+    merged = iter(aggregate_detection_clusters(detections, [members for members in groups if len(members) > 1]))
+    clustered = [next(singles) if len(members) == 1 else next(merged) for members in groups]
+    if with_ids:
+        assign_ids(clustered, stable_ids(detection_keys(detections, [members[0] for members in groups])))
+    return clustered
+
+def _cluster_indices(lats, lons, cluster_distance_km, workers):
+    # utils.tiling builds on cluster_point_indices, so it is imported late
+    from utils.tiling import tiled_cluster_indices
+    return tiled_cluster_indices(lats, lons, cluster_distance_km, workers=workers)
+
+def cluster_point_indices(lats, lons, cluster_distance_km=5.0):
+    """
+    Greedy distance clustering over parallel lat/lon sequences.
+    
+    Points are visited in order; each unclustered point seeds a cluster that
+    takes every remaining point within `cluster_distance_km` of the seed.
+    Neighbours are looked up through a lat/lon grid hash sized from the
+    threshold, so only nearby cells are scanned instead of every point.
+    
+    Returns:
+        List of clusters in seed order, each a list of point indices in
+        ascending order (the seed first).
+    """
+    reach_km = max(cluster_distance_km, 0.0)
+    # Pad the reach slightly so float rounding can never drop a true neighbour;
+    # the exact haversine check below still decides membership.
+    lat_reach = reach_km / KM_PER_DEGREE_LAT * (1 + 1e-9) + 1e-12
+    grid = GridIndex(max(lat_reach, 1e-6))
+    for idx in range(len(lats)):
+        grid.insert(idx, lons[idx], lats[idx])
+    
+    lat_arr = np.asarray(lats, dtype=float)
+    lon_arr = np.asarray(lons, dtype=float)
     clusters = []
-    used_indices = set()
+    used = [False] * len(lats)
     
-    for i, feature in enumerate(features):
-        if i in used_indices:
+    for i in range(len(lats)):
+        if used[i]:
             continue
-            
-        # Start a new cluster with this feature
-        cluster_features = [feature]
-        used_indices.add(i)
         
-        lat1 = feature["geometry"]["coordinates"][1]
-        lon1 = feature["geometry"]["coordinates"][0]
+        # Start a new cluster with this point
+        members = [i]
+        used[i] = True
+        grid.remove(i, lons[i], lats[i])
         
-        # Find all nearby features to add to this cluster
-        for j, other_feature in enumerate(features):
-            if j in used_indices:
-                continue
-                
-            lat2 = other_feature["geometry"]["coordinates"][1]
-            lon2 = other_feature["geometry"]["coordinates"][0]
-            
-            if haversine_distance(lat1, lon1, lat2, lon2) <= cluster_distance_km:
-                cluster_features.append(other_feature)
-                used_indices.add(j)
+        lat1 = lat_arr[i]
+        lon1 = lon_arr[i]
+        lon_reach = lon_reach_degrees(lat1, reach_km) * (1 + 1e-9) + 1e-12
+        
+        # Find all nearby points to add to this cluster, in one distance call
+        candidates = grid.query(lon1, lat1, lon_reach, lat_reach)
+        if not candidates:
+            clusters.append(members)
+            continue
+        candidates = np.array(sorted(candidates))
+        distances = haversine_one_to_many(lat1, lon1, lat_arr[candidates], lon_arr[candidates])
+        for j in candidates[distances <= cluster_distance_km].tolist():
+            members.append(j)
+            used[j] = True
+            grid.remove(j, lons[j], lats[j])
         
-        # Create clustered feature
-        if len(cluster_features) == 1:
-            # Single point, no clustering needed
-            clusters.append(cluster_features[0])
-        else:
-            # Multiple points, create cluster
-            cluster = create_cluster_feature(cluster_features)
-            clusters.append(cluster)
+        clusters.append(members)
     
     return clusters
 
@@ -73,6 +130,10 @@ def create_cluster_feature(features):
     """
     Create a single clustered feature from multiple nearby features.
     Uses centroid for coordinates and aggregates properties.
+    
+    For many clusters at once use utils.aggregate.aggregate_clusters, which
+    gives the same features (sums may differ in the last bits) without a
+    Python pass per cluster and property.
     """
     if len(features) == 1:
         return features[0]
@@ -90,8 +151,7 @@ def create_cluster_feature(features):
     }
     
     # For numeric properties, calculate averages
-    numeric_props = ["brightness", "bright_t31", "frp", "confidence"]
-    for prop in numeric_props:
+    for prop in NUMERIC_CLUSTER_PROPS:
         values = []
         for feature in features:
             if prop in feature["properties"]:
@@ -106,8 +166,7 @@ def create_cluster_feature(features):
             cluster_properties[f"min_{prop}"] = round(min(values), 2)
     
     # For categorical properties, collect unique values
-    categorical_props = ["satellite", "instrument", "version", "track", "type"]
-    for prop in categorical_props:
+    for prop in CATEGORICAL_CLUSTER_PROPS:
         unique_values = set()
         for feature in features:
             if prop in feature["properties"] and feature["properties"][prop]:
@@ -0,0 +1,137 @@
+import json
+import math
+
+from utils.pbf import PbfWriter
+
+
+GEOBUF_MIMETYPE = "application/x-protobuf"
+# Coordinates are stored as integers in units of 10^-precision degrees (~0.1 m at 6)
+DEFAULT_PRECISION = 6
+# Integers past this lose precision in JavaScript decoders, so they go out as doubles
+MAX_SAFE_INTEGER = 2 ** 53
+
+GEOMETRY_TYPES = {"Point": 0, "MultiPoint": 1, "LineString": 2}
+
+
+def encode_geobuf(collection, precision=DEFAULT_PRECISION):
+    """
+    Encode a GeoJSON FeatureCollection as Geobuf (github.com/mapbox/geobuf),
+    readable with geobuf.decode(new Pbf(buffer)) on the client.
+
+    Property keys are written once in a shared key table instead of on every
+    feature, and coordinates as quantized integers (delta encoded along a
+    line). Values keep their JSON type: FIRMS properties stay strings, lists
+    and nulls are sent as JSON text, as geobuf does. Members of the collection
+    besides "type" and "features" are kept as geobuf custom properties.
+
+    Known gap: after gzip this is only 7-12% smaller than GeoJSON for FIRMS
+    pulls, because the measurements (bright_ti4, frp, acq_time, ...) are text
+    either way. Sending them as geobuf doubles made the gzipped payload ~1.5%
+    larger (double mantissas compress worse than short decimal strings).
+    Doing better needs a column-oriented format with its own mimetype and
+    client decoder (e.g. Arrow IPC or FlatGeobuf), not a change here.
+
+    Only point and line geometries occur in the wildfire and AQI payloads;
+    other geometry types raise ValueError.
+    """
+    keys = {}
+    value_memo = {}
+    scale = 10 ** precision
+    features = PbfWriter()
+    for feature in collection.get("features", []):
+        features.field_message(1, _feature_message(feature, keys, value_memo, scale))
+    # Other top-level members (e.g. "metadata") travel as custom properties
+    indexes = []
+    for k, (key, value) in enumerate((key, value) for key, value in collection.items()
+                                     if key not in ("type", "features")):
+        keys.setdefault(key, len(keys))
+        features.buf += _value_field(value, value_memo)
+        indexes += (keys[key], k)
+    if indexes:
+        features.field_packed_varints(15, indexes)
+
+    data = PbfWriter()
+    for key in keys:
+        data.field_string(1, key)
+    if precision != DEFAULT_PRECISION:
+        data.field_varint(3, precision)
+    data.field_message(4, features)
+    return data.getvalue()
+
+
+def _feature_message(feature, keys, value_memo, scale):
+    message = PbfWriter()
+    message.field_message(1, _geometry_message(feature["geometry"], scale))
+
+    feature_id = feature.get("id")
+    if isinstance(feature_id, int) and not isinstance(feature_id, bool):
+        message.field_sint(12, feature_id)
+    elif feature_id is not None:
+        message.field_string(11, str(feature_id))
+
+    indexes = []
+    for k, (key, value) in enumerate((feature.get("properties") or {}).items()):
+        if key not in keys:
+            keys[key] = len(keys)
+        message.buf += _value_field(value, value_memo)
+        indexes += (keys[key], k)
+    if indexes:
+        message.field_packed_varints(14, indexes)
+    return message
+
+
+def _geometry_message(geometry, scale):
+    geometry_type = geometry["type"]
+    if geometry_type not in GEOMETRY_TYPES:
+        raise ValueError(f"Geobuf encoding does not support {geometry_type} geometries")
+    message = PbfWriter()
+    message.field_varint(1, GEOMETRY_TYPES[geometry_type])
+    coordinates = geometry["coordinates"]
+    if geometry_type == "Point":
+        coords = [round(c * scale) for c in coordinates[:2]]
+    else:
+        # Each position is stored relative to the one before it
+        coords = []
+        previous = (0, 0)
+        for position in coordinates:
+            point = (round(position[0] * scale), round(position[1] * scale))
+            coords += (point[0] - previous[0], point[1] - previous[1])
+            previous = point
+    message.field_packed_sints(3, coords)
+    return message
+
+
+def _value_field(value, memo):
+    """Field 13 (one of the feature's `values`) for a property value; repeated values reuse their bytes."""
+    try:
+        # Typed, so True, 1 and 1.0 get separate entries
+        cache_key = (type(value), value)
+        encoded = memo.get(cache_key)
+    except TypeError:
+        # Lists and dicts are not hashable
+        return _encode_value_field(value)
+    if encoded is None:
+        encoded = memo[cache_key] = _encode_value_field(value)
+    return encoded
+
+
+def _encode_value_field(value):
+    message = PbfWriter()
+    if isinstance(value, str):
+        message.field_string(1, value)
+    elif isinstance(value, bool):
+        message.field_bool(5, value)
+    elif isinstance(value, (int, float)):
+        if isinstance(value, float) and not (math.isfinite(value) and value.is_integer()) \
+                or abs(value) >= MAX_SAFE_INTEGER:
+            message.field_double(2, value)
+        elif value >= 0:
+            message.field_varint(3, int(value))
+        else:
+            message.field_varint(4, -int(value))
+    else:
+        # Lists, dicts and null, as geobuf.js does
+        message.field_string(6, json.dumps(value, separators=(",", ":")))
+    field = PbfWriter()
+    field.field_message(13, message)
+    return field.getvalue()
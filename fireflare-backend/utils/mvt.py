@@ -0,0 +1,120 @@
+import numpy as np
+
+from utils.pbf import PbfWriter, zigzag
+from utils.pyramid import cluster_to_feature
+
+
+MVT_VERSION = 2
+GEOM_POINT = 1
+CMD_MOVE_TO = 1
+
+
+def tile_bounds(z, x, y):
+    """Web Mercator [0, 1] bounds (min_x, min_y, max_x, max_y) of tile z/x/y."""
+    scale = 2 ** z
+    return x / scale, y / scale, (x + 1) / scale, (y + 1) / scale
+
+
+def encode_wildfire_tile(pyramid, z, x, y, extent=4096, buffer=64, layer_name="wildfires"):
+    """
+    Encode the clusters/detections that fall in tile z/x/y as a Mapbox Vector Tile.
+
+    Uses the pyramid level for zoom `z`, so low zooms carry cluster summaries
+    and zooms past the pyramid's max zoom carry raw NASA detections.
+
+    Args:
+        pyramid: ClusterPyramid for the snapshot
+        z, x, y: Tile coordinates
+        extent: Tile coordinate extent
+        buffer: Extra margin (in tile units) so symbols at tile edges are not clipped
+
+    Returns:
+        Protobuf-encoded tile bytes (empty when the tile has no features)
+    """
+    level = pyramid.level_for_zoom(z)
+    min_x, min_y, max_x, max_y = tile_bounds(z, x, y)
+    pad = (max_x - min_x) * buffer / extent
+
+    mask = (
+        (level.x >= min_x - pad) & (level.x <= max_x + pad) &
+        (level.y >= min_y - pad) & (level.y <= max_y + pad)
+    )
+    selected = np.flatnonzero(mask)
+    if selected.size == 0:
+        return b""
+
+    scale = 2 ** z
+    tile_x = np.round((level.x[selected] * scale - x) * extent).astype(np.int64).tolist()
+    tile_y = np.round((level.y[selected] * scale - y) * extent).astype(np.int64).tolist()
+
+    layer = _LayerBuilder(layer_name, extent)
+    for k, px, py in zip(selected.tolist(), tile_x, tile_y):
+        feature = cluster_to_feature(pyramid, level, k)
+        layer.add_point(int(level.ids[k]), px, py, feature["properties"])
+
+    tile = PbfWriter()
+    tile.field_message(3, layer.finish())
+    return tile.getvalue()
+
+
+class _LayerBuilder:
+    def __init__(self, name, extent):
+        self.name = name
+        self.extent = extent
+        self.features = PbfWriter()
+        self.keys = {}
+        self.values = {}
+
+    def _key_index(self, key):
+        if key not in self.keys:
+            self.keys[key] = len(self.keys)
+        return self.keys[key]
+
+    def _value_index(self, value):
+        if isinstance(value, (list, tuple)):
+            value = ",".join(str(v) for v in value)
+        # bool is an int subclass, so tag the type to keep True and 1 apart
+        key = (type(value).__name__, value)
+        if key not in self.values:
+            self.values[key] = len(self.values)
+        return self.values[key]
+
+    def add_point(self, feature_id, px, py, properties):
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            tags.append(self._key_index(key))
+            tags.append(self._value_index(value))
+
+        feature = PbfWriter()
+        feature.field_varint(1, feature_id)
+        feature.field_packed_varints(2, tags)
+        feature.field_varint(3, GEOM_POINT)
+        feature.field_packed_varints(4, [(CMD_MOVE_TO & 0x7) | (1 << 3), zigzag(px), zigzag(py)])
+        self.features.field_message(2, feature)
+
+    def finish(self):
+        layer = PbfWriter()
+        layer.field_varint(15, MVT_VERSION)
+        layer.field_string(1, self.name)
+        layer.buf += self.features.buf
+        for key in self.keys:
+            layer.field_string(3, key)
+        for (_, value) in self.values:
+            layer.field_message(4, _encode_value(value))
+        layer.field_varint(5, self.extent)
+        return layer
+
+
+def _encode_value(value):
+    message = PbfWriter()
+    if isinstance(value, bool):
+        message.field_bool(7, value)
+    elif isinstance(value, int):
+        message.field_sint(6, value)
+    elif isinstance(value, float):
+        message.field_double(3, value)
+    else:
+        message.field_string(1, str(value))
+    return message
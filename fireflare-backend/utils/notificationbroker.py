@@ -0,0 +1,333 @@
+import datetime
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import uuid
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import OperationFailure, PyMongoError
+
+
+# Recipients per NotificationEvents document, keeping huge alerts well under the 16 MB document limit
+EVENT_CHUNK_SIZE = 5000
+# Event documents only need to outlive a reconnect (see MongoChangeStreamBroker and find_missed_events)
+EVENT_TTL_SECONDS = 24 * 3600
+# Most events a reconnect is sent from the events collection
+MAX_REPLAY_EVENTS = 500
+# Publishes SocketBroker holds for the relay while it is unreachable; later ones are dropped
+MAX_PENDING_FORWARDS = 1000
+DEFAULT_SOCKET_ADDRESS = "127.0.0.1:8765"
+
+
+def _utcnow():
+    # Naive UTC, which is what pymongo stores and returns by default
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _origin():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def ensure_event_indexes(collection):
+    collection.create_index("createdAt", expireAfterSeconds=EVENT_TTL_SECONDS)
+    # Last-Event-ID replay: one user's events in publish order
+    collection.create_index([("userIDs", 1), ("createdAt", 1), ("_id", 1)])
+
+
+def find_missed_events(collection, user_id, last_event_id, limit=MAX_REPLAY_EVENTS):
+    """
+    (event id, message) pairs published to `user_id` after `last_event_id`,
+    oldest first. An id that is not one of ours replays nothing.
+
+    Events are ordered by createdAt, then _id: ObjectIds from different
+    processes are not ordered by publish time. (Hosts' clocks are assumed to
+    be in sync.) An event that already expired replays from the time in its
+    ObjectId.
+    """
+    try:
+        after = ObjectId(last_event_id)
+    except (InvalidId, TypeError):
+        return []
+    last = collection.find_one({"_id": after}, {"createdAt": 1})
+    since = last["createdAt"] if last else after.generation_time.replace(tzinfo=None)
+    cursor = collection.find(
+        {"userIDs": user_id, "$or": [{"createdAt": {"$gt": since}}, {"createdAt": since, "_id": {"$gt": after}}]},
+        {"event": 1}
+    ).sort([("createdAt", 1), ("_id", 1)]).limit(limit)
+    return [(str(event["_id"]), event["event"]) for event in cursor]
+
+
+class InMemoryBroker:
+    """
+    Pub/sub within one process: a publish goes straight to the local
+    subscribers. Enough for a single worker and for tests.
+
+    Every publish gets an event id (an ObjectId per EVENT_CHUNK_SIZE
+    recipients). With a `collection`, events are also written there as
+    `{_id, userIDs, event, origin, createdAt}` so reconnects can be replayed
+    from it (find_missed_events).
+    """
+
+    def __init__(self, collection=None, chunk_size=EVENT_CHUNK_SIZE):
+        self.collection = collection
+        self.chunk_size = chunk_size
+        self._handlers = []
+        self.origin = _origin()
+
+    def subscribe(self, handler):
+        """Call handler(user_ids, message, event_id) for every notification published to any worker."""
+        self._handlers.append(handler)
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    def publish(self, user_ids, message):
+        """Deliver to this process's subscribers, then store and forward to the other workers."""
+        user_ids = list(dict.fromkeys(user_ids))
+        created_at = _utcnow()
+        events = [
+            {"_id": ObjectId(), "userIDs": user_ids[k:k + self.chunk_size], "event": message,
+             "origin": self.origin, "createdAt": created_at}
+            for k in range(0, len(user_ids), self.chunk_size)
+        ]
+        for event in events:
+            self._deliver(event)
+        if events and self.collection is not None:
+            try:
+                self.collection.insert_many(events, ordered=False)
+            except PyMongoError as e:
+                print(f"⚠️ Could not store notification events: {e}")
+        if events:
+            self._forward(events)
+
+    def _forward(self, events):
+        pass
+
+    def _deliver(self, event):
+        for handler in self._handlers:
+            try:
+                handler(event["userIDs"], event["event"], str(event["_id"]))
+            except Exception as e:
+                print(f"⚠️ Notification handler failed: {e}")
+
+
+class MongoChangeStreamBroker(InMemoryBroker):
+    """
+    Fan-out across workers and hosts through a Mongo change stream.
+
+    A publish is delivered to this process's subscribers right away and
+    written to the events collection. Every other process watches the
+    collection's inserts and delivers the event to its own streams, skipping
+    the ones it published itself.
+
+    Change streams need a replica set (Atlas clusters are). The watcher
+    resumes from its last token after a dropped connection, so events written
+    in between are still delivered.
+    """
+
+    def __init__(self, collection, chunk_size=EVENT_CHUNK_SIZE, retry_seconds=5):
+        super().__init__(collection, chunk_size)
+        self.retry_seconds = retry_seconds
+        self._watcher = None
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start watching for other workers' events (once; call when the first stream opens)."""
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="notification-watch", daemon=True)
+                self._watcher.start()
+
+    def close(self):
+        self._closed.set()
+
+    def _watch(self):
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        resume_token = None
+        while not self._closed.is_set():
+            try:
+                with self.collection.watch(pipeline, resume_after=resume_token, max_await_time_ms=1000) as stream:
+                    print("👂 Watching for notifications from other workers")
+                    while not self._closed.is_set():
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        resume_token = change["_id"]
+                        event = change["fullDocument"]
+                        if event.get("origin") != self.origin:
+                            self._deliver(event)
+            except PyMongoError as e:
+                print(f"⚠️ Notification change stream failed, retrying in {self.retry_seconds}s: {e}")
+                if isinstance(e, OperationFailure):
+                    # e.g. the resume point fell off the oplog; start from now
+                    resume_token = None
+                self._closed.wait(self.retry_seconds)
+
+
+def parse_socket_address(address):
+    """'unix:/path/to.sock' or 'host:port' to a (family, address) pair for socket.connect/bind."""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+class SocketBroker(InMemoryBroker):
+    """
+    Fan-out between the workers of one host (or a few) through a small relay
+    process (`python -m scripts.notificationbroker`), for deployments without
+    a replica set. Events are newline-delimited JSON; the relay forwards each
+    line to every other connected worker.
+
+    Delivery is best effort: events published while a worker is disconnected
+    from the relay are not replayed to it. publish() never waits for the
+    relay; a sender thread forwards up to `max_pending` publishes once it is
+    reachable, and drops (with a log line) any past that.
+    """
+
+    def __init__(self, address=DEFAULT_SOCKET_ADDRESS, collection=None, retry_seconds=2,
+                 max_pending=MAX_PENDING_FORWARDS):
+        super().__init__(collection)
+        self.family, self.address = parse_socket_address(address)
+        self.retry_seconds = retry_seconds
+        self._sock = None
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._reader = None
+        self._sender = None
+        self._outbox = queue.Queue(maxsize=max_pending)
+        self._closed = threading.Event()
+        self.connected = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._reader is None:
+                self._reader = threading.Thread(target=self._read, name="notification-relay", daemon=True)
+                self._reader.start()
+                self._sender = threading.Thread(target=self._send, name="notification-relay-send", daemon=True)
+                self._sender.start()
+
+    def close(self):
+        self._closed.set()
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _forward(self, events):
+        lines = b"".join(
+            (json.dumps({"_id": str(event["_id"]), "userIDs": event["userIDs"], "event": event["event"]}) + "\n")
+            .encode("utf-8")
+            for event in events
+        )
+        # A process that only publishes (e.g. the scheduler) connects on its first event
+        self.start()
+        try:
+            self._outbox.put_nowait(lines)
+        except queue.Full:
+            print(f"⚠️ Notification relay backlog full ({self._outbox.maxsize}), "
+                  f"not forwarding {len(events)} events to other workers")
+
+    def _send(self):
+        while not self._closed.is_set():
+            try:
+                lines = self._outbox.get(timeout=self.retry_seconds)
+            except queue.Empty:
+                continue
+            while not self.connected.wait(self.retry_seconds):
+                if self._closed.is_set():
+                    return
+            with self._send_lock:
+                try:
+                    if self._sock is None:
+                        raise OSError("not connected to the notification relay")
+                    self._sock.sendall(lines)
+                except OSError as e:
+                    print(f"⚠️ Could not publish notification to other workers: {e}")
+
+    def _read(self):
+        while not self._closed.is_set():
+            try:
+                sock = socket.socket(self.family, socket.SOCK_STREAM)
+                sock.connect(self.address)
+            except OSError as e:
+                print(f"⚠️ Notification relay unreachable, retrying in {self.retry_seconds}s: {e}")
+                self._closed.wait(self.retry_seconds)
+                continue
+            self._sock = sock
+            self.connected.set()
+            try:
+                for line in sock.makefile("rb"):
+                    self._deliver(json.loads(line))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Notification relay connection lost: {e}")
+            finally:
+                self.connected.clear()
+                with self._send_lock:
+                    self._sock = None
+                sock.close()
+
+
+class _RelayTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _RelayUnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class _RelayHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        with self.server.lock:
+            self.server.clients.add(self.wfile)
+        try:
+            for line in self.rfile:
+                with self.server.lock:
+                    others = [c for c in self.server.clients if c is not self.wfile]
+                for client in others:
+                    try:
+                        client.write(line)
+                        client.flush()
+                    except OSError:
+                        pass
+        finally:
+            with self.server.lock:
+                self.server.clients.discard(self.wfile)
+
+
+def make_relay_server(address=DEFAULT_SOCKET_ADDRESS):
+    """The relay SocketBroker workers connect to; run it with serve_forever()."""
+    family, bind_address = parse_socket_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(bind_address):
+            os.unlink(bind_address)
+        server_class = _RelayUnixServer
+    else:
+        server_class = _RelayTCPServer
+    server = server_class(bind_address, _RelayHandler)
+    server.clients = set()
+    server.lock = threading.Lock()
+    return server
+
+
+def create_broker(kind, collection=None, address=DEFAULT_SOCKET_ADDRESS):
+    """Broker for NOTIFICATION_BROKER: "memory", "mongo" or "socket"."""
+    if kind == "memory":
+        return InMemoryBroker(collection)
+    if kind == "mongo":
+        return MongoChangeStreamBroker(collection)
+    if kind == "socket":
+        return SocketBroker(address, collection)
+    raise ValueError(f"Unknown notification broker {kind!r} (expected memory, mongo or socket)")
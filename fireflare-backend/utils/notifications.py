@@ -0,0 +1,195 @@
+import itertools
+import json
+import threading
+import time
+from collections import deque, OrderedDict
+
+
+DEFAULT_KEEPALIVE_SECONDS = 15
+# Slots of the keep-alive timer wheel; one slot is visited every keepalive_seconds / slots
+KEEPALIVE_SLOTS = 16
+KEEPALIVE_FRAME = ": keep-alive\n\n"
+# Recent events kept per user for Last-Event-ID replay, and how many users keep them
+DEFAULT_REPLAY_SIZE = 50
+DEFAULT_MAX_REPLAY_USERS = 10000
+
+
+def sse_frame(message, event_id=None):
+    data = f"data: {json.dumps(message)}\n\n"
+    return data if event_id is None else f"id: {event_id}\n{data}"
+
+
+class NotificationConnection:
+    """One open /notifications/stream: (event id, frame) pairs waiting to be sent and the event that wakes its generator."""
+
+    def __init__(self, user_id, slot):
+        self.user_id = user_id
+        self.slot = slot
+        self.frames = deque()
+        # Set by register() when Last-Event-ID is older than what this process remembers
+        self.needs_replay = False
+        self.wakeup = threading.Event()
+        self.keepalive_due = False
+        self.closed = False
+        self.last_sent = time.monotonic()
+
+    def push(self, event_id, frame):
+        self.frames.append((event_id, frame))
+        self.wakeup.set()
+
+
+class NotificationHub:
+    """
+    Open SSE notification streams of this process, keyed by userID.
+
+    A broadcast formats its frame once and touches only the recipients'
+    connections, each of which is woken through its own event, so delivery is
+    immediate and idle streams are never polled. Keep-alives come from a
+    timer wheel: every keepalive_seconds / KEEPALIVE_SLOTS one slot of
+    connections is checked and those that sent nothing for a whole interval
+    get a keep-alive comment, which also lets a dropped client be noticed.
+
+    Frames carry the event id they were published with, and the last
+    `replay_size` events of each recently connected user are kept, so a
+    reconnect sending Last-Event-ID gets what it missed from memory. Only
+    when that id is no longer remembered is the connection flagged
+    `needs_replay` for the caller to fill in from Mongo (see replay()).
+
+    Uses `threading` primitives, which the gunicorn gevent worker
+    monkey-patches into their gevent equivalents (the wheel runs as a greenlet).
+    """
+
+    def __init__(self, keepalive_seconds=DEFAULT_KEEPALIVE_SECONDS, slots=KEEPALIVE_SLOTS,
+                 replay_size=DEFAULT_REPLAY_SIZE, max_replay_users=DEFAULT_MAX_REPLAY_USERS):
+        self.keepalive_seconds = keepalive_seconds
+        self.replay_size = replay_size
+        self.max_replay_users = max_replay_users
+        self._lock = threading.Lock()
+        self._connections = {}
+        # userID -> deque of (event id, frame), least recently used first
+        self._recent = OrderedDict()
+        self._wheel = [set() for _ in range(slots)]
+        self._next_slot = itertools.count()
+        self._ticker = None
+
+    def connected_user_ids(self):
+        with self._lock:
+            return list(self._connections)
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(connections) for connections in self._connections.values())
+
+    def register(self, user_id, last_event_id=None):
+        """
+        Open a stream for `user_id`. With `last_event_id` (a reconnect), the
+        remembered events after it are queued first, or the connection is
+        flagged needs_replay if that id has already been evicted.
+        """
+        connection = NotificationConnection(user_id, next(self._next_slot) % len(self._wheel))
+        with self._lock:
+            self._connections.setdefault(user_id, set()).add(connection)
+            self._wheel[connection.slot].add(connection)
+            recent = self._recent_events(user_id)
+            if last_event_id is not None:
+                ids = [event_id for event_id, _ in recent]
+                if last_event_id in ids:
+                    connection.frames.extend(list(recent)[ids.index(last_event_id) + 1:])
+                    connection.wakeup.set()
+                else:
+                    connection.needs_replay = True
+            if self._ticker is None:
+                self._ticker = threading.Thread(target=self._run_wheel, name="sse-keepalive", daemon=True)
+                self._ticker.start()
+        return connection
+
+    def unregister(self, connection):
+        connection.closed = True
+        connection.wakeup.set()
+        with self._lock:
+            connections = self._connections.get(connection.user_id)
+            if connections is not None:
+                connections.discard(connection)
+                if not connections:
+                    del self._connections[connection.user_id]
+            self._wheel[connection.slot].discard(connection)
+
+    def replay(self, connection, events):
+        """Queue (event id, message) pairs fetched for a needs_replay connection ahead of anything newer."""
+        with self._lock:
+            queued = {event_id for event_id, _ in connection.frames}
+            missed = [(event_id, sse_frame(message, event_id)) for event_id, message in events
+                      if event_id not in queued]
+            connection.frames.extendleft(reversed(missed))
+            connection.needs_replay = False
+            if missed:
+                connection.wakeup.set()
+        return len(missed)
+
+    def publish(self, user_ids, message, event_id=None):
+        """
+        Send `message` to every open stream of `user_ids` and remember it for
+        their reconnects. Returns the number of streams it was queued on.
+        """
+        frame = sse_frame(message, event_id)
+        delivered = 0
+        with self._lock:
+            for user_id in set(user_ids):
+                if event_id is not None and user_id in self._recent:
+                    self._recent[user_id].append((event_id, frame))
+                for connection in self._connections.get(user_id, ()):
+                    connection.push(event_id, frame)
+                    delivered += 1
+        return delivered
+
+    def _recent_events(self, user_id):
+        # Caller holds self._lock
+        recent = self._recent.get(user_id)
+        if recent is None:
+            recent = self._recent[user_id] = deque(maxlen=self.replay_size)
+            excess = len(self._recent) - self.max_replay_users
+            if excess > 0:
+                # Forget the users gone longest; connected users keep theirs
+                gone = (u for u in self._recent if u not in self._connections)
+                for evicted in list(itertools.islice(gone, excess)):
+                    del self._recent[evicted]
+        else:
+            self._recent.move_to_end(user_id)
+        return recent
+
+    def stream(self, connection):
+        """SSE body generator for `connection`; unregisters it when the client goes away."""
+        try:
+            # Opening comment so the response headers reach the client (and proxies) right away
+            connection.last_sent = time.monotonic()
+            yield KEEPALIVE_FRAME
+            while not connection.closed:
+                connection.wakeup.wait()
+                connection.wakeup.clear()
+                keepalive_due = connection.keepalive_due and not connection.frames
+                connection.keepalive_due = False
+                while connection.frames:
+                    connection.last_sent = time.monotonic()
+                    yield connection.frames.popleft()[1]
+                if keepalive_due:
+                    connection.last_sent = time.monotonic()
+                    yield KEEPALIVE_FRAME
+        finally:
+            self.unregister(connection)
+
+    def _run_wheel(self):
+        tick = self.keepalive_seconds / len(self._wheel)
+        for slot in itertools.cycle(range(len(self._wheel))):
+            time.sleep(tick)
+            self.tick(slot)
+
+    def tick(self, slot, now=None):
+        """Wake the connections in `slot` that have been quiet for a keep-alive interval."""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            due = [c for c in self._wheel[slot] if now - c.last_sent >= self.keepalive_seconds]
+        for connection in due:
+            connection.keepalive_due = True
+            connection.wakeup.set()
+        return len(due)
@@ -0,0 +1,140 @@
+import queue
+import threading
+import time
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+
+# Documents per insert_many; well under the 100k-operation / 48 MB batch limits
+DEFAULT_CHUNK_SIZE = 1000
+# Notifications waiting to be written before submit() starts pushing back
+DEFAULT_MAX_PENDING = 100000
+
+
+def write_notifications(collection, documents, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Insert `documents` with one unordered insert_many per `chunk_size`, so
+    a bad document or a failed chunk doesn't stop the others.
+
+    Returns:
+        (written, failed) document counts
+    """
+    written = failed = 0
+    for k in range(0, len(documents), chunk_size):
+        chunk = documents[k:k + chunk_size]
+        try:
+            written += len(collection.insert_many(chunk, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            written += e.details.get("nInserted", 0)
+            failed += len(chunk) - e.details.get("nInserted", 0)
+            print(f"⚠️ {len(e.details.get('writeErrors', []))} notifications failed to write")
+        except PyMongoError as e:
+            failed += len(chunk)
+            print(f"⚠️ Could not write {len(chunk)} notifications: {e}")
+    return written, failed
+
+
+class NotificationWriter:
+    """
+    Writes per-user Notifications documents in bulk.
+
+    Synchronous by default. With `asynchronous=True`, submit() only queues
+    the documents and a background thread writes them, coalescing whatever
+    has queued up into chunked insert_many calls, so a request that notifies
+    thousands of users returns right away. The queue holds at most
+    `max_pending` documents; past that submit() waits for the writer to catch
+    up (up to `put_timeout` seconds) and then writes inline rather than
+    dropping anything.
+
+    stats() reports submitted/written/failed counts, the queue depth and the
+    last batch's latency.
+    """
+
+    def __init__(self, collection, chunk_size=DEFAULT_CHUNK_SIZE, asynchronous=False,
+                 max_pending=DEFAULT_MAX_PENDING, put_timeout=5):
+        self.collection = collection
+        self.chunk_size = chunk_size
+        self.asynchronous = asynchronous
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._thread = None
+        self._stats = {"submitted": 0, "written": 0, "failed": 0, "inline": 0,
+                       "batches": 0, "lastBatchSeconds": None}
+
+    def submit(self, documents):
+        documents = list(documents)
+        if not documents:
+            return
+        with self._lock:
+            self._stats["submitted"] += len(documents)
+            queued = self.asynchronous and self._wait_for_space(len(documents))
+            if queued:
+                self._pending += len(documents)
+                self._queue.put(documents)
+                self._start()
+            elif self.asynchronous:
+                self._stats["inline"] += len(documents)
+                print(f"⚠️ Notification queue full ({self._pending} pending), writing {len(documents)} inline")
+        if not queued:
+            self._write(documents)
+
+    def _wait_for_space(self, count):
+        # Caller holds self._lock. A submission bigger than max_pending only needs an empty queue.
+        deadline = time.monotonic() + self.put_timeout
+        while self._pending and self._pending + count > self.max_pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._space.wait(remaining)
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until everything submitted so far is written. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._space.wait(remaining)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending=self._pending, asynchronous=self.asynchronous)
+
+    def _start(self):
+        # Caller holds self._lock
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="notification-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            # Coalesce small submissions into full chunks
+            while len(batch) < self.chunk_size:
+                try:
+                    batch += self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                print(f"⚠️ Notification writer error: {e}")
+            with self._lock:
+                self._pending -= len(batch)
+                self._space.notify_all()
+
+    def _write(self, documents):
+        started = time.perf_counter()
+        written, failed = write_notifications(self.collection, documents, self.chunk_size)
+        with self._lock:
+            self._stats["written"] += written
+            self._stats["failed"] += failed
+            self._stats["batches"] += 1
+            self._stats["lastBatchSeconds"] = round(time.perf_counter() - started, 4)
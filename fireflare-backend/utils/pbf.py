@@ -0,0 +1,74 @@
+import struct
+
+
+WIRE_VARINT = 0
+WIRE_FIXED64 = 1
+WIRE_BYTES = 2
+
+
+class PbfWriter:
+    """
+    Minimal protocol buffers writer, enough to emit Mapbox Vector Tiles
+    without pulling in protobuf and generated message classes.
+    """
+
+    def __init__(self):
+        self.buf = bytearray()
+
+    def __len__(self):
+        return len(self.buf)
+
+    def getvalue(self):
+        return bytes(self.buf)
+
+    def varint(self, value):
+        value = int(value)
+        if value < 0:
+            value += 1 << 64  # Two's complement, as protobuf does for negative int64
+        while value > 0x7F:
+            self.buf.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self.buf.append(value)
+
+    def tag(self, field, wire_type):
+        self.varint((field << 3) | wire_type)
+
+    def field_varint(self, field, value):
+        self.tag(field, WIRE_VARINT)
+        self.varint(value)
+
+    def field_sint(self, field, value):
+        self.tag(field, WIRE_VARINT)
+        self.varint(zigzag(value))
+
+    def field_bool(self, field, value):
+        self.field_varint(field, 1 if value else 0)
+
+    def field_double(self, field, value):
+        self.tag(field, WIRE_FIXED64)
+        self.buf += struct.pack("<d", value)
+
+    def field_bytes(self, field, data):
+        self.tag(field, WIRE_BYTES)
+        self.varint(len(data))
+        self.buf += data
+
+    def field_string(self, field, value):
+        self.field_bytes(field, value.encode("utf-8"))
+
+    def field_message(self, field, message):
+        self.field_bytes(field, message.buf)
+
+    def field_packed_varints(self, field, values):
+        packed = PbfWriter()
+        for value in values:
+            packed.varint(value)
+        self.field_bytes(field, packed.buf)
+
+    def field_packed_sints(self, field, values):
+        self.field_packed_varints(field, (zigzag(value) for value in values))
+
+
+def zigzag(value):
+    value = int(value)
+    return (value << 1) ^ (value >> 63)
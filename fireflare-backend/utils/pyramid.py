@@ -0,0 +1,305 @@
+import math
+from dataclasses import dataclass, replace
+from typing import Dict, List
+
+import numpy as np
+
+from utils.firms import FirmsDetections
+from utils.spatial import GridIndex
+
+
+@dataclass
+class ClusterLevel:
+    """
+    Every cluster (or lone point) visible at one zoom level.
+
+    Coordinates are Web Mercator in [0, 1]. `ids` below `point_count` of the
+    pyramid refer to an original feature; larger ids are clusters.
+    """
+    zoom: int
+    x: np.ndarray
+    y: np.ndarray
+    ids: np.ndarray
+    counts: np.ndarray
+    frp_sum: np.ndarray
+    frp_count: np.ndarray
+    frp_max: np.ndarray
+    latest: np.ndarray  # index into ClusterPyramid.acq_labels, -1 when unknown
+
+
+@dataclass
+class ClusterPyramid:
+    """Supercluster-style hierarchy of clusters for zoom levels min_zoom..max_zoom."""
+    min_zoom: int
+    max_zoom: int
+    features: List[Dict]
+    acq_labels: List[str]
+    levels: Dict[int, ClusterLevel]
+
+    @property
+    def point_count(self):
+        return len(self.features)
+
+    def level_for_zoom(self, zoom):
+        # Zooms past max_zoom show the raw points, stored one level above max_zoom
+        z = max(self.min_zoom, min(int(math.floor(zoom)), self.max_zoom + 1))
+        return self.levels[z]
+
+
+def lon_to_mercator_x(lon):
+    return np.asarray(lon, dtype=float) / 360 + 0.5
+
+
+def lat_to_mercator_y(lat):
+    sin = np.sin(np.radians(np.asarray(lat, dtype=float)))
+    with np.errstate(divide="ignore"):
+        y = 0.5 - 0.25 * np.log((1 + sin) / (1 - sin)) / math.pi
+    return np.clip(y, 0, 1)
+
+
+def mercator_x_to_lon(x):
+    return (x - 0.5) * 360
+
+
+def mercator_y_to_lat(y):
+    y2 = (180 - y * 360) * math.pi / 180
+    return 360 * math.atan(math.exp(y2)) / math.pi - 90
+
+
+def build_cluster_pyramid(features, min_zoom=0, max_zoom=16, radius=40, extent=512):
+    """
+    Precompute clusters for every zoom level in one bottom-up pass.
+
+    The raw points form level max_zoom + 1. Each lower level greedily merges
+    the previous level's clusters that sit within `radius` pixels (of an
+    `extent`-pixel tile) of each other, so every level costs roughly as much
+    as the one above it and the total work is close to linear.
+
+    Args:
+        features: GeoJSON Point features or FirmsDetections (NASA FIRMS detections)
+        min_zoom, max_zoom: Zoom range to precompute
+        radius: Cluster radius in pixels
+        extent: Tile extent in pixels
+
+    Returns:
+        ClusterPyramid
+    """
+    if isinstance(features, FirmsDetections):
+        lons, lats, frp, latest, acq_labels = _detection_columns(features)
+    else:
+        lons, lats, frp, latest, acq_labels = _feature_columns(features)
+    n = len(lons)
+
+    levels = {}
+    level = ClusterLevel(
+        zoom=max_zoom + 1,
+        x=lon_to_mercator_x(lons),
+        y=lat_to_mercator_y(lats),
+        ids=np.arange(n),
+        counts=np.ones(n, dtype=np.int64),
+        frp_sum=np.nan_to_num(frp),
+        frp_count=(~np.isnan(frp)).astype(np.int64),
+        frp_max=frp,
+        latest=latest,
+    )
+    levels[max_zoom + 1] = level
+
+    next_id = n
+    for zoom in range(max_zoom, min_zoom - 1, -1):
+        level, next_id = _cluster_level(level, zoom, radius / (extent * 2 ** zoom), next_id)
+        levels[zoom] = level
+
+    return ClusterPyramid(min_zoom, max_zoom, features, acq_labels, levels)
+
+
+def _feature_columns(features):
+    n = len(features)
+    lons = np.fromiter((f["geometry"]["coordinates"][0] for f in features), dtype=float, count=n)
+    lats = np.fromiter((f["geometry"]["coordinates"][1] for f in features), dtype=float, count=n)
+
+    frp = np.full(n, np.nan)
+    acq_keys = []
+    for k, feature in enumerate(features):
+        props = feature.get("properties") or {}
+        try:
+            frp[k] = float(props.get("frp"))
+        except (TypeError, ValueError):
+            pass
+        acq_keys.append(f"{props.get('acq_date', '')} {props.get('acq_time', '')}".strip())
+
+    acq_labels = sorted(set(key for key in acq_keys if key))
+    acq_codes = {label: code for code, label in enumerate(acq_labels)}
+    latest = np.array([acq_codes.get(key, -1) for key in acq_keys], dtype=np.int64)
+    return lons, lats, frp, latest, acq_labels
+
+
+def _detection_columns(detections):
+    keys = detections.acquisition_keys()
+    labels, codes = np.unique(keys, return_inverse=True)
+    codes = codes.astype(np.int64).reshape(-1)
+    if labels.size and labels[0] == b"":
+        # Rows without an acquisition time sort first; they have no label
+        labels = labels[1:]
+        codes -= 1
+    acq_labels = [label.decode("utf-8") for label in labels.tolist()]
+    return detections.lon, detections.lat, detections.frp.copy(), codes, acq_labels
+
+
+def _cluster_level(prev, zoom, r, next_id):
+    if prev.x.size == 0:
+        return replace(prev, zoom=zoom), next_id
+
+    xs = prev.x.tolist()
+    ys = prev.y.tolist()
+    r2 = r * r
+    isolated = _isolated_points(prev.x, prev.y, r).tolist()
+    grid = GridIndex(r)
+    for i in range(len(xs)):
+        if not isolated[i]:
+            grid.insert(i, xs[i], ys[i])
+
+    processed = [False] * len(xs)
+    members = []
+    sizes = []
+    for i in range(len(xs)):
+        if isolated[i]:
+            members.append(i)
+            sizes.append(1)
+            continue
+        if processed[i]:
+            continue
+        processed[i] = True
+        grid.remove(i, xs[i], ys[i])
+        group = [i]
+
+        xi = xs[i]
+        yi = ys[i]
+        for j in grid.query(xi, yi, r):
+            dx = xs[j] - xi
+            dy = ys[j] - yi
+            if dx * dx + dy * dy <= r2:
+                group.append(j)
+        for j in group[1:]:
+            processed[j] = True
+            grid.remove(j, xs[j], ys[j])
+
+        members.extend(group)
+        sizes.append(len(group))
+
+    # Aggregate every group in one vectorized pass over the flattened member list
+    members = np.array(members, dtype=np.int64)
+    sizes = np.array(sizes, dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    seeds = members[starts]
+    merged = sizes > 1
+
+    weights = prev.counts[members]
+    counts = np.add.reduceat(weights, starts)
+    x = np.add.reduceat(prev.x[members] * weights, starts) / counts
+    y = np.add.reduceat(prev.y[members] * weights, starts) / counts
+
+    ids = prev.ids[seeds].copy()
+    ids[merged] = np.arange(next_id, next_id + int(merged.sum()))
+
+    level = ClusterLevel(
+        zoom=zoom,
+        # Lone points/clusters are carried up unchanged
+        x=np.where(merged, x, prev.x[seeds]),
+        y=np.where(merged, y, prev.y[seeds]),
+        ids=ids,
+        counts=counts,
+        frp_sum=np.add.reduceat(prev.frp_sum[members], starts),
+        frp_count=np.add.reduceat(prev.frp_count[members], starts),
+        frp_max=np.fmax.reduceat(prev.frp_max[members], starts),
+        latest=np.maximum.reduceat(prev.latest[members], starts),
+    )
+    return level, next_id + int(merged.sum())
+
+
+def _isolated_points(x, y, r):
+    """
+    Flag points whose own and surrounding grid cells (cell size `r`) hold no
+    other point. Those can never be within `r` of anything, so they skip the
+    per-point neighbour search entirely.
+    """
+    cx = np.floor(x / r).astype(np.int64)
+    cy = np.floor(y / r).astype(np.int64)
+    stride = int(cy.max()) + 3 if cy.size else 1
+    keys = cx * stride + cy
+    sorted_keys = np.sort(keys)
+
+    nearby = np.zeros(keys.size, dtype=np.int64)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            shifted = keys + dx * stride + dy
+            nearby += np.searchsorted(sorted_keys, shifted, side="right")
+            nearby -= np.searchsorted(sorted_keys, shifted, side="left")
+    return nearby == 1  # only the point itself
+
+
+def get_clusters(pyramid, bbox, zoom):
+    """
+    Clusters and points of the level matching `zoom` that fall inside `bbox`.
+
+    Args:
+        pyramid: ClusterPyramid from build_cluster_pyramid
+        bbox: [west, south, east, north] in degrees
+        zoom: Map zoom level (fractional zooms round down)
+
+    Returns:
+        GeoJSON FeatureCollection
+    """
+    level = pyramid.level_for_zoom(zoom)
+    west, south, east, north = bbox
+    min_x = lon_to_mercator_x(west)
+    max_x = lon_to_mercator_x(east)
+    # Mercator y grows southward
+    min_y = lat_to_mercator_y(north)
+    max_y = lat_to_mercator_y(south)
+
+    mask = (level.x >= min_x) & (level.x <= max_x) & (level.y >= min_y) & (level.y <= max_y)
+    return {
+        "type": "FeatureCollection",
+        "features": [cluster_to_feature(pyramid, level, k) for k in np.flatnonzero(mask).tolist()]
+    }
+
+
+def cluster_to_feature(pyramid, level, k):
+    """GeoJSON feature for entry `k` of a level: the original point, or a cluster summary."""
+    item_id = int(level.ids[k])
+    if item_id < pyramid.point_count:
+        return pyramid.features[item_id]
+
+    count = int(level.counts[k])
+    properties = {
+        "cluster": True,
+        "cluster_id": item_id,
+        "point_count": count,
+        "point_count_abbreviated": _abbreviate(count),
+    }
+    if level.frp_count[k] > 0:
+        properties["avg_frp"] = round(float(level.frp_sum[k]) / int(level.frp_count[k]), 2)
+    if not np.isnan(level.frp_max[k]):
+        properties["max_frp"] = round(float(level.frp_max[k]), 2)
+    if level.latest[k] >= 0:
+        properties["latest_acquisition"] = pyramid.acq_labels[int(level.latest[k])]
+
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Point",
+            "coordinates": [
+                float(mercator_x_to_lon(level.x[k])),
+                float(mercator_y_to_lat(level.y[k]))
+            ]
+        },
+        "properties": properties
+    }
+
+
+def _abbreviate(count):
+    if count >= 10000:
+        return f"{round(count / 1000)}k"
+    if count >= 1000:
+        return f"{round(count / 100) / 10}k"
+    return str(count)
@@ -0,0 +1,52 @@
+import asyncio
+import random
+import time
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, bursting up to `capacity`.
+
+    Waiters are served in arrival order, so a large batch of requests drains
+    at exactly the configured rate instead of bursting past the API quota.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens=1):
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+
+
+def backoff_delay(attempt, base_seconds=0.5, max_seconds=30.0, retry_after=None):
+    """
+    Seconds to wait before retry number `attempt` (0-based): exponential
+    backoff with full jitter, or the server's Retry-After if it sent one.
+    """
+    if retry_after is not None:
+        try:
+            return min(max_seconds, max(0.0, float(retry_after)))
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(max_seconds, base_seconds * 2 ** attempt))
+
+
+def is_retryable_status(status):
+    """429 (rate limited) and 5xx responses are worth retrying."""
+    return status == 429 or 500 <= status < 600
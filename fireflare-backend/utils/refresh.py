@@ -0,0 +1,154 @@
+import datetime
+import os
+import socket
+import threading
+import time
+import uuid
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+
+def _utcnow():
+    # Naive UTC, which is what pymongo stores and returns by default
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class _Flight:
+    """One in-progress refresh that other callers in this process can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RefreshCoordinator:
+    """
+    Single-flight guard around an expensive refresh (e.g. a NASA FIRMS pull).
+
+    Within a process only one refresh runs at a time; concurrent callers wait
+    for it and share its result. Across workers a lease document in Mongo
+    (`{_id: name, owner, expiresAt}`) makes sure only one process refreshes;
+    the lease expires on its own if that process dies mid-refresh.
+
+    Uses `threading` primitives, which the gunicorn gevent worker
+    monkey-patches into their gevent equivalents.
+    """
+
+    def __init__(self, name, lease_collection=None, lease_seconds=600, retry_seconds=30):
+        self.name = name
+        self.lease_collection = lease_collection
+        self.lease_seconds = lease_seconds
+        self.retry_seconds = retry_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._flight = None
+        self._next_attempt = 0.0
+
+    def in_progress(self):
+        return self._flight is not None
+
+    def _begin(self):
+        with self._lock:
+            if self._flight is not None:
+                return self._flight, False
+            self._flight = _Flight()
+            return self._flight, True
+
+    def _lead(self, flight, refresh_fn):
+        try:
+            if not self.acquire_lease():
+                # Another worker is refreshing; callers fall back to stored data
+                self._next_attempt = time.time() + self.retry_seconds
+                return None
+            try:
+                flight.result = refresh_fn()
+            finally:
+                self.release_lease()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flight = None
+            flight.done.set()
+
+    def refresh(self, refresh_fn, timeout=None):
+        """
+        Run `refresh_fn` unless a refresh is already in flight in this process,
+        in which case wait for it and return its result.
+
+        Returns None when another worker holds the lease.
+        """
+        flight, leader = self._begin()
+        if leader:
+            return self._lead(flight, refresh_fn)
+
+        flight.done.wait(timeout)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def refresh_in_background(self, refresh_fn):
+        """
+        Start `refresh_fn` in a background thread (a greenlet under gevent)
+        unless a refresh is already running. Returns True if one was started.
+        """
+        if time.time() < self._next_attempt:
+            return False
+        flight, leader = self._begin()
+        if not leader:
+            return False
+
+        def run():
+            try:
+                self._lead(flight, refresh_fn)
+            except Exception as e:
+                print(f"⚠️ Background {self.name} refresh failed: {e}")
+
+        threading.Thread(target=run, daemon=True).start()
+        return True
+
+    def acquire_lease(self):
+        """Take (or extend) the cross-worker lease. Returns False if another owner holds it."""
+        if self.lease_collection is None:
+            return True
+        now = _utcnow()
+        try:
+            self.lease_collection.find_one_and_update(
+                {"_id": self.name, "$or": [{"expiresAt": {"$lte": now}}, {"owner": self.owner}]},
+                {"$set": {
+                    "owner": self.owner,
+                    "acquiredAt": now,
+                    "expiresAt": now + datetime.timedelta(seconds=self.lease_seconds)
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return True
+        except DuplicateKeyError:
+            # The lease exists and is held by someone else, so the upsert collided
+            return False
+
+    def release_lease(self):
+        if self.lease_collection is None:
+            return
+        self.lease_collection.update_one(
+            {"_id": self.name, "owner": self.owner},
+            {"$set": {"expiresAt": _utcnow()}}
+        )
+
+    def wait_for_release(self, timeout=120, poll_interval=1.0):
+        """Block until no worker holds the lease (or `timeout` seconds pass). Returns True if released."""
+        if self.lease_collection is None:
+            return True
+        deadline = time.time() + timeout
+        while True:
+            lease = self.lease_collection.find_one({"_id": self.name}, {"expiresAt": 1})
+            if not lease or lease.get("expiresAt") is None or lease["expiresAt"] <= _utcnow():
+                return True
+            if time.time() >= deadline:
+                return False
+            time.sleep(poll_interval)
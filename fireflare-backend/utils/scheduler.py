@@ -0,0 +1,156 @@
+import datetime
+import os
+import random
+import socket
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Callable
+
+from pymongo.errors import DuplicateKeyError
+
+
+def _utcnow():
+    # Naive UTC, which is what pymongo stores and returns by default
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+@dataclass
+class ScheduledJob:
+    name: str
+    func: Callable
+    interval_seconds: float
+    jitter_seconds: float = 0.0  # Each run is shifted by up to +/- this much
+    timeout_seconds: float = 1800.0  # Claim is considered abandoned after this long
+
+
+class Scheduler:
+    """
+    Small interval scheduler for ingest jobs (NASA FIRMS, OpenWeather AQI).
+
+    Run state lives in a Mongo collection, one document per job:
+    `{_id: name, nextRunAt, runningUntil, owner, lastStartedAt, lastFinishedAt,
+    lastStatus, lastError, lastDurationSeconds}`. A job is claimed with a
+    conditional upsert, so when several processes run a scheduler each run
+    happens once. Because `nextRunAt` is persisted, a run that was missed while
+    every process was down fires right away on the next start (once, not once
+    per missed interval).
+    """
+
+    def __init__(self, runs_collection=None, poll_seconds=30.0):
+        self.runs_collection = runs_collection
+        self.poll_seconds = poll_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.jobs = {}
+        self._next_due = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_job(self, name, func, interval_seconds, jitter_seconds=0.0, timeout_seconds=1800.0):
+        self.jobs[name] = ScheduledJob(name, func, interval_seconds, jitter_seconds, timeout_seconds)
+        # Due immediately until the stored state says otherwise (missed-run catch-up)
+        self._next_due[name] = datetime.datetime.min
+        return self.jobs[name]
+
+    def _next_run_after(self, job, finished_at):
+        jitter = random.uniform(-job.jitter_seconds, job.jitter_seconds) if job.jitter_seconds else 0.0
+        return finished_at + datetime.timedelta(seconds=max(0.0, job.interval_seconds + jitter))
+
+    def _claim(self, job, now):
+        """Mark `job` as running if it is due and nobody else holds it. Returns True if claimed."""
+        if self.runs_collection is None:
+            return True
+        try:
+            self.runs_collection.find_one_and_update(
+                {
+                    "_id": job.name,
+                    "$and": [
+                        {"$or": [{"nextRunAt": {"$lte": now}}, {"nextRunAt": None}]},
+                        {"$or": [{"runningUntil": {"$lte": now}}, {"runningUntil": None}]}
+                    ]
+                },
+                {"$set": {
+                    "owner": self.owner,
+                    "lastStartedAt": now,
+                    "runningUntil": now + datetime.timedelta(seconds=job.timeout_seconds)
+                }},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # Not due yet, or running elsewhere: remember when to look again
+            state = self.runs_collection.find_one({"_id": job.name}) or {}
+            candidates = [t for t in (state.get("nextRunAt"), state.get("runningUntil")) if t is not None]
+            self._next_due[job.name] = max(candidates) if candidates else now
+            return False
+
+    def _record(self, job, started_at, error=None):
+        finished_at = _utcnow()
+        next_run = self._next_run_after(job, finished_at)
+        self._next_due[job.name] = next_run
+        if self.runs_collection is None:
+            return
+        self.runs_collection.update_one(
+            {"_id": job.name},
+            {"$set": {
+                "nextRunAt": next_run,
+                "runningUntil": None,
+                "lastFinishedAt": finished_at,
+                "lastDurationSeconds": round((finished_at - started_at).total_seconds(), 2),
+                "lastStatus": "error" if error else "ok",
+                "lastError": str(error) if error else None
+            }}
+        )
+
+    def run_job(self, name):
+        """Run one job now (if it can be claimed) and persist its outcome. Returns True if it ran."""
+        job = self.jobs[name]
+        started_at = _utcnow()
+        if not self._claim(job, started_at):
+            return False
+        print(f"⏰ Running scheduled job '{name}'")
+        try:
+            job.func()
+        except Exception as e:
+            print(f"❌ Scheduled job '{name}' failed: {e}")
+            self._record(job, started_at, error=e)
+        else:
+            self._record(job, started_at)
+            print(f"✅ Scheduled job '{name}' finished")
+        return True
+
+    def run_pending(self):
+        """Run every job whose next run is due. Returns the names of the jobs that ran."""
+        ran = []
+        for name in list(self.jobs):
+            if self._next_due[name] <= _utcnow() and self.run_job(name):
+                ran.append(name)
+        return ran
+
+    def seconds_until_next(self):
+        if not self._next_due:
+            return self.poll_seconds
+        wait = (min(self._next_due.values()) - _utcnow()).total_seconds()
+        # Poll at least every poll_seconds so runs by other processes are picked up
+        return max(0.0, min(wait, self.poll_seconds))
+
+    def run_forever(self):
+        print(f"⏰ Scheduler started with jobs: {', '.join(self.jobs)}")
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                # Keep the loop alive if Mongo is briefly unreachable
+                print(f"⚠️ Scheduler pass failed: {e}")
+            self._stop.wait(self.seconds_until_next())
+
+    def start(self):
+        """Run the scheduler loop in a daemon thread (a greenlet under the gevent worker)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name="scheduler", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
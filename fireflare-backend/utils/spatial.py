@@ -0,0 +1,81 @@
+import math
+
+
+class GridIndex:
+    """
+    Uniform grid (spatial hash) over planar (x, y) coordinates.
+
+    Points are bucketed into square cells of `cell_size`. Each cell keeps its
+    points in insertion order and removing a point is O(1).
+    Longitudes are treated as plain numbers (no antimeridian wrap), which is
+    fine for our North America bounds.
+    """
+
+    def __init__(self, cell_size: float):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        self._cells = {}
+
+    def __len__(self):
+        return sum(len(cell) for cell in self._cells.values())
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def _covered_cells(self, min_x, min_y, max_x, max_y):
+        size = self.cell_size
+        cx_min = math.floor(min_x / size)
+        cy_min = math.floor(min_y / size)
+        cx_max = math.floor(max_x / size)
+        cy_max = math.floor(max_y / size)
+        cells = self._cells
+
+        # Walk whichever is smaller: the covered cell range or the occupied cells
+        if (cx_max - cx_min + 1) * (cy_max - cy_min + 1) <= len(cells):
+            covered = []
+            for cx in range(cx_min, cx_max + 1):
+                for cy in range(cy_min, cy_max + 1):
+                    cell = cells.get((cx, cy))
+                    if cell:
+                        covered.append(cell)
+            return covered
+        return [
+            cell for (cx, cy), cell in cells.items()
+            if cx_min <= cx <= cx_max and cy_min <= cy <= cy_max
+        ]
+
+    def insert(self, idx, x, y):
+        self._cells.setdefault(self._cell(x, y), {})[idx] = (x, y)
+
+    def remove(self, idx, x, y):
+        key = self._cell(x, y)
+        cell = self._cells.get(key)
+        if cell is None:
+            return
+        cell.pop(idx, None)
+        if not cell:
+            del self._cells[key]
+
+    def query(self, x, y, reach_x, reach_y=None):
+        """
+        Return indices of every point in the cells covering
+        [x - reach_x, x + reach_x] x [y - reach_y, y + reach_y].
+
+        This is a candidate set: callers still apply their exact distance test.
+        """
+        if reach_y is None:
+            reach_y = reach_x
+        candidates = []
+        for cell in self._covered_cells(x - reach_x, y - reach_y, x + reach_x, y + reach_y):
+            candidates.extend(cell)
+        return candidates
+
+    def query_bbox(self, min_x, min_y, max_x, max_y):
+        """Return indices of the points that fall inside the bbox (inclusive)."""
+        result = []
+        for cell in self._covered_cells(min_x, min_y, max_x, max_y):
+            for idx, (px, py) in cell.items():
+                if min_x <= px <= max_x and min_y <= py <= max_y:
+                    result.append(idx)
+        return result
@@ -0,0 +1,205 @@
+import heapq
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.calculate import KM_PER_DEGREE_LAT, lon_reach_degrees
+from utils.geo import cluster_point_indices
+
+
+DEFAULT_TILE_DEGREES = 2.0
+# Below this many points the pool costs more than it saves
+MIN_PARALLEL_POINTS = 20000
+BATCHES_PER_WORKER = 4
+
+
+def connected_components(n, i, j):
+    """
+    Label the connected components of the graph with `n` nodes and edges (i, j).
+    Each node is labelled with the smallest node index in its component.
+    """
+    labels = np.arange(n)
+    if len(i) == 0:
+        return labels
+    while True:
+        # Pull both ends of every edge down to the smaller label, then jump pointers
+        low = np.minimum(labels[i], labels[j])
+        updated = labels.copy()
+        np.minimum.at(updated, i, low)
+        np.minimum.at(updated, j, low)
+        updated = updated[updated]
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def cell_groups(lats, lons, cluster_distance_km, max_abs_lat=None):
+    """
+    Group points whose grid cells touch, with cells at least `cluster_distance_km`
+    wide (the haversine_pairs_within layout). Any two points within that distance
+    share a cell or sit in neighbouring ones, so each group is a union of whole
+    connected components of the "within distance" graph. Working on occupied
+    cells instead of point pairs keeps this cheap at large distances.
+
+    Cells are sized for `max_abs_lat` (default: the highest |lat| present);
+    pass a fixed value to get the same cells for different point sets.
+
+    Returns:
+        Per-point label: the lowest point index in the point's group
+    """
+    lat = np.asarray(lats, dtype=float)
+    lon = np.asarray(lons, dtype=float)
+    if max_abs_lat is None:
+        max_abs_lat = float(np.abs(lat).max())
+    radius_km = cluster_distance_km * (1 + 1e-9) + 1e-12
+    lat_cell = max(radius_km / KM_PER_DEGREE_LAT * (1 + 1e-9) + 1e-12, 1e-6)
+    lon_cell = max(lon_reach_degrees(max_abs_lat, radius_km) * (1 + 1e-9) + 1e-12, 1e-6)
+    cy = np.floor(lat / lat_cell).astype(np.int64)
+    cx = np.floor(lon / lon_cell).astype(np.int64)
+    cy -= cy.min() - 1
+    cx -= cx.min() - 1
+    stride = int(cy.max()) + 2
+
+    cells, point_cell = np.unique(cx * stride + cy, return_inverse=True)
+    point_cell = point_cell.reshape(-1)
+    edges_i, edges_j = [], []
+    for dx, dy in ((0, 1), (1, -1), (1, 0), (1, 1)):
+        target = cells + dx * stride + dy
+        pos = np.minimum(np.searchsorted(cells, target), len(cells) - 1)
+        hit = cells[pos] == target
+        edges_i.append(np.flatnonzero(hit))
+        edges_j.append(pos[hit])
+    cell_roots = connected_components(len(cells), np.concatenate(edges_i), np.concatenate(edges_j))
+
+    groups = cell_roots[point_cell]
+    first_point = np.full(len(cells), lat.size)
+    np.minimum.at(first_point, groups, np.arange(lat.size))
+    return first_point[groups]
+
+
+def partition_tiles(lats, lons, cluster_distance_km, tile_degrees=DEFAULT_TILE_DEGREES):
+    """
+    Split points into lat/lon tiles that can be clustered independently.
+
+    The greedy clustering only ever links points within `cluster_distance_km`,
+    so points in different connected components of that "within distance"
+    graph never influence each other. Each group of such components (see
+    cell_groups) goes, whole, to the tile holding its lowest-index point;
+    a tile therefore overlaps its neighbours by whatever groups straddle its
+    seams, and no cluster is ever split.
+
+    Returns:
+        List of ascending index arrays, one per non-empty tile
+    """
+    lat = np.asarray(lats, dtype=float)
+    lon = np.asarray(lons, dtype=float)
+    if lat.size == 0:
+        return []
+
+    roots = cell_groups(lat, lon, cluster_distance_km)
+
+    tile_y = np.floor(lat / tile_degrees).astype(np.int64)
+    tile_x = np.floor(lon / tile_degrees).astype(np.int64)
+    tile_y -= tile_y.min()
+    tile_x -= tile_x.min()
+    tile_keys = (tile_x * (int(tile_y.max()) + 1) + tile_y)[roots]
+
+    order = np.argsort(tile_keys, kind="stable")
+    boundaries = np.flatnonzero(np.diff(tile_keys[order])) + 1
+    return np.split(order, boundaries)
+
+
+def _balanced_batches(tiles, n_batches):
+    """Spread tiles over `n_batches`, biggest first onto the lightest batch."""
+    batches = [[] for _ in range(max(1, min(n_batches, len(tiles))))]
+    loads = [(0, k) for k in range(len(batches))]
+    for tile in sorted(tiles, key=len, reverse=True):
+        load, k = heapq.heappop(loads)
+        batches[k].append(tile)
+        heapq.heappush(loads, (load + len(tile), k))
+    return [batch for batch in batches if batch]
+
+
+# Inputs of the running tiled_cluster_indices call, inherited by the forked
+# workers so only batch numbers and seed arrays travel through the pool's pipes
+_batch_state = {}
+_batch_lock = threading.Lock()
+
+
+def _cluster_batch(batch_number):
+    """
+    Process pool entry point: cluster every tile of one batch.
+
+    Returns:
+        (indices, seeds): global point indices and the global index of the
+        seed of each point's cluster
+    """
+    lat, lon, cluster_distance_km = _batch_state["points"]
+    tiles = _batch_state["batches"][batch_number]
+    indices = np.concatenate(tiles)
+    seeds = np.empty_like(indices)
+    offset = 0
+    for tile in tiles:
+        for members in cluster_point_indices(lat[tile].tolist(), lon[tile].tolist(), cluster_distance_km):
+            members = np.asarray(members) + offset
+            seeds[members] = indices[members[0]]
+        offset += len(tile)
+    return indices, seeds
+
+
+def _clusters_from_seeds(seeds):
+    """Rebuild cluster_point_indices output from each point's seed index."""
+    order = np.argsort(seeds, kind="stable")
+    boundaries = np.flatnonzero(np.diff(seeds[order])) + 1
+    return [members.tolist() for members in np.split(order, boundaries)]
+
+
+def tiled_cluster_indices(lats, lons, cluster_distance_km=5.0, workers=None,
+                          tile_degrees=DEFAULT_TILE_DEGREES, min_points=MIN_PARALLEL_POINTS):
+    """
+    cluster_point_indices, run tile by tile across a process pool.
+
+    Returns exactly what cluster_point_indices returns for the same input: the
+    same clusters, in seed order. Falls back to the single-process version
+    for one worker, fewer than `min_points` points, or platforms without fork.
+
+    Workers are forked rather than spawned: spawned children re-import the main
+    module (for `python backend.py` that means new Mongo clients and scheduler
+    threads), and forked ones inherit the coordinates instead of having them
+    pickled through a pipe. Keeping the pipes nearly empty also matters under
+    gevent, where a pipe write that blocks stalls the whole hub.
+    """
+    workers = workers or os.cpu_count() or 1
+    n = len(lats)
+    if workers <= 1 or n < min_points or "fork" not in multiprocessing.get_all_start_methods():
+        return cluster_point_indices(lats, lons, cluster_distance_km)
+
+    lat = np.asarray(lats, dtype=float)
+    lon = np.asarray(lons, dtype=float)
+    tiles = partition_tiles(lat, lon, cluster_distance_km, tile_degrees)
+    if len(tiles) < 2:
+        # One connected blob: nothing to split
+        return cluster_point_indices(lats, lons, cluster_distance_km)
+
+    batches = _balanced_batches(tiles, workers * BATCHES_PER_WORKER)
+    seeds = np.empty(n, dtype=np.int64)
+    with _batch_lock:
+        _batch_state["points"] = (lat, lon, cluster_distance_km)
+        _batch_state["batches"] = batches
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(batches)),
+                                     mp_context=multiprocessing.get_context("fork")) as pool:
+                for indices, batch_seeds in pool.map(_cluster_batch, range(len(batches))):
+                    seeds[indices] = batch_seeds
+        finally:
+            _batch_state.clear()
+
+    return _clusters_from_seeds(seeds)